@@ -0,0 +1,124 @@
+"""
+VN Stock Sniper - Benchmark fetch: throughput + tail latency qua các fetcher thật
+
+Chạy offline với bench/market_stub.py (không gọi API thật):
+    python bench/bench_fetch.py --symbols 300 --source multi --latency-ms 60
+    python bench/bench_fetch.py --source multi --fault DNSE:dead=1 --fault TCBS:error_rate=0.3
+    python bench/bench_fetch.py --workers 8 --no-throttle --rate-429 0.05
+"""
+
+import argparse
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'bench'))
+
+from market_stub import start_market_stub, point_fetchers_at, add_fault_args, profiles_from_args
+
+
+def make_fetcher(source: str, limiter=None):
+    from src import data_fetcher as dfm
+    if source == 'multi':
+        f = dfm.MultiSourceFetcher()
+        f._active_source = f.SOURCES[0]
+        if limiter is not None:
+            f.limiter = limiter
+        return f
+    return {'DNSE': dfm.DNSEFetcher, 'TCBS': dfm.TCBSFetcher, 'VCI': dfm.VCIFetcher}[source]()
+
+
+def run_bench(symbols: list, source: str, workers: int, days: int, limiter=None):
+    """Lấy toàn bộ symbols, trả về (latencies, ok, fail, wall, fetchers)"""
+    local = threading.local()
+    fetchers = []
+    latencies = []
+    counts = {'ok': 0, 'fail': 0}
+    lock = threading.Lock()
+
+    def fetch(symbol):
+        fetcher = getattr(local, 'fetcher', None)
+        if fetcher is None:
+            fetcher = local.fetcher = make_fetcher(source, limiter)
+            with lock:
+                fetchers.append(fetcher)
+        t0 = time.perf_counter()
+        try:
+            df = fetcher.get_price_history(symbol, days)
+            ok = not df.empty
+        except Exception:
+            ok = False
+        dt = time.perf_counter() - t0
+        with lock:
+            latencies.append(dt)
+            counts['ok' if ok else 'fail'] += 1
+
+    t0 = time.perf_counter()
+    if workers <= 1:
+        for s in symbols:
+            fetch(s)
+    else:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            list(pool.map(fetch, symbols))
+    return np.array(latencies), counts['ok'], counts['fail'], time.perf_counter() - t0, fetchers
+
+
+def main():
+    ap = argparse.ArgumentParser(description='Benchmark market data fetchers against a local stub')
+    ap.add_argument('--symbols', type=int, default=100, help='number of symbols to fetch')
+    ap.add_argument('--source', default='multi', choices=['multi', 'DNSE', 'TCBS', 'VCI'])
+    ap.add_argument('--workers', type=int, default=1)
+    ap.add_argument('--days', type=int, default=365)
+    ap.add_argument('--no-throttle', action='store_true', help='disable the AIMD rate limiter')
+    ap.add_argument('--limiter-state', help='persist learned rates here (default: not persisted)')
+    ap.add_argument('--no-hedge', action='store_true', help='disable hedged requests')
+    add_fault_args(ap)
+    args = ap.parse_args()
+
+    server, url = start_market_stub(0, profiles_from_args(args), args.recorded, seed=1)
+    point_fetchers_at(url)
+
+    from src import data_fetcher as dfm
+    from src.rate_limiter import AIMDLimiter
+    limiter = AIMDLimiter(state_file=args.limiter_state, enabled=not args.no_throttle)
+    if args.no_hedge:
+        dfm.HEDGE_BUDGET = 0
+        dfm.HEDGE_BURST = 0
+
+    universe = list(dict.fromkeys(dfm.DataFetcher.VN100_SYMBOLS + dfm.DataFetcher.HNX30_SYMBOLS
+                                  + dfm.DataFetcher.EXTRA_HOSE_SYMBOLS
+                                  + dfm.DataFetcher.EXTRA_HNX_SYMBOLS))
+    symbols = (universe * (args.symbols // len(universe) + 1))[:args.symbols]
+
+    lat, ok, fail, wall, fetchers = run_bench(symbols, args.source, args.workers, args.days, limiter)
+    limiter.save()
+    stats = server.RequestHandlerClass.stats
+    server.shutdown()
+
+    ms = lat * 1000
+    print("\n" + "=" * 56)
+    print(f"source={args.source} workers={args.workers} limiter={'on' if limiter.enabled else 'off'}")
+    print(f"symbols  : {ok} ok / {fail} fail / {len(symbols)}")
+    print(f"wall     : {wall:.2f}s  ({len(symbols) / wall:.1f} sym/s)")
+    if len(ms):
+        p50, p90, p99 = np.percentile(ms, [50, 90, 99])
+        print(f"latency  : p50={p50:.0f}ms p90={p90:.0f}ms p99={p99:.0f}ms max={ms.max():.0f}ms")
+    hedges = sum(getattr(f, 'hedges', 0) for f in fetchers)
+    if hedges:
+        wins = sum(f.hedge_wins for f in fetchers)
+        print(f"hedges   : {hedges} ({hedges / len(symbols):.1%} of symbols, {wins} won)")
+    if args.source == 'multi':
+        print(f"rates    : {limiter.summary()}")
+    for name, st in sorted(stats.items()):
+        print(f"stub {name:<4}: {st}")
+    print("=" * 56)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+"""
+VN Stock Sniper - Benchmark V3 AI: single mega-prompt vs parallel per-index
+
+Chạy hoàn toàn offline với bench/claude_stub.py (không tốn API):
+    python bench/bench_v3_ai.py --tps 400 --ttft 0.5 --concurrency 4
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'bench'))
+
+from claude_stub import start_stub
+
+
+def main():
+    ap = argparse.ArgumentParser(description='Benchmark V3 AI modes against a local stub')
+    ap.add_argument('--ttft', type=float, default=0.5)
+    ap.add_argument('--tps', type=float, default=400.0)
+    ap.add_argument('--section-tokens', type=int, default=350)
+    ap.add_argument('--concurrency', type=int, default=4)
+    ap.add_argument('--error-rate', type=float, default=0.0)
+    args = ap.parse_args()
+
+    server, url = start_stub(0, ttft=args.ttft, tps=args.tps,
+                             section_tokens=args.section_tokens, error_rate=args.error_rate, seed=1)
+    os.environ['ANTHROPIC_BASE_URL'] = url
+    os.environ['CLAUDE_API_KEY'] = 'stub'
+
+    from src import v3_generator as v3
+    from src.ai_cache import ResponseCache
+
+    v3.CLAUDE_API_KEY = 'stub'
+    indicators = {idx['key']: {'last_price': 1000.0, 'change_pct': 0.5, 'rsi': 55.0,
+                               'trend': 'TANG', 'vol_ratio': 1.1, 'macd_bullish': True}
+                  for idx in v3.INDEX_LIST}
+    bars = {k: [] for k in indicators}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = ResponseCache(cache_dir=tmp, force_refresh=True)
+
+        t0 = time.time()
+        single = v3.call_claude_single(v3.build_mega_prompt(indicators, bars), cache=cache) or {}
+        t_single = time.time() - t0
+
+        t0 = time.time()
+        parallel = v3.call_claude_parallel(indicators, bars, args.concurrency, cache=cache) or {}
+        t_parallel = time.time() - t0
+
+    server.shutdown()
+    print("\n" + "=" * 50)
+    print(f"single   : {t_single:6.2f}s  keys={sorted(single)}")
+    print(f"parallel : {t_parallel:6.2f}s  keys={sorted(parallel)}  (concurrency={args.concurrency})")
+    if t_parallel > 0:
+        print(f"speedup  : {t_single / t_parallel:.2f}x")
+    print("=" * 50)
+
+
+if __name__ == '__main__':
+    main()
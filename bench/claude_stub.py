@@ -0,0 +1,164 @@
+"""
+VN Stock Sniper - Claude Messages API stub
+Server giả lập POST /v1/messages (thường + streaming SSE) để benchmark V3 offline.
+
+Độ trễ = ttft + output_tokens / tokens_per_sec. Nội dung trả về là JSON
+đúng cấu trúc các key được yêu cầu trong prompt (overview 4 sections,
+mỗi chỉ số 9 sections), nên thời gian sinh tỉ lệ với số section như API thật.
+
+Chạy:
+    python bench/claude_stub.py --port 8765 --tps 400
+    ANTHROPIC_BASE_URL=http://127.0.0.1:8765 CLAUDE_API_KEY=stub python src/v3_generator.py
+"""
+
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+KEYS = ['overview', 'vnindex', 'vn30', 'vn100', 'vnmidcap']
+KEY_RE = re.compile(r'"(overview|vnindex|vn30|vn100|vnmidcap)": \{')
+
+
+class StubOptions:
+    def __init__(self, ttft=0.5, tps=400.0, section_tokens=350, error_rate=0.0,
+                 chunk_chars=64, seed=None):
+        self.ttft = ttft                      # giây tới token đầu tiên
+        self.tps = tps                        # output tokens / giây
+        self.section_tokens = section_tokens  # độ dài 1 section
+        self.error_rate = error_rate          # tỉ lệ trả 529 overloaded
+        self.chunk_chars = chunk_chars
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.requests = 0
+
+
+def requested_keys(prompt: str) -> list:
+    """Key được yêu cầu = các key trong phần cấu trúc sau '=== YEU CAU ==='"""
+    spec = prompt.split('=== YEU CAU ===', 1)[-1]
+    found = KEY_RE.findall(spec)
+    return [k for k in KEYS if k in found]
+
+
+def build_response_text(prompt: str, section_tokens: int) -> str:
+    body = {}
+    filler = 'Phan tich ky thuat chi tiet. ' * max(1, section_tokens * 4 // 30)
+    for key in requested_keys(prompt):
+        n = 4 if key == 'overview' else 9
+        body[key] = {
+            'title': f'{key.upper()} - Phan tich ky thuat',
+            'sections': [{
+                'title': f'SECTION {i + 1}',
+                'icon': '📊',
+                'content': f'<p class="content-paragraph">{filler}</p>',
+            } for i in range(n)],
+        }
+    return json.dumps(body, ensure_ascii=False)
+
+
+class ClaudeStubHandler(BaseHTTPRequestHandler):
+    options = StubOptions()
+
+    def log_message(self, *args):
+        pass
+
+    def _json(self, status, payload):
+        data = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _sse(self, event, payload):
+        self.wfile.write(f"event: {event}\ndata: {json.dumps(payload)}\n\n".encode('utf-8'))
+        self.wfile.flush()
+
+    def do_POST(self):
+        if not self.path.startswith('/v1/messages'):
+            return self._json(404, {'type': 'error', 'error': {'type': 'not_found_error'}})
+
+        opts = self.options
+        length = int(self.headers.get('Content-Length', 0))
+        req = json.loads(self.rfile.read(length) or b'{}')
+        with opts.lock:
+            opts.requests += 1
+            fail = opts.rng.random() < opts.error_rate
+
+        if fail:
+            return self._json(529, {'type': 'error',
+                                    'error': {'type': 'overloaded_error', 'message': 'Overloaded'}})
+
+        prompt = ''.join(m.get('content', '') if isinstance(m.get('content'), str) else ''
+                         for m in req.get('messages', []))
+        text = build_response_text(prompt, opts.section_tokens)
+        in_tokens = (len(prompt) + len(req.get('system', ''))) // 4
+        out_tokens = len(text) // 4
+        stop_reason = 'end_turn'
+        if out_tokens > req.get('max_tokens', 4096):
+            out_tokens = req.get('max_tokens', 4096)
+            text = text[:out_tokens * 4]
+            stop_reason = 'max_tokens'
+        message = {
+            'id': 'msg_stub', 'type': 'message', 'role': 'assistant',
+            'model': req.get('model', 'stub'), 'content': [],
+            'stop_reason': None, 'stop_sequence': None,
+            'usage': {'input_tokens': in_tokens, 'output_tokens': 1},
+        }
+
+        time.sleep(opts.ttft)
+        per_char = 1.0 / (opts.tps * 4)
+
+        if not req.get('stream'):
+            time.sleep(len(text) * per_char)
+            message.update({'content': [{'type': 'text', 'text': text}], 'stop_reason': stop_reason,
+                            'usage': {'input_tokens': in_tokens, 'output_tokens': out_tokens}})
+            return self._json(200, message)
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Cache-Control', 'no-cache')
+        self.end_headers()
+        self._sse('message_start', {'type': 'message_start', 'message': message})
+        self._sse('content_block_start', {'type': 'content_block_start', 'index': 0,
+                                          'content_block': {'type': 'text', 'text': ''}})
+        for i in range(0, len(text), opts.chunk_chars):
+            chunk = text[i:i + opts.chunk_chars]
+            time.sleep(len(chunk) * per_char)
+            self._sse('content_block_delta', {'type': 'content_block_delta', 'index': 0,
+                                              'delta': {'type': 'text_delta', 'text': chunk}})
+        self._sse('content_block_stop', {'type': 'content_block_stop', 'index': 0})
+        self._sse('message_delta', {'type': 'message_delta',
+                                    'delta': {'stop_reason': stop_reason, 'stop_sequence': None},
+                                    'usage': {'output_tokens': out_tokens}})
+        self._sse('message_stop', {'type': 'message_stop'})
+
+
+def start_stub(port: int = 0, **kwargs):
+    """Chạy stub trong thread nền, trả về (server, base_url)"""
+    handler = type('Handler', (ClaudeStubHandler,), {'options': StubOptions(**kwargs)})
+    server = ThreadingHTTPServer(('127.0.0.1', port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+if __name__ == '__main__':
+    ap = argparse.ArgumentParser(description='Claude Messages API stub')
+    ap.add_argument('--port', type=int, default=8765)
+    ap.add_argument('--ttft', type=float, default=0.5)
+    ap.add_argument('--tps', type=float, default=400.0)
+    ap.add_argument('--section-tokens', type=int, default=350)
+    ap.add_argument('--error-rate', type=float, default=0.0)
+    args = ap.parse_args()
+
+    server, url = start_stub(args.port, ttft=args.ttft, tps=args.tps,
+                             section_tokens=args.section_tokens, error_rate=args.error_rate)
+    print(f"Claude stub listening on {url}  (Ctrl+C to stop)")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -0,0 +1,441 @@
+"""
+VN Stock Sniper - Market data stub (DNSE / TCBS / VCI)
+Server HTTP cục bộ nói đúng định dạng request/response của 3 nguồn, để benchmark
+và kiểm thử DNSEFetcher / TCBSFetcher / VCIFetcher / MultiSourceFetcher offline.
+
+  DNSE: GET  /chart-api/v2/ohlcs/stock?symbol=&resolution=&from=&to=
+  TCBS: GET  /stock-insight/v2/stock/bars-long-term?resolution=&ticker=&type=&to=&countBack=
+        GET  /stock-insight/v2/stock/bars?resolution=1|15|60&...   (intraday)
+  VCI:  POST /api/chart/OHLCChart/gap-chart  {timeFrame, symbols, to, countBack}
+  Niêm yết (VCI): GET /api/price/symbols/getAll
+
+Dữ liệu: bars tổng hợp (random walk cố định theo mã) hoặc ghi sẵn từ raw_data.csv.
+Intraday (DNSE resolution=1|15|1H, TCBS bars, VCI ONE_MINUTE|ONE_HOUR): nến 1 phút
+nội suy từ nến ngày của INTRADAY_SESSIONS phiên gần nhất, 9:00-11:30 + 13:00-14:45.
+Lỗi giả lập theo từng nguồn: độ trễ lognormal, tỉ lệ 5xx, 429 (Retry-After),
+payload bị cắt cụt, nguồn chết hẳn.
+
+Chạy:
+    python bench/market_stub.py --port 8766 --latency-ms 80 --fault TCBS:error_rate=0.3
+"""
+
+import argparse
+import json
+import math
+import random
+import threading
+import time
+import zlib
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+import numpy as np
+import pandas as pd
+
+DNSE_PATH = "/chart-api/v2/ohlcs/stock"
+TCBS_PATH = "/stock-insight/v2/stock/bars-long-term"
+TCBS_INTRADAY_PATH = "/stock-insight/v2/stock/bars"
+VCI_PATH = "/api/chart/OHLCChart/gap-chart"
+LISTING_PATH = "/api/price/symbols/getAll"
+
+INTRADAY_SESSIONS = 3
+# Phút trong phiên theo UTC (giờ VN - 7): 9:00-11:29, 13:00-14:44 → 255 nến 1 phút
+SESSION_MINUTES = np.r_[np.arange(120, 270), np.arange(360, 465)]
+DNSE_RESOLUTIONS = {'1': 60, '15': 900, '1H': 3600, '60': 3600}
+TCBS_RESOLUTIONS = {'1': 60, '15': 900, '60': 3600}
+VCI_TIME_FRAMES = {'ONE_MINUTE': 60, 'ONE_HOUR': 3600}
+
+
+def _epoch(times: pd.Series) -> pd.Series:
+    """datetime → unix giây (không phụ thuộc độ phân giải ns/us/s của pandas)"""
+    return (times - pd.Timestamp(0)) // pd.Timedelta(seconds=1)
+
+
+class FaultProfile:
+    """Độ trễ + lỗi giả lập cho 1 nguồn"""
+
+    def __init__(self, latency_ms=50.0, sigma=0.5, error_rate=0.0, rate_429=0.0,
+                 retry_after=1, truncate_rate=0.0, dead=False, max_rps=0.0):
+        self.latency_ms = latency_ms      # median độ trễ
+        self.sigma = sigma                # độ lệch lognormal (đuôi dài)
+        self.error_rate = error_rate      # tỉ lệ HTTP 500
+        self.rate_429 = rate_429          # tỉ lệ HTTP 429
+        self.retry_after = retry_after    # giây, header Retry-After
+        self.truncate_rate = truncate_rate
+        self.dead = dead                  # luôn 503
+        self.max_rps = max_rps            # > 0: giới hạn thật (token bucket), vượt → 429
+        self._tokens = max_rps
+        self._refill_at = time.monotonic()
+
+    def take_token(self) -> bool:
+        """Token bucket dung lượng max_rps (burst 1 giây)"""
+        if self.max_rps <= 0:
+            return True
+        now = time.monotonic()
+        self._tokens = min(self.max_rps, self._tokens + (now - self._refill_at) * self.max_rps)
+        self._refill_at = now
+        if self._tokens >= 1:
+            self._tokens -= 1
+            return True
+        return False
+
+    def update(self, spec: str):
+        """Cập nhật từ chuỗi 'key=value,key=value'"""
+        for part in filter(None, spec.split(',')):
+            key, _, val = part.partition('=')
+            cur = getattr(self, key.strip())
+            if isinstance(cur, bool):
+                setattr(self, key.strip(), val.strip().lower() in ('1', 'true', 'yes', ''))
+            else:
+                setattr(self, key.strip(), type(cur)(val))
+        return self
+
+
+class BarSource:
+    """Bars theo mã: ghi sẵn (raw_data.csv) hoặc tổng hợp"""
+
+    def __init__(self, recorded_file: str = None, universe: list = None, n_days: int = 400,
+                 listing_size: int = 600):
+        self.n_days = n_days
+        self.listing_size = listing_size
+        self.universe = set(universe) if universe else None
+        self._cache = {}
+        self._lock = threading.Lock()
+        self._recorded = None
+        if recorded_file:
+            df = pd.read_csv(recorded_file)
+            df['time'] = pd.to_datetime(df['time'])
+            self._recorded = {sym: g.sort_values('time') for sym, g in df.groupby('symbol')}
+
+    def _synthetic(self, symbol: str) -> pd.DataFrame:
+        rng = np.random.default_rng(zlib.crc32(symbol.encode()))
+        end = pd.Timestamp(datetime.now().date())
+        dates = pd.bdate_range(end=end, periods=self.n_days)
+        close = rng.uniform(8, 120) * 1000 * np.exp(np.cumsum(rng.normal(0.0004, 0.018, self.n_days)))
+        close = np.round(close, -1)
+        opn = np.round(close * (1 + rng.normal(0, 0.006, self.n_days)), -1)
+        high = np.maximum(opn, close) * (1 + rng.uniform(0, 0.015, self.n_days))
+        low = np.minimum(opn, close) * (1 - rng.uniform(0, 0.015, self.n_days))
+        volume = rng.lognormal(rng.uniform(8, 14), 1, self.n_days).astype(np.int64)
+        return pd.DataFrame({'time': dates, 'open': opn, 'high': np.round(high, -1),
+                             'low': np.round(low, -1), 'close': close, 'volume': volume})
+
+    def _minutes(self, daily: pd.DataFrame) -> pd.DataFrame:
+        """Nến 1 phút của các phiên cuối: cầu Brown từ open tới close của nến ngày"""
+        days = daily.tail(INTRADAY_SESSIONS)
+        n = len(SESSION_MINUTES)
+        frames = []
+        for day in days.itertuples():
+            rng = np.random.default_rng(int(_epoch(pd.Series([day.time])).iloc[0]))
+            walk = np.cumsum(rng.normal(0, 1, n))
+            bridge = walk - np.linspace(0, 1, n) * walk[-1]
+            scale = (day.high - day.low) / max(np.ptp(bridge), 1e-9) * 0.8
+            close = np.round(day.open + (day.close - day.open) * np.linspace(0, 1, n) + bridge * scale, -1)
+            close[-1] = day.close
+            opn = np.r_[day.open, close[:-1]]
+            weights = rng.dirichlet(np.ones(n))
+            frames.append(pd.DataFrame({
+                'time': day.time + pd.to_timedelta(SESSION_MINUTES, unit='min'),
+                'open': opn, 'high': np.maximum(opn, close), 'low': np.minimum(opn, close),
+                'close': close, 'volume': np.floor(weights * day.volume).astype(np.int64),
+            }))
+        return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+
+    def intraday(self, symbol: str, seconds: int, to_ts: int = None, count: int = None,
+                 from_ts: int = None) -> pd.DataFrame:
+        """Nến intraday khung `seconds` (60 / 900 / 3600), gộp từ nến 1 phút bằng pandas"""
+        key = (symbol, 'minutes')
+        with self._lock:
+            minutes = self._cache.get(key)
+        if minutes is None:
+            daily = self.bars(symbol)
+            minutes = self._minutes(daily) if not daily.empty else pd.DataFrame()
+            with self._lock:
+                self._cache[key] = minutes
+        if minutes.empty:
+            return minutes
+        epoch = _epoch(minutes['time'])
+        mask = np.ones(len(minutes), dtype=bool)
+        if to_ts:
+            mask &= (epoch <= to_ts).to_numpy()
+        if from_ts:
+            mask &= (epoch >= from_ts).to_numpy()
+        df = minutes[mask]
+        if seconds > 60 and not df.empty:
+            df = df.groupby(df['time'].dt.floor(f'{seconds}s'), sort=True).agg(
+                open=('open', 'first'), high=('high', 'max'), low=('low', 'min'),
+                close=('close', 'last'), volume=('volume', 'sum')).reset_index()
+        if count:
+            df = df.tail(count)
+        return df
+
+    def listing(self) -> list:
+        """Danh sách mã niêm yết: universe / mã ghi sẵn / mã tổng hợp cố định"""
+        if self.universe is not None:
+            return sorted(self.universe)
+        if self._recorded is not None:
+            return sorted(self._recorded)
+        rng = random.Random(42)
+        letters = 'ABCDEFGHIKLMNPQRSTUVX'
+        names = set()
+        while len(names) < self.listing_size:
+            names.add(''.join(rng.choice(letters) for _ in range(3)))
+        return sorted(names)
+
+    def bars(self, symbol: str, to_ts: int = None, count: int = None, from_ts: int = None) -> pd.DataFrame:
+        with self._lock:
+            df = self._cache.get(symbol)
+            if df is None:
+                if self._recorded is not None:
+                    df = self._recorded.get(symbol, pd.DataFrame())
+                elif self.universe is not None and symbol not in self.universe:
+                    df = pd.DataFrame()
+                else:
+                    df = self._synthetic(symbol)
+                self._cache[symbol] = df
+        if df.empty:
+            return df
+        epoch = _epoch(df['time'])
+        mask = np.ones(len(df), dtype=bool)
+        if to_ts:
+            mask &= (epoch <= to_ts).to_numpy()
+        if from_ts:
+            mask &= (epoch >= from_ts).to_numpy()
+        out = df[mask]
+        if count:
+            out = out.tail(count)
+        return out
+
+
+class MarketStubHandler(BaseHTTPRequestHandler):
+    bars = BarSource()
+    profiles = {'DNSE': FaultProfile(), 'TCBS': FaultProfile(), 'VCI': FaultProfile()}
+    rng = random.Random(0)
+    lock = threading.Lock()
+    stats = {}
+
+    def log_message(self, *args):
+        pass
+
+    # -------------------------------------------------------------
+    def _send(self, status, body: bytes, headers=None, truncate=False):
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for k, v in (headers or {}).items():
+            self.send_header(k, str(v))
+        self.end_headers()
+        if truncate:
+            body = body[:max(1, len(body) // 2)]
+            self.close_connection = True
+        self.wfile.write(body)
+
+    def _inject(self, source: str):
+        """Áp dụng độ trễ + lỗi, trả về (status, headers, truncate) hoặc None nếu bình thường"""
+        prof = self.profiles[source]
+        with self.lock:
+            r = self.rng.random()
+            latency = prof.latency_ms * math.exp(self.rng.gauss(0, prof.sigma)) / 1000
+            st = self.stats.setdefault(source, {'requests': 0, 'errors': 0, '429': 0, 'truncated': 0})
+            st['requests'] += 1
+            over_limit = not prof.take_token()
+            if over_limit:
+                st['429'] += 1
+        if over_limit:
+            return 429, {'Retry-After': prof.retry_after}, False
+        time.sleep(latency)
+        if prof.dead:
+            return 503, {}, False
+        if r < prof.rate_429:
+            with self.lock:
+                st['429'] += 1
+            return 429, {'Retry-After': prof.retry_after}, False
+        r -= prof.rate_429
+        if r < prof.error_rate:
+            with self.lock:
+                st['errors'] += 1
+            return 500, {}, False
+        r -= prof.error_rate
+        if r < prof.truncate_rate:
+            with self.lock:
+                st['truncated'] += 1
+            return 200, {}, True
+        return None
+
+    def _respond(self, source: str, build_payload):
+        fault = self._inject(source)
+        if fault and fault[0] != 200:
+            status, headers, _ = fault
+            return self._send(status, json.dumps({'error': 'stub fault'}).encode(), headers)
+        payload = build_payload()
+        body = json.dumps(payload, separators=(',', ':')).encode('utf-8')
+        self._send(200, body, truncate=bool(fault))
+
+    # -------------------------------------------------------------
+    def do_GET(self):
+        url = urlparse(self.path)
+        q = {k: v[0] for k, v in parse_qs(url.query).items()}
+        if url.path == DNSE_PATH:
+            return self._respond('DNSE', lambda: self._dnse(q))
+        if url.path == TCBS_PATH:
+            return self._respond('TCBS', lambda: self._tcbs(q))
+        if url.path == TCBS_INTRADAY_PATH:
+            return self._respond('TCBS', lambda: self._tcbs(q, intraday=True))
+        if url.path == LISTING_PATH:
+            return self._respond('VCI', self._listing)
+        self._send(404, b'{"error":"not found"}')
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        length = int(self.headers.get('Content-Length', 0))
+        body = json.loads(self.rfile.read(length) or b'{}')
+        if url.path == VCI_PATH:
+            return self._respond('VCI', lambda: self._vci(body))
+        self._send(404, b'{"error":"not found"}')
+
+    # -------------------------------------------------------------
+    def _dnse(self, q):
+        symbol = q.get('symbol', '')
+        to_ts, from_ts = int(q.get('to', 0)) or None, int(q.get('from', 0)) or None
+        seconds = DNSE_RESOLUTIONS.get(q.get('resolution', '1D'))
+        if seconds:
+            df = self.bars.intraday(symbol, seconds, to_ts, from_ts=from_ts)
+        else:
+            df = self.bars.bars(symbol, to_ts, from_ts=from_ts)
+        if df.empty:
+            return {'t': [], 'o': [], 'h': [], 'l': [], 'c': [], 'v': [], 'nextTime': 0}
+        return {
+            't': _epoch(df['time']).tolist(),
+            'o': (df['open'] / 1000).round(2).tolist(),
+            'h': (df['high'] / 1000).round(2).tolist(),
+            'l': (df['low'] / 1000).round(2).tolist(),
+            'c': (df['close'] / 1000).round(2).tolist(),
+            'v': df['volume'].astype('int64').tolist(),
+            'nextTime': 0,
+        }
+
+    def _tcbs(self, q, intraday: bool = False):
+        symbol = q.get('ticker', '')
+        args = (int(q.get('to', 0)) or None, int(q.get('countBack', 0)) or None)
+        if intraday:
+            df = self.bars.intraday(symbol, TCBS_RESOLUTIONS.get(q.get('resolution'), 60), *args)
+        else:
+            df = self.bars.bars(symbol, *args)
+        fmt = '%Y-%m-%dT%H:%M:%S.000Z' if intraday else '%Y-%m-%dT00:00:00.000Z'
+        data = [{
+            'open': float(r.open), 'high': float(r.high), 'low': float(r.low),
+            'close': float(r.close), 'volume': int(r.volume),
+            'tradingDate': r.time.strftime(fmt),
+        } for r in df.itertuples()]
+        return {'ticker': symbol, 'data': data}
+
+    def _listing(self):
+        out = []
+        for i, symbol in enumerate(self.bars.listing()):
+            board = ('HSX', 'HSX', 'HSX', 'HNX', 'UPCOM')[zlib.crc32(symbol.encode()) % 5]
+            out.append({'id': i, 'symbol': symbol, 'type': 'STOCK', 'board': board,
+                        'organName': f'Cong ty {symbol}', 'productGrpID': 'STO'})
+        # Chứng quyền / ETF / trái phiếu: phải bị lọc bỏ
+        out.append({'id': len(out), 'symbol': 'CACB2401', 'type': 'COVERED_WARRANT', 'board': 'HSX'})
+        out.append({'id': len(out), 'symbol': 'E1VFVN30', 'type': 'ETF', 'board': 'HSX'})
+        out.append({'id': len(out), 'symbol': 'VIC', 'type': 'STOCK', 'board': 'DELISTED'})
+        return out
+
+    def _vci(self, body):
+        out = []
+        seconds = VCI_TIME_FRAMES.get(body.get('timeFrame'))
+        for symbol in body.get('symbols', []):
+            if seconds:
+                df = self.bars.intraday(symbol, seconds, body.get('to'), body.get('countBack'))
+            else:
+                df = self.bars.bars(symbol, body.get('to'), body.get('countBack'))
+            if df.empty:
+                continue
+            out.append({
+                'symbol': symbol,
+                'o': df['open'].tolist(), 'h': df['high'].tolist(),
+                'l': df['low'].tolist(), 'c': df['close'].tolist(),
+                'v': df['volume'].astype('int64').tolist(),
+                't': [str(t) for t in _epoch(df['time']).tolist()],
+                'accumulatedVolume': [], 'accumulatedValue': [], 'minBatchTruncTime': None,
+            })
+        return out
+
+
+def start_market_stub(port: int = 0, profiles: dict = None, recorded_file: str = None,
+                      universe: list = None, seed: int = 0):
+    """Chạy stub trong thread nền, trả về (server, base_url)"""
+    attrs = {
+        'bars': BarSource(recorded_file, universe),
+        'profiles': {'DNSE': FaultProfile(), 'TCBS': FaultProfile(), 'VCI': FaultProfile(),
+                     **(profiles or {})},
+        'rng': random.Random(seed),
+        'lock': threading.Lock(),
+        'stats': {},
+    }
+    handler = type('Handler', (MarketStubHandler,), attrs)
+    server = ThreadingHTTPServer(('127.0.0.1', port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def point_fetchers_at(base_url: str):
+    """Trỏ các fetcher thật (src.data_fetcher, src.v3_generator) về stub"""
+    from src import data_fetcher, universe
+    universe.ListingFetcher.BASE_URL = base_url + LISTING_PATH
+    data_fetcher.DNSEFetcher.BASE_URL = base_url + DNSE_PATH
+    data_fetcher.TCBSFetcher.BASE_URL = base_url + TCBS_PATH
+    data_fetcher.TCBSFetcher.INTRADAY_URL = base_url + TCBS_INTRADAY_PATH
+    data_fetcher.VCIFetcher.BASE_URL = base_url + VCI_PATH
+    try:
+        from src import v3_generator
+        v3_generator.DNSE_BASE = base_url + DNSE_PATH
+    except ImportError:
+        pass
+
+
+def parse_faults(specs: list, base: FaultProfile) -> dict:
+    """['TCBS:error_rate=0.3', 'VCI:dead=1'] → {source: FaultProfile}"""
+    profiles = {}
+    for name in ('DNSE', 'TCBS', 'VCI'):
+        profiles[name] = FaultProfile(**{k: v for k, v in vars(base).items() if not k.startswith('_')})
+    for spec in specs or []:
+        source, _, rest = spec.partition(':')
+        profiles[source.upper()].update(rest)
+    return profiles
+
+
+def add_fault_args(ap: argparse.ArgumentParser):
+    ap.add_argument('--latency-ms', type=float, default=50.0, help='median latency (ms)')
+    ap.add_argument('--sigma', type=float, default=0.5, help='lognormal sigma (tail)')
+    ap.add_argument('--error-rate', type=float, default=0.0)
+    ap.add_argument('--rate-429', type=float, default=0.0)
+    ap.add_argument('--truncate-rate', type=float, default=0.0)
+    ap.add_argument('--max-rps', type=float, default=0.0, help='real per-source rate limit (429 above it)')
+    ap.add_argument('--fault', action='append', default=[],
+                    help="per-source override, e.g. TCBS:error_rate=0.3,latency_ms=400 or VCI:dead=1")
+    ap.add_argument('--recorded', help='raw_data.csv to serve instead of synthetic bars')
+
+
+def profiles_from_args(args) -> dict:
+    base = FaultProfile(args.latency_ms, args.sigma, args.error_rate, args.rate_429,
+                        truncate_rate=args.truncate_rate, max_rps=args.max_rps)
+    return parse_faults(args.fault, base)
+
+
+if __name__ == '__main__':
+    ap = argparse.ArgumentParser(description='DNSE/TCBS/VCI stub server')
+    ap.add_argument('--port', type=int, default=8766)
+    add_fault_args(ap)
+    args = ap.parse_args()
+
+    server, url = start_market_stub(args.port, profiles_from_args(args), args.recorded)
+    print(f"Market stub listening on {url}  (Ctrl+C to stop)")
+    print(f"  DNSE {url}{DNSE_PATH}\n  TCBS {url}{TCBS_PATH}\n  VCI  {url}{VCI_PATH}")
+    print(f"  Listing {url}{LISTING_PATH}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -1,11 +1,18 @@
 """
 VN Stock Sniper - Main V5
 Chạy toàn bộ quy trình: Lấy data → Phân tích → AI → Lưu lịch sử → Tạo Dashboard
+
+    python main.py                 # chạy đầy đủ trên 1 máy
+    python main.py --shard 2/4     # chỉ lấy data + phân tích shard 2/4 (data/shards)
+    python main.py --merge         # gộp các shard rồi chạy tiếp AI → lịch sử → dashboard
+    python main.py --force         # chạy cả khi không có phiên mới (nghỉ lễ / cuối tuần)
 """
 
+import argparse
 import os
 import sys
 from datetime import datetime
+import pandas as pd
 import pytz
 
 # Thêm path
@@ -15,7 +22,21 @@ from src.data_fetcher import DataFetcher
 from src.analyzer import TechnicalAnalyzer
 from src.ai_analyzer import AIAnalyzer
 from src.dashboard_generator import DashboardGenerator
-from src.config import TIMEZONE, HISTORY_DIR, DATA_DIR
+from src.config import TIMEZONE, HISTORY_DIR, DATA_DIR, RAW_DATA_FILE, NET_CASSETTE_MODE
+from src import cassette
+from src.sharding import parse_shard, write_shard, merge_shards
+from src.trading_calendar import TradingCalendar
+from src.bitmap_index import BitmapIndex
+
+
+def market_has_new_session(force: bool = False) -> bool:
+    """Bỏ qua cả lần chạy khi không có phiên mới (nghỉ lễ / cuối tuần / đã xử lý)"""
+    if force or NET_CASSETTE_MODE == "replay":
+        return True
+    run, reason = TradingCalendar().should_run()
+    if not run:
+        print(f"🏖️ Bỏ qua: {reason} (--force để chạy lại)")
+    return run
 
 
 def save_history(report: str, analyzed_df):
@@ -33,14 +54,44 @@ def save_history(report: str, analyzed_df):
     if analyzed_df is not None and not analyzed_df.empty:
         data_file = f"{HISTORY_DIR}/{today}_data.csv"
         analyzed_df.to_csv(data_file, index=False)
+        BitmapIndex().build(today, analyzed_df)
 
     print(f"✅ Đã lưu lịch sử: {today}")
 
 
-def run():
-    """Chạy toàn bộ quy trình"""
+def run_shard(shard: tuple, force: bool = False):
+    """Shard i/N: lấy data + phân tích phần universe của shard, ghi artifact riêng"""
+    if not market_has_new_session(force):
+        return
+    start_time = datetime.now()
+    cassette.install()
+
+    print("="*60)
+    print(f"🧩 VN STOCK SNIPER - SHARD {shard[0]}/{shard[1]}")
+    print(f"⏰ {start_time.strftime('%d/%m/%Y %H:%M:%S')}")
+    print("="*60)
+
+    fetcher = DataFetcher(shard=shard)
+    raw_df = fetcher.run()
+    if raw_df.empty:
+        print("❌ Không lấy được dữ liệu!")
+        raw_df = pd.DataFrame(columns=['time', 'open', 'high', 'low', 'close', 'volume', 'symbol'])
+
+    analyzed_df = TechnicalAnalyzer().analyze_all(raw_df)
+
+    duration = (datetime.now() - start_time).total_seconds()
+    write_shard(shard, raw_df, analyzed_df,
+                {'source': fetcher.fetcher._active_source, 'duration_s': round(duration, 1)})
+    print(f"⏱️ Thời gian: {duration:.1f} giây")
+
+
+def run(merge: bool = False, force: bool = False):
+    """Chạy toàn bộ quy trình (merge=True: lấy data từ các shard thay vì fetch)"""
+    if not merge and not market_has_new_session(force):
+        return
 
     start_time = datetime.now()
+    cassette.install()
 
     print("="*60)
     print("🚀 VN STOCK SNIPER - BẮT ĐẦU")
@@ -57,20 +108,32 @@ def run():
         print("📥 BƯỚC 1: LẤY DỮ LIỆU")
         print("="*60)
 
-        fetcher = DataFetcher()
-        raw_df = fetcher.run()
+        analyzer = TechnicalAnalyzer()
 
-        if raw_df.empty:
-            print("❌ Không lấy được dữ liệu!")
-            return
+        if merge:
+            raw_df, merged_df = merge_shards()
+            if merged_df.empty:
+                print("❌ Không có kết quả shard để gộp!")
+                return
+            if not raw_df.empty:
+                DataFetcher().save_data(raw_df, RAW_DATA_FILE)
+        else:
+            fetcher = DataFetcher()
+            raw_df = fetcher.run()
+
+            if raw_df.empty:
+                print("❌ Không lấy được dữ liệu!")
+                return
 
         # === BƯỚC 2: PHÂN TÍCH KỸ THUẬT ===
         print("\n" + "="*60)
         print("📊 BƯỚC 2: PHÂN TÍCH KỸ THUẬT")
         print("="*60)
 
-        analyzer = TechnicalAnalyzer()
-        analyzed_df = analyzer.run(raw_df)
+        if merge:
+            analyzed_df = analyzer.finalize(merged_df)
+        else:
+            analyzed_df = analyzer.run(raw_df)
         signals_df = analyzer.get_signals(analyzed_df)
 
         # === BƯỚC 3: PHÂN TÍCH AI ===
@@ -127,4 +190,18 @@ def run():
 
 
 if __name__ == "__main__":
-    run()
+    parser = argparse.ArgumentParser(description="VN Stock Sniper")
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument("--shard", help="chỉ chạy shard i/N (fetch + phân tích), vd 1/4")
+    group.add_argument("--merge", action="store_true", help="gộp data/shards rồi chạy tiếp pipeline")
+    parser.add_argument("--force", action="store_true", help="chạy cả khi không có phiên mới (nghỉ lễ / cuối tuần)")
+    args = parser.parse_args()
+
+    if args.shard:
+        try:
+            shard = parse_shard(args.shard)
+        except ValueError as e:
+            parser.error(str(e))
+        run_shard(shard, force=args.force)
+    else:
+        run(merge=args.merge, force=args.force)
@@ -17,7 +17,11 @@ except ImportError:
     ANTHROPIC_AVAILABLE = False
     print("⚠️ anthropic chưa được cài đặt")
 
-from src.config import CLAUDE_API_KEY, ANALYZED_DATA_FILE, SIGNALS_FILE, PORTFOLIO_FILE
+from src.config import (
+    CLAUDE_API_KEY, CLAUDE_MODEL, ANALYZED_DATA_FILE, SIGNALS_FILE, PORTFOLIO_FILE,
+    EXPIRED_SIGNALS_FILE, AI_SUMMARY_TOKEN_BUDGET
+)
+from src.ai_cache import ResponseCache
 
 
 def _safe(val, default=0):
@@ -28,6 +32,111 @@ def _safe(val, default=0):
     return val
 
 
+# === COMPACT ENCODING ===
+# Cờ boolean gộp thành 1 chuỗi ký tự trong cột 'flags'
+FLAG_CODES = [
+    ('macd_bullish', 'M'), ('macd_accelerating', 'A'), ('ma_aligned', 'L'),
+    ('above_ma200', 'H'), ('above_ma50', 'F'), ('above_ma20', 'T'),
+    ('bb_squeeze', 'Q'), ('vol_surge', 'V'), ('breakout_20', 'B'), ('breakout_50', 'X'),
+]
+FLAG_LEGEND = ("M=MACD bullish, A=MACD tăng tốc, L=MA5>MA10>MA20>MA50, H=trên MA200, "
+               "F=trên MA50, T=trên MA20, Q=BB squeeze, V=volume surge, "
+               "B=breakout 20 phiên, X=breakout 50 phiên")
+
+# Số chữ số thập phân theo cột (mặc định 1)
+PRECISION = {
+    'close': 0, 'support': 0, 'resistance': 0, 'entry_price': 0,
+    'stars': 0, 'signal_age': 0, 'age': 0,
+    'vol_ratio': 2, 'atr_percent': 2, 'lr_slope_pct': 3,
+}
+
+
+def estimate_tokens(text: str) -> int:
+    """Ước lượng số token: ~4 ký tự ASCII/token, ký tự tiếng Việt có dấu ~1.5 ký tự/token"""
+    non_ascii = sum(1 for ch in text if ord(ch) > 127)
+    return int((len(text) - non_ascii) / 4 + non_ascii / 1.5) + 1
+
+
+def _format_column(series: pd.Series, col: str) -> pd.Series:
+    """Định dạng 1 cột thành chuỗi với độ chính xác cố định"""
+    if col == 'channel':
+        return series.fillna('').astype(str).str.split().str[-1].fillna('-')
+    if pd.api.types.is_bool_dtype(series):
+        return series.map({True: '1', False: '0'}).fillna('-')
+    if pd.api.types.is_numeric_dtype(series):
+        digits = PRECISION.get(col, 1)
+        values = pd.to_numeric(series, errors='coerce').replace([np.inf, -np.inf], np.nan)
+        out = values.map(lambda v: f"{v:.{digits}f}" if pd.notna(v) else '-')
+        return out
+    return series.fillna('').astype(str).replace('', '-').str.replace('|', '/', regex=False)
+
+
+def encode_table(df: pd.DataFrame) -> list:
+    """DataFrame → [header, row, ...] dạng 'a|b|c', cột boolean gộp vào 'flags'"""
+    flag_cols = [(c, code) for c, code in FLAG_CODES if c in df.columns]
+    value_cols = [c for c in df.columns if c not in dict(flag_cols)]
+
+    parts = [_format_column(df[c], c) for c in value_cols]
+    header = list(value_cols)
+    if flag_cols:
+        flags = pd.Series([''] * len(df), index=df.index)
+        for col, code in flag_cols:
+            on = df[col].fillna(False).astype(bool)
+            flags = flags + np.where(on, code, '')
+        parts.append(flags.replace('', '-'))
+        header.append('flags')
+
+    rows = ['|'.join(header)]
+    if parts:
+        joined = parts[0]
+        for p in parts[1:]:
+            joined = joined + '|' + p
+        rows += joined.tolist()
+    return rows
+
+
+def fit_blocks_to_budget(blocks: list, budget: int, fixed_tokens: int = 0) -> str:
+    """Ghép các bảng, bớt dòng ở bảng ưu tiên thấp nhất cho tới khi vừa ngân sách token"""
+    def render(b):
+        n = len(b['rows'])
+        title = b['title'].format(n=b['total'])
+        if n < b['total']:
+            title += f" [rút gọn {n}/{b['total']} dòng]"
+        if not b['rows']:
+            empty = b['empty'] if b['total'] == 0 else "(Lược bỏ do giới hạn độ dài.)"
+            return f"{title}\n{empty}\n"
+        return title + "\n" + "\n".join(b['header'] + b['rows']) + "\n"
+
+    def total_tokens():
+        return fixed_tokens + sum(estimate_tokens(render(b)) for b in blocks)
+
+    for b in sorted(blocks, key=lambda x: x['priority']):
+        while len(b['rows']) > b['min_rows'] and total_tokens() > budget:
+            b['rows'].pop()
+
+    return "\n".join(render(b) for b in blocks)
+
+
+def clean_records(records: list) -> list:
+    """Làm sạch NaN/NumPy types để json.dumps"""
+    out = []
+    for r in records:
+        item = {}
+        for k, v in r.items():
+            if isinstance(v, float) and (math.isnan(v) or math.isinf(v)):
+                item[k] = None
+            elif isinstance(v, (np.integer,)):
+                item[k] = int(v)
+            elif isinstance(v, (np.floating,)):
+                item[k] = round(float(v), 2)
+            elif isinstance(v, (np.bool_,)):
+                item[k] = bool(v)
+            else:
+                item[k] = v
+        out.append(item)
+    return out
+
+
 class AIAnalyzer:
     """Phân tích đa góc nhìn bằng Claude AI"""
 
@@ -42,7 +151,12 @@ Nguyên tắc phân tích của bạn:
 - Thẳng thắn: nếu thị trường xấu, nói rõ "không nên mua", đừng cố tìm cơ hội khi không có
 - Viết bằng tiếng Việt, rõ ràng, có cấu trúc, dễ đọc trên web dashboard"""
 
-    def __init__(self):
+    MAX_TOKENS = 6000
+
+    def __init__(self, force_refresh: bool = None):
+        cache_kwargs = {} if force_refresh is None else {'force_refresh': force_refresh}
+        self.cache = ResponseCache(**cache_kwargs)
+
         if ANTHROPIC_AVAILABLE and CLAUDE_API_KEY:
             self.client = Anthropic(api_key=CLAUDE_API_KEY)
         else:
@@ -55,7 +169,8 @@ Nguyên tắc phân tích của bạn:
                 return json.load(f)
         return {"positions": [], "cash_percent": 100}
 
-    def prepare_data_summary(self, df: pd.DataFrame, signals_df: pd.DataFrame, portfolio: dict) -> str:
+    def prepare_data_summary(self, df: pd.DataFrame, signals_df: pd.DataFrame, portfolio: dict,
+                             expired_df: pd.DataFrame = None) -> str:
         """Chuẩn bị dữ liệu chi tiết cho AI"""
 
         today = datetime.now().strftime("%d/%m/%Y")
@@ -95,7 +210,7 @@ Nguyên tắc phân tích của bạn:
                     'support', 'resistance',
                     'lr_slope_pct', 'channel_position', 'atr_percent']
         available_cols = [c for c in cols_top if c in df.columns]
-        top_15 = df.head(10)[available_cols].to_dict('records')
+        top_15 = df.head(10)[available_cols]
 
         # === SIGNALS DETAIL ===
         sig_cols = ['symbol', 'close', 'quality_score', 'momentum_score', 'total_score',
@@ -106,20 +221,32 @@ Nguyên tắc phân tích của bạn:
                     'support', 'resistance', 'atr_percent',
                     'breakout_20', 'breakout_50',
                     'lr_slope_pct', 'channel_position',
-                    'above_ma200', 'above_ma50', 'above_ma20']
+                    'above_ma200', 'above_ma50', 'above_ma20',
+                    'signal_status', 'signal_age', 'signal_start', 'entry_score']
         available_sig = [c for c in sig_cols if c in signals_df.columns] if not signals_df.empty else []
-        buy_signals = signals_df[available_sig].head(15).to_dict('records') if available_sig else []
+        buy_signals = signals_df[available_sig].head(15) if available_sig else None
+
+        # === SIGNAL LIFECYCLE ===
+        sig_new = sig_cont = 0
+        if not signals_df.empty and 'signal_status' in signals_df.columns:
+            sig_new = int((signals_df['signal_status'] == 'NEW').sum())
+            sig_cont = int((signals_df['signal_status'] == 'CONTINUING').sum())
+        expired_cols = ['symbol', 'signal', 'start_date', 'age', 'entry_score', 'entry_price']
+        expired = None
+        if expired_df is not None and not expired_df.empty:
+            available_exp = [c for c in expired_cols if c in expired_df.columns]
+            expired = expired_df[available_exp].head(15)
 
         # === SELL SIGNALS ===
         sell_df = df[df['sell_signal'].notna() & (df['sell_signal'] != '')]
         sell_cols = ['symbol', 'close', 'sell_signal', 'channel', 'rsi', 'mfi',
                      'macd_bullish', 'vol_ratio', 'stars']
         available_sell = [c for c in sell_cols if c in sell_df.columns]
-        sell_signals = sell_df[available_sell].head(10).to_dict('records') if not sell_df.empty else []
+        sell_signals = sell_df[available_sell].head(10) if not sell_df.empty else None
 
         # === WORST STOCKS (downtrend, low score) ===
         worst = df.tail(10)[['symbol', 'close', 'total_score', 'stars', 'channel',
-                              'rsi', 'sell_signal']].to_dict('records') if len(df) >= 10 else []
+                              'rsi', 'sell_signal']] if len(df) >= 10 else None
 
         # === PORTFOLIO ===
         positions = portfolio.get('positions', [])
@@ -137,31 +264,29 @@ Nguyên tắc phân tích của bạn:
                 pos['macd_bullish'] = bool(stock_row.iloc[0].get('macd_bullish', False))
                 pos['sell_signal'] = stock_row.iloc[0].get('sell_signal', '')
 
-        # === CLEAN NaN ===
-        def clean(records):
-            out = []
-            for r in records:
-                item = {}
-                for k, v in r.items():
-                    if isinstance(v, float) and (math.isnan(v) or math.isinf(v)):
-                        item[k] = None
-                    elif isinstance(v, (np.integer,)):
-                        item[k] = int(v)
-                    elif isinstance(v, (np.floating,)):
-                        item[k] = round(float(v), 2)
-                    elif isinstance(v, (np.bool_,)):
-                        item[k] = bool(v)
-                    else:
-                        item[k] = v
-                out.append(item)
-            return out
-
-        top_15 = clean(top_15)
-        buy_signals = clean(buy_signals)
-        sell_signals = clean(sell_signals)
-        worst = clean(worst)
-
-        summary = f"""
+        # === COMPACT TABLES (header + rows, cờ boolean gộp vào cột flags) ===
+        def block(priority, min_rows, title, data, empty_text):
+            rows = encode_table(data) if data is not None and not data.empty else []
+            return {'priority': priority, 'min_rows': min_rows, 'title': title,
+                    'header': rows[:1], 'rows': rows[1:], 'total': len(rows[1:]),
+                    'empty': empty_text}
+
+        sig_title = (f"5. TÍN HIỆU MUA ({{n}} mã - {sig_new} MỚI hôm nay, {sig_cont} TIẾP DIỄN; "
+                     f"signal_age = số phiên liên tiếp, entry_score = điểm lúc tín hiệu xuất hiện):")
+        blocks = [
+            block(3, 5, "4. TOP {n} CỔ PHIẾU (xếp theo tổng điểm Quality + Momentum):",
+                  top_15, "Không có dữ liệu."),
+            block(4, 5, sig_title, buy_signals, "Không có tín hiệu mua hôm nay."),
+            block(1, 0, "5b. TÍN HIỆU MUA HẾT HẠN HÔM NAY ({n} mã):",
+                  expired, "Không có tín hiệu hết hạn."),
+            block(2, 3, "6. TÍN HIỆU BÁN ({n} mã):", sell_signals, "Không có tín hiệu bán."),
+            block(0, 0, "7. CỔ PHIẾU YẾU NHẤT (bottom {n}):", worst, "Không có dữ liệu."),
+        ]
+
+        positions_text = (json.dumps(clean_records(positions), ensure_ascii=False, separators=(',', ':'))
+                          if positions else "Chưa có vị thế nào.")
+
+        head = f"""
 === DỮ LIỆU THỊ TRƯỜNG CHỨNG KHOÁN VIỆT NAM - {today} ===
 
 1. MARKET BREADTH (Sức khỏe thị trường):
@@ -183,23 +308,16 @@ Nguyên tắc phân tích của bạn:
 3. PHÂN BỐ CHẤT LƯỢNG:
 - 5 sao: {star_5} mã | 4 sao: {star_4} mã | 3 sao: {star_3} mã
 
-4. TOP 10 CỔ PHIẾU (xếp theo tổng điểm Quality + Momentum):
-{json.dumps(top_15, indent=2, ensure_ascii=False)}
-
-5. TÍN HIỆU MUA ({len(buy_signals)} mã):
-{json.dumps(buy_signals, indent=2, ensure_ascii=False) if buy_signals else "Không có tín hiệu mua hôm nay."}
-
-6. TÍN HIỆU BÁN ({len(sell_signals)} mã):
-{json.dumps(sell_signals, indent=2, ensure_ascii=False) if sell_signals else "Không có tín hiệu bán."}
-
-7. CỔ PHIẾU YẾU NHẤT (bottom 10):
-{json.dumps(worst, indent=2, ensure_ascii=False)}
-
+ĐỊNH DẠNG BẢNG: dòng đầu là tên cột, các cột cách nhau bởi "|", "-" = không có dữ liệu.
+Cột flags: {FLAG_LEGEND}
+"""
+        tail = f"""
 8. PORTFOLIO HIỆN TẠI:
 - Tiền mặt: {cash_pct}%
-- Vị thế: {json.dumps(positions, indent=2, ensure_ascii=False) if positions else "Chưa có vị thế nào."}
+- Vị thế: {positions_text}
 """
-        return summary
+        return head + fit_blocks_to_budget(blocks, AI_SUMMARY_TOKEN_BUDGET,
+                                           estimate_tokens(head + tail)) + tail
 
     def build_analysis_prompt(self, data_summary: str) -> str:
         return f"""Dựa trên dữ liệu thị trường chứng khoán Việt Nam dưới đây, hãy viết báo cáo phân tích chuyên sâu.
@@ -225,7 +343,7 @@ Phân tích BỨC TRANH TỔNG THỂ dựa trên market breadth:
 
 Cho MỖI tín hiệu mua (nếu có), phân tích CHI TIẾT:
 
-**[MÃ CỔ PHIẾU] - [Loại tín hiệu: BREAKOUT/MOMENTUM/PULLBACK/REVERSAL]**
+**[MÃ CỔ PHIẾU] - [Loại tín hiệu: BREAKOUT/MOMENTUM/PULLBACK/REVERSAL] - [MỚI / Tiếp diễn N phiên]**
 - **Điểm mạnh**: Liệt kê 3-4 yếu tố kỹ thuật hỗ trợ (dựa trên data thực)
 - **Điểm yếu / Rủi ro**: Liệt kê 2-3 yếu tố cần cảnh giác
 - **Độ tin cậy tín hiệu**: Cao / Trung bình / Thấp (và lý do)
@@ -243,6 +361,7 @@ Nếu KHÔNG có tín hiệu mua hoặc tín hiệu quá yếu, nói rõ: "Hôm
 
 - **Mã quá mua (RSI > 70)**: Liệt kê và đánh giá nguy cơ điều chỉnh
 - **Mã có tín hiệu bán**: Phân tích từng mã có sell signal
+- **Tín hiệu mua vừa hết hạn**: Mã nào vừa mất tín hiệu, có cần thoát vị thế không?
 - **Mã đang yếu nhất**: Những mã nào cần tránh?
 - **Rủi ro vĩ mô**: Nhận định ngắn về rủi ro chung
 
@@ -283,17 +402,23 @@ LƯU Ý QUAN TRỌNG:
 """
 
     def analyze_with_ai(self, data_summary: str) -> str:
+        prompt = self.build_analysis_prompt(data_summary)
+
+        cache_key = self.cache.make_key(CLAUDE_MODEL, self.SYSTEM_PROMPT, prompt, self.MAX_TOKENS)
+        cached = self.cache.get(cache_key)
+        if cached is not None:
+            print("⚡ Dùng kết quả AI đã cache (cùng dữ liệu)")
+            return cached
+
         if not self.client:
             return "❌ Claude API chưa được cấu hình. Vui lòng thêm CLAUDE_API_KEY."
 
-        prompt = self.build_analysis_prompt(data_summary)
-
         try:
             print("🤖 Đang gọi Claude AI phân tích...")
 
             response = self.client.messages.create(
-                model="claude-sonnet-4-5-20250929",
-                max_tokens=6000,
+                model=CLAUDE_MODEL,
+                max_tokens=self.MAX_TOKENS,
                 system=self.SYSTEM_PROMPT,
                 messages=[
                     {"role": "user", "content": prompt}
@@ -303,6 +428,10 @@ LƯU Ý QUAN TRỌNG:
             result = response.content[0].text
             print("✅ AI phân tích xong")
 
+            self.cache.put(cache_key, result, CLAUDE_MODEL,
+                           {'input_tokens': response.usage.input_tokens,
+                            'output_tokens': response.usage.output_tokens})
+
             return result
 
         except Exception as e:
@@ -326,8 +455,12 @@ LƯU Ý QUAN TRỌNG:
             else:
                 signals_df = pd.DataFrame()
 
+        expired_df = pd.DataFrame()
+        if os.path.exists(EXPIRED_SIGNALS_FILE):
+            expired_df = pd.read_csv(EXPIRED_SIGNALS_FILE)
+
         portfolio = self.load_portfolio()
-        data_summary = self.prepare_data_summary(analyzed_df, signals_df, portfolio)
+        data_summary = self.prepare_data_summary(analyzed_df, signals_df, portfolio, expired_df)
         report = self.analyze_with_ai(data_summary)
 
         return report
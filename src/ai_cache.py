@@ -0,0 +1,92 @@
+"""
+VN Stock Sniper - AI Response Cache
+Cache bền vững cho các lời gọi Claude (AIAnalyzer + V3 generator)
+
+Key = sha256(model, system prompt, prompt, max_tokens) → chạy lại thủ công
+(workflow_dispatch) hoặc retry dashboard với cùng dữ liệu trả kết quả ngay,
+không tốn tiền/thời gian gọi API.
+
+- TTL: AI_CACHE_TTL_HOURS
+- Giới hạn: AI_CACHE_MAX_ENTRIES (xóa entry ít dùng nhất)
+- Bỏ qua cache: AI_CACHE_REFRESH=1 hoặc force_refresh=True
+"""
+
+import hashlib
+import json
+import os
+import time
+
+from src.config import AI_CACHE_DIR, AI_CACHE_TTL_HOURS, AI_CACHE_MAX_ENTRIES, AI_CACHE_REFRESH
+
+
+class ResponseCache:
+    """Cache response Claude trên đĩa, mỗi entry 1 file JSON"""
+
+    def __init__(self, cache_dir: str = AI_CACHE_DIR, ttl_hours: float = AI_CACHE_TTL_HOURS,
+                 max_entries: int = AI_CACHE_MAX_ENTRIES, force_refresh: bool = AI_CACHE_REFRESH):
+        self.cache_dir = cache_dir
+        self.ttl_seconds = ttl_hours * 3600
+        self.max_entries = max_entries
+        self.force_refresh = force_refresh
+
+    @staticmethod
+    def make_key(model: str, system: str, prompt: str, max_tokens: int) -> str:
+        payload = json.dumps([model, system, prompt, max_tokens], ensure_ascii=False)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def get(self, key: str):
+        """Trả về text đã cache, hoặc None nếu miss/hết hạn/force refresh"""
+        if self.force_refresh:
+            return None
+        path = self._path(key)
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+        except (json.JSONDecodeError, OSError):
+            self.delete(key)
+            return None
+
+        if time.time() - entry.get('created_at', 0) > self.ttl_seconds:
+            self.delete(key)
+            return None
+
+        os.utime(path)  # Đánh dấu vừa dùng (LRU theo mtime)
+        return entry.get('text')
+
+    def put(self, key: str, text: str, model: str = "", usage: dict = None):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        entry = {
+            'created_at': time.time(),
+            'model': model,
+            'usage': usage or {},
+            'text': text,
+        }
+        tmp = self._path(key) + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(entry, f, ensure_ascii=False)
+        os.replace(tmp, self._path(key))
+        self._evict()
+
+    def delete(self, key: str):
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+
+    def _evict(self):
+        """Giữ tối đa max_entries file, xóa file dùng lâu nhất"""
+        files = [os.path.join(self.cache_dir, f) for f in os.listdir(self.cache_dir)
+                 if f.endswith('.json')]
+        if len(files) <= self.max_entries:
+            return
+        files.sort(key=os.path.getmtime)
+        for path in files[:len(files) - self.max_entries]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
@@ -17,8 +17,10 @@ from src.config import (
     Q_RATING_5, Q_RATING_4, Q_RATING_3, Q_RATING_2,
     M_RATING_5, M_RATING_4, M_RATING_3, M_RATING_2,
     CHANNEL_UPTREND_THRESHOLD, CHANNEL_DOWNTREND_THRESHOLD,
-    RAW_DATA_FILE, ANALYZED_DATA_FILE, SIGNALS_FILE, DATA_DIR
+    RAW_DATA_FILE, ANALYZED_DATA_FILE, SIGNALS_FILE, DATA_DIR, PANEL_DIR
 )
+from src.signal_tracker import SignalTracker
+from src.panel import PricePanel
 
 
 class TechnicalAnalyzer:
@@ -481,8 +483,10 @@ class TechnicalAnalyzer:
         df = self.calculate_all_indicators(df)
         
         # Lấy dòng cuối
-        latest = df.iloc[-1].to_dict()
-        
+        return self.score_latest(df.iloc[-1].to_dict())
+    
+    def score_latest(self, latest: dict) -> dict:
+        """Điểm + rating + tín hiệu cho dòng chỉ báo mới nhất (dùng chung với live mode)"""
         # Tính điểm
         latest['quality_score'] = self.calculate_quality_score(latest)
         latest['momentum_score'] = self.calculate_momentum_score(latest)
@@ -510,19 +514,28 @@ class TechnicalAnalyzer:
         
         return latest
     
-    def analyze_all(self, df: pd.DataFrame) -> pd.DataFrame:
-        """Phân tích tất cả các mã"""
-        if df.empty:
+    def _iter_stocks(self, data):
+        """(mã, DataFrame 1 mã) từ long frame hoặc PricePanel"""
+        if isinstance(data, PricePanel):
+            for symbol in data.symbols:
+                yield symbol, data.history(symbol)
+        else:
+            # groupby 1 lần thay vì lọc boolean toàn bảng cho từng mã
+            for symbol, stock_df in data.groupby('symbol', sort=False):
+                yield symbol, stock_df.copy()
+    
+    def analyze_all(self, df) -> pd.DataFrame:
+        """Phân tích tất cả các mã (df: long frame hoặc PricePanel)"""
+        if len(df) == 0:
             return pd.DataFrame()
         
         print("\n📊 Đang phân tích kỹ thuật...")
         
         results = []
-        symbols = df['symbol'].unique()
+        symbols = df.symbols if isinstance(df, PricePanel) else df['symbol'].unique()
         
-        for i, symbol in enumerate(symbols):
+        for i, (symbol, stock_df) in enumerate(self._iter_stocks(df)):
             try:
-                stock_df = df[df['symbol'] == symbol].copy()
                 result = self.analyze_single_stock(stock_df)
                 
                 if result:
@@ -566,15 +579,19 @@ class TechnicalAnalyzer:
         
         return signals
     
-    def run(self, df: pd.DataFrame = None) -> pd.DataFrame:
+    def run(self, df=None) -> pd.DataFrame:
         """Chạy phân tích"""
         print("="*60)
         print("📊 BẮT ĐẦU PHÂN TÍCH KỸ THUẬT")
         print("="*60)
         
         if df is None:
-            # Đọc từ file
-            if os.path.exists(RAW_DATA_FILE):
+            # Đọc từ file: panel memory-mapped nếu không cũ hơn raw_data.csv
+            raw_mtime = os.path.getmtime(RAW_DATA_FILE) if os.path.exists(RAW_DATA_FILE) else 0
+            panel = PricePanel.open(PANEL_DIR) if PricePanel.mtime(PANEL_DIR) >= raw_mtime else None
+            if panel is not None:
+                df = panel
+            elif os.path.exists(RAW_DATA_FILE):
                 df = pd.read_csv(RAW_DATA_FILE)
             else:
                 print("❌ Không có dữ liệu để phân tích")
@@ -583,6 +600,14 @@ class TechnicalAnalyzer:
         # Phân tích
         results = self.analyze_all(df)
         
+        return self.finalize(results)
+    
+    def finalize(self, results: pd.DataFrame) -> pd.DataFrame:
+        """Vòng đời tín hiệu + lưu analyzed/signals (dùng chung cho chạy thường và gộp shard)"""
+        # Vòng đời tín hiệu (mới / tiếp diễn / hết hạn)
+        if not results.empty:
+            results, _ = SignalTracker().run(results)
+        
         # Lưu
         self.save_results(results)
         
@@ -0,0 +1,172 @@
+"""
+VN Stock Sniper - Columnar Bars
+Decode nhanh response dạng cột (DNSE / VCI: {"t": [...], "o": [...], ...}) thẳng
+từ bytes sang mảng NumPy, và gom nhiều mã vào 1 buffer cột cấp phát trước.
+
+    cols = decode_columnar(resp.content, scale=1000)   # {t, o, h, l, c, v} hoặc None
+    buf = BarBuffer(capacity=300 * 260)
+    buf.append('FPT', cols)
+    df = buf.to_frame()                                # 1 DataFrame cho cả batch
+
+- t: int64 epoch giây (UTC), o/h/l/c: float64, v: int64
+- decode_columnar trả None khi payload không đúng dạng (nhiều mã, thiếu cột...)
+  → caller dùng đường json.loads cũ
+"""
+
+import re
+import warnings
+
+import numpy as np
+import pandas as pd
+
+COLUMNS = ('t', 'o', 'h', 'l', 'c', 'v')
+FRAME_COLUMNS = ['time', 'open', 'high', 'low', 'close', 'volume', 'symbol']
+
+_ARRAY_PATTERNS = {key: re.compile(rb'"' + key.encode() + rb'"\s*:\s*\[([^\[\]]*)\]')
+                   for key in COLUMNS}
+
+
+def _parse_numbers(segment: bytes) -> np.ndarray:
+    """'1,2.5,null,"3"' → float64 array (null → NaN)"""
+    if not segment.strip():
+        return np.empty(0, dtype=np.float64)
+    if b'"' in segment:
+        segment = segment.replace(b'"', b'')
+    if b'null' in segment:
+        segment = segment.replace(b'null', b'nan')
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', DeprecationWarning)   # token lạ: fromstring dừng sớm
+        return np.fromstring(segment, dtype=np.float64, sep=',')
+
+
+def _finish(raw: dict, scale: float) -> dict:
+    """Mảng float thô → kiểu cột chuẩn; None nếu độ dài lệch nhau"""
+    n = len(raw['t'])
+    if n == 0 or any(len(raw[k]) != n for k in COLUMNS):
+        return None
+    t = raw['t'].astype(np.int64)
+    if t[0] > 1e12:           # epoch mili giây
+        t //= 1000
+    cols = {'t': t}
+    for key in ('o', 'h', 'l', 'c'):
+        cols[key] = raw[key] * scale if scale != 1 else raw[key]
+    cols['v'] = np.nan_to_num(raw['v']).astype(np.int64)
+    return cols
+
+
+def decode_columnar(content: bytes, scale: float = 1.0) -> dict:
+    """Bytes response → {t, o, h, l, c, v} mảng NumPy (không qua list Python)"""
+    raw = {}
+    for key, pattern in _ARRAY_PATTERNS.items():
+        found = pattern.findall(content)
+        if len(found) != 1:
+            return None
+        try:
+            raw[key] = _parse_numbers(found[0])
+        except ValueError:
+            return None
+        if found[0].count(b',') + 1 != len(raw[key]) and len(raw[key]):
+            return None       # fromstring dừng sớm ở token lạ
+    return _finish(raw, scale)
+
+
+def columns_from_dict(data: dict, scale: float = 1.0) -> dict:
+    """Đường chậm: dict đã json.loads → cùng định dạng cột"""
+    if not isinstance(data, dict) or any(k not in data for k in COLUMNS):
+        return None
+    raw = {k: np.array([np.nan if x is None else x for x in data[k]], dtype=np.float64)
+           for k in COLUMNS}
+    return _finish(raw, scale)
+
+
+def columns_from_frame(df: pd.DataFrame) -> dict:
+    """DataFrame (time, open, ..., volume) → định dạng cột (cho nguồn không phải dạng cột)"""
+    if df is None or df.empty:
+        return None
+    time_col = pd.to_datetime(df['time'])
+    if getattr(time_col.dt, 'tz', None) is not None:
+        time_col = time_col.dt.tz_convert(None)
+    return {
+        't': ((time_col - pd.Timestamp(0)) // pd.Timedelta(seconds=1)).to_numpy(np.int64),
+        'o': df['open'].to_numpy(np.float64),
+        'h': df['high'].to_numpy(np.float64),
+        'l': df['low'].to_numpy(np.float64),
+        'c': df['close'].to_numpy(np.float64),
+        'v': np.nan_to_num(df['volume'].to_numpy(np.float64)).astype(np.int64),
+    }
+
+
+def frame_from_columns(cols: dict, symbol: str) -> pd.DataFrame:
+    """Cột của 1 mã → DataFrame chuẩn (time, open, high, low, close, volume, symbol)"""
+    if not cols or not len(cols['t']):
+        return pd.DataFrame()
+    df = pd.DataFrame({
+        'time': pd.to_datetime(cols['t'], unit='s'),
+        'open': cols['o'],
+        'high': cols['h'],
+        'low': cols['l'],
+        'close': cols['c'],
+        'volume': cols['v'],
+    })
+    df['symbol'] = symbol
+    return df[FRAME_COLUMNS]
+
+
+class BarBuffer:
+    """Buffer cột cấp phát trước cho cả batch, tăng gấp đôi khi đầy"""
+
+    def __init__(self, capacity: int = 4096):
+        capacity = max(int(capacity), 1)
+        self.t = np.empty(capacity, dtype=np.int64)
+        self.o = np.empty(capacity, dtype=np.float64)
+        self.h = np.empty(capacity, dtype=np.float64)
+        self.l = np.empty(capacity, dtype=np.float64)
+        self.c = np.empty(capacity, dtype=np.float64)
+        self.v = np.empty(capacity, dtype=np.int64)
+        self.code = np.empty(capacity, dtype=np.int32)
+        self.symbols = []
+        self.n = 0
+
+    def __len__(self):
+        return self.n
+
+    def _reserve(self, extra: int):
+        need = self.n + extra
+        if need <= len(self.t):
+            return
+        size = max(need, 2 * len(self.t))
+        for name in ('t', 'o', 'h', 'l', 'c', 'v', 'code'):
+            old = getattr(self, name)
+            new = np.empty(size, dtype=old.dtype)
+            new[:self.n] = old[:self.n]
+            setattr(self, name, new)
+
+    def append(self, symbol: str, cols: dict):
+        """Thêm các nến của 1 mã (cols: định dạng decode_columnar)"""
+        if not cols:
+            return
+        k = len(cols['t'])
+        if not k:
+            return
+        self._reserve(k)
+        end = self.n + k
+        for key in COLUMNS:
+            getattr(self, key)[self.n:end] = cols[key]
+        self.code[self.n:end] = len(self.symbols)
+        self.symbols.append(symbol)
+        self.n = end
+
+    def to_frame(self) -> pd.DataFrame:
+        if not self.n:
+            return pd.DataFrame()
+        n = self.n
+        df = pd.DataFrame({
+            'time': pd.to_datetime(self.t[:n], unit='s'),
+            'open': self.o[:n],
+            'high': self.h[:n],
+            'low': self.l[:n],
+            'close': self.c[:n],
+            'volume': self.v[:n],
+            'symbol': np.array(self.symbols, dtype=object)[self.code[:n]],
+        })
+        return df[FRAME_COLUMNS]
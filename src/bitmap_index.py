@@ -0,0 +1,359 @@
+"""
+VN Stock Sniper - Bitmap Index
+Bitmap nén (1 bit / mã) cho các cột bool và cột phân loại nhỏ của mỗi snapshot
+lịch sử: vol_surge, bb_squeeze, ma_aligned, macd_cross_up, buy_signal, channel,
+stars, ... AND / OR / NOT / COUNT trên nhiều ngày thành phép toán bit.
+
+data/bitmaps/:
+    symbols.json        trục mã chung, chỉ thêm vào cuối → bitmap các ngày thẳng hàng
+    YYYY-MM-DD.npz      keys [K], bits uint8 [K, ceil(S/8)], source_mtime của CSV
+
+Điều kiện (term):
+    'vol_surge'            cột bool đúng
+    'channel=XANH'         giá trị phân loại (so theo nhãn, bỏ emoji: '🟢 XANH' → XANH)
+    'buy_signal'           cột phân loại có giá trị (không rỗng)
+    'stars=5'              cột số nguyên ít giá trị
+    '!bb_squeeze'          phủ định (trong các mã có mặt ngày đó)
+
+    idx = BitmapIndex()
+    idx.count('2026-10-16', ['vol_surge', 'channel=XANH'])          # AND
+    idx.breadth(['vol_surge', 'channel=XANH', 'stars=5'], days=30)  # số mã mỗi ngày
+    idx.screen(['ma_aligned', 'above_ma200'], days=7, across='all') # thỏa cả 7 ngày
+
+    python -m src.bitmap_index --build                   # tạo / cập nhật index
+    python -m src.bitmap_index vol_surge channel=XANH --days 30
+
+Index được tạo khi lưu snapshot (main.save_history) và tự tạo lại khi CSV mới hơn.
+"""
+
+import argparse
+import json
+import os
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from src.config import HISTORY_DIR, BITMAP_DIR, BITMAP_MAX_CARDINALITY
+from src.history_store import HistoryStore, _LRU, _to_date_str
+from src.screener import _label
+
+PRESENT = '__present__'
+SKIP_COLUMNS = {'symbol', 'time'}
+
+if hasattr(np, 'bitwise_count'):
+    def popcount(bits: np.ndarray) -> np.ndarray:
+        """Số bit 1 theo trục cuối"""
+        return np.bitwise_count(bits).sum(axis=-1, dtype=np.int64)
+else:
+    _POP8 = np.unpackbits(np.arange(256, dtype=np.uint8)[:, None], axis=1).sum(axis=1)
+
+    def popcount(bits: np.ndarray) -> np.ndarray:
+        """Số bit 1 theo trục cuối"""
+        return _POP8[bits].sum(axis=-1, dtype=np.int64)
+
+
+def _bool_values(s: pd.Series):
+    """Cột bool (kể cả object True/False/NaN khi đọc CSV) → mảng bool, ngược lại None"""
+    if pd.api.types.is_bool_dtype(s.dtype):
+        return s.to_numpy(dtype=bool)
+    if s.dtype == object:
+        present = s.dropna()
+        if len(present) and present.map(type).isin([bool, np.bool_]).all():
+            return s.fillna(False).astype(bool).to_numpy()
+    return None
+
+
+def frame_bitmaps(df: pd.DataFrame) -> dict:
+    """{key: mask bool theo dòng} cho các cột bool / phân loại của 1 snapshot"""
+    out = {}
+    for col in df.columns:
+        if col in SKIP_COLUMNS:
+            continue
+        s = df[col]
+        values = _bool_values(s)
+        if values is not None:
+            out[col] = values
+            continue
+        is_int = pd.api.types.is_integer_dtype(s.dtype)
+        if not is_int and pd.api.types.is_numeric_dtype(s.dtype):
+            continue
+        codes, uniques = pd.factorize(s)
+        if len(uniques) > BITMAP_MAX_CARDINALITY:
+            continue
+        if not is_int:
+            # 'buy_signal' đứng 1 mình = có giá trị (không rỗng), như trong src.screener
+            nonempty = np.array([bool(_label(u)) for u in uniques] + [False])
+            out[col] = nonempty[codes]
+        for i, value in enumerate(uniques):
+            label = str(int(value)) if is_int else _label(value)
+            if not label:
+                continue
+            key = f"{col}={label}"
+            hit = codes == i
+            out[key] = out[key] | hit if key in out else hit
+    return out
+
+
+def parse_term(term) -> tuple:
+    """'!channel=XANH' → (phủ định, cột, key)"""
+    term = str(term).strip()
+    neg = term.startswith('!')
+    term = term.lstrip('!').strip()
+    col, sep, value = term.partition('=')
+    col = col.strip()
+    return neg, col, f"{col}={_label(value)}" if sep else col
+
+
+class _Day:
+    """Bitmap của 1 ngày: bảng key → dòng + ma trận bit [K, B]"""
+
+    def __init__(self, keys, bits: np.ndarray, source_mtime: int):
+        self.index = {k: i for i, k in enumerate(keys)}
+        self.columns = {k.partition('=')[0] for k in keys}
+        self.bits = bits
+        self.source_mtime = source_mtime
+
+    def row(self, key: str, nbytes: int) -> np.ndarray:
+        i = self.index.get(key)
+        if i is None:
+            return np.zeros(nbytes, dtype=np.uint8)
+        row = self.bits[i]
+        if len(row) < nbytes:   # ngày cũ có ít mã hơn trục hiện tại
+            row = np.concatenate([row, np.zeros(nbytes - len(row), dtype=np.uint8)])
+        return row
+
+
+class BitmapIndex:
+    """Bitmap theo (ngày, cột / giá trị) trên các snapshot data/history"""
+
+    def __init__(self, store: HistoryStore = None, index_dir: str = BITMAP_DIR):
+        self.store = store or HistoryStore(HISTORY_DIR)
+        self.index_dir = index_dir
+        self._days = _LRU(1024)
+        self._lock = threading.RLock()    # tạo bitmap: trục mã + file .npz dùng chung giữa các thread
+        self._load_symbols()
+
+    # ------------------------------------------------------------------
+    # Trục mã
+    # ------------------------------------------------------------------
+    def _load_symbols(self):
+        path = os.path.join(self.index_dir, 'symbols.json')
+        self.symbols = []
+        if os.path.exists(path):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    self.symbols = json.load(f)
+            except (json.JSONDecodeError, OSError):
+                # Trục mã hỏng → bitmap cũ không còn nghĩa, tạo lại từ đầu
+                self.symbols = []
+                self._drop_days()
+        self.sym_index = {s: i for i, s in enumerate(self.symbols)}
+
+    def _drop_days(self):
+        if os.path.isdir(self.index_dir):
+            for name in os.listdir(self.index_dir):
+                if name.endswith('.npz'):
+                    os.remove(os.path.join(self.index_dir, name))
+        self._days.clear()
+
+    def _positions(self, symbols) -> np.ndarray:
+        """Vị trí trên trục mã (thêm mã mới vào cuối và ghi symbols.json)"""
+        new = [s for s in dict.fromkeys(symbols) if s not in self.sym_index]
+        if new:
+            for s in new:
+                self.sym_index[s] = len(self.symbols)
+                self.symbols.append(s)
+            os.makedirs(self.index_dir, exist_ok=True)
+            with open(os.path.join(self.index_dir, 'symbols.json'), 'w', encoding='utf-8') as f:
+                json.dump(self.symbols, f, ensure_ascii=False)
+        return np.fromiter((self.sym_index[s] for s in symbols), dtype=np.int64, count=len(symbols))
+
+    @property
+    def nbytes(self) -> int:
+        return (len(self.symbols) + 7) // 8
+
+    # ------------------------------------------------------------------
+    # Tạo / nạp
+    # ------------------------------------------------------------------
+    def _path(self, d: str) -> str:
+        return os.path.join(self.index_dir, f"{d}.npz")
+
+    def build(self, d, df: pd.DataFrame = None) -> _Day:
+        """Tạo bitmap cho ngày d (từ df nếu có, ngược lại đọc snapshot CSV)"""
+        with self._lock:
+            return self._build(_to_date_str(d), df)
+
+    def _build(self, d: str, df: pd.DataFrame) -> _Day:
+        self.store._scan()
+        source_mtime = self.store._files[d][1] if d in self.store._files else 0
+        if df is None:
+            df = pd.read_csv(self.store._files[d][0])
+        df = df.drop_duplicates('symbol')
+        pos = self._positions(df['symbol'].astype(str).tolist())
+        masks = {PRESENT: np.ones(len(df), dtype=bool), **frame_bitmaps(df)}
+        keys = list(masks)
+        dense = np.zeros((len(keys), len(self.symbols)), dtype=bool)
+        for k, mask in enumerate(masks.values()):
+            dense[k, pos[mask]] = True
+        bits = np.packbits(dense, axis=1)
+        os.makedirs(self.index_dir, exist_ok=True)
+        with open(self._path(d), 'wb') as f:
+            np.savez(f, keys=np.array(keys), bits=bits, source_mtime=np.int64(source_mtime))
+        day = _Day(keys, bits, source_mtime)
+        self._days.put(d, day)
+        return day
+
+    def day(self, d: str) -> _Day:
+        """Bitmap của ngày d: cache → file .npz → tạo lại nếu thiếu / cũ hơn CSV"""
+        self.store._scan()
+        if d not in self.store._files:
+            raise ValueError(f"không có snapshot ngày {d}")
+        source_mtime = self.store._files[d][1]
+        day = self._days.get(d)
+        if day is not None and day.source_mtime == source_mtime:
+            return day
+        with self._lock:
+            day = self._days.get(d)     # thread khác có thể vừa nạp / tạo xong
+            if day is not None and day.source_mtime == source_mtime:
+                return day
+            path = self._path(d)
+            if os.path.exists(path):
+                try:
+                    with np.load(path) as z:
+                        day = _Day(z['keys'].tolist(), z['bits'], int(z['source_mtime']))
+                except (OSError, ValueError, KeyError):
+                    day = None
+                if day is not None and day.source_mtime == source_mtime \
+                        and day.bits.shape[1] <= self.nbytes:
+                    self._days.put(d, day)
+                    return day
+            return self._build(d, None)
+
+    def update(self, start=None, end=None, days: int = None) -> int:
+        """Tạo bitmap cho mọi snapshot chưa có / đã đổi, trả về số ngày được tạo"""
+        built = 0
+        for d in self.store.list_dates(start, end, days):
+            path = self._path(d)
+            stale = True
+            if os.path.exists(path):
+                with np.load(path) as z:
+                    stale = int(z['source_mtime']) != self.store._files[d][1]
+            if stale:
+                self.build(d)
+                built += 1
+        return built
+
+    # ------------------------------------------------------------------
+    # Truy vấn
+    # ------------------------------------------------------------------
+    def _term_bits(self, day: _Day, term, nbytes: int) -> np.ndarray:
+        neg, col, key = parse_term(term)
+        bits = day.row(key, nbytes)
+        if neg:
+            bits = day.row(PRESENT, nbytes) & ~bits
+        return bits
+
+    def _check(self, terms: list, dates: list):
+        if not dates:
+            return
+        latest = self.day(dates[-1])
+        unknown = [col for _, col, _ in map(parse_term, terms) if col not in latest.columns]
+        if unknown:
+            raise ValueError(f"không có bitmap cho cột {', '.join(unknown)} "
+                             f"(chỉ cột bool / ≤{BITMAP_MAX_CARDINALITY} giá trị)")
+
+    def mask(self, d, terms: list, how: str = 'and') -> np.ndarray:
+        """Bitmap (packed) các mã thỏa `terms` trong ngày d, kết hợp AND hoặc OR"""
+        day = self.day(_to_date_str(d))
+        nbytes = self.nbytes
+        rows = [self._term_bits(day, t, nbytes) for t in terms]
+        if not rows:
+            return day.row(PRESENT, nbytes)
+        op = np.bitwise_and if how == 'and' else np.bitwise_or
+        return op.reduce(rows)
+
+    def count(self, d, terms: list, how: str = 'and') -> int:
+        return int(popcount(self.mask(d, terms, how)))
+
+    def symbols_of(self, bits: np.ndarray) -> list:
+        idx = np.flatnonzero(np.unpackbits(bits, count=len(self.symbols)))
+        return [self.symbols[i] for i in idx]
+
+    def matrix(self, terms: list, how: str = 'and', start=None, end=None,
+               days: int = None) -> tuple:
+        """(dates, bitmap [D, B]) của điều kiện trên từng ngày trong khoảng"""
+        dates = self.store.list_dates(start, end, days)
+        self._check(terms, dates)
+        days_ = [self.day(d) for d in dates]     # nạp trước: trục mã có thể dài thêm
+        nbytes = self.nbytes
+        op = np.bitwise_and if how == 'and' else np.bitwise_or
+        out = np.zeros((len(dates), nbytes), dtype=np.uint8)
+        for i, day in enumerate(days_):
+            rows = [self._term_bits(day, t, nbytes) for t in terms] or [day.row(PRESENT, nbytes)]
+            out[i] = op.reduce(rows)
+        return dates, out
+
+    def breadth(self, terms: list, start=None, end=None, days: int = None) -> pd.DataFrame:
+        """Số mã thỏa từng điều kiện mỗi ngày (index = ngày, columns = term, + 'total')"""
+        dates = self.store.list_dates(start, end, days)
+        self._check(terms, dates)
+        days_ = [self.day(d) for d in dates]
+        nbytes = self.nbytes
+        counts = np.zeros((len(dates), len(terms) + 1), dtype=np.int64)
+        for i, day in enumerate(days_):
+            block = np.stack([self._term_bits(day, t, nbytes) for t in terms]
+                             + [day.row(PRESENT, nbytes)])
+            counts[i] = popcount(block)
+        df = pd.DataFrame(counts, index=pd.Index(dates, name='date'), columns=list(terms) + ['total'])
+        return df
+
+    def screen(self, terms: list, how: str = 'and', across: str = 'last', start=None, end=None,
+               days: int = None) -> list:
+        """Mã thỏa điều kiện: ngày cuối ('last'), mọi ngày ('all') hoặc ít nhất 1 ngày ('any')"""
+        dates, bits = self.matrix(terms, how, start, end, days)
+        if not dates:
+            return []
+        if across == 'all':
+            combined = np.bitwise_and.reduce(bits, axis=0)
+        elif across == 'any':
+            combined = np.bitwise_or.reduce(bits, axis=0)
+        else:
+            combined = bits[-1]
+        return self.symbols_of(combined)
+
+
+def main():
+    ap = argparse.ArgumentParser(description='Bitmap index trên lịch sử snapshot')
+    ap.add_argument('terms', nargs='*', help="vd: vol_surge channel=XANH stars=5 '!bb_squeeze'")
+    ap.add_argument('--build', action='store_true', help='tạo / cập nhật bitmap cho mọi snapshot')
+    ap.add_argument('--days', type=int, default=30)
+    ap.add_argument('--any', action='store_true', help='OR các điều kiện (mặc định AND)')
+    args = ap.parse_args()
+
+    idx = BitmapIndex()
+    if args.build:
+        t0 = time.perf_counter()
+        built = idx.update()
+        print(f"🧮 Tạo {built} ngày ({len(idx.store.list_dates())} snapshot, {len(idx.symbols)} mã)"
+              f" trong {time.perf_counter() - t0:.1f}s → {idx.index_dir}")
+    if not args.terms:
+        return
+    try:
+        t0 = time.perf_counter()
+        df = idx.breadth(args.terms, days=args.days)
+        elapsed = time.perf_counter() - t0
+        how = 'or' if args.any else 'and'
+        symbols = idx.screen(args.terms, how=how, days=args.days)
+    except ValueError as e:
+        print(f"❌ {e}")
+        return
+    print(df.tail(args.days).to_string())
+    print(f"⏱️ {len(df)} ngày trong {elapsed * 1000:.1f}ms")
+    print(f"🎯 {len(symbols)} mã thỏa ({' AND '.join(args.terms) if how == 'and' else ' OR '.join(args.terms)})"
+          f" ngày {df.index[-1] if len(df) else '-'}: {', '.join(symbols[:30])}")
+
+
+if __name__ == '__main__':
+    main()
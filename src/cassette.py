@@ -0,0 +1,309 @@
+"""
+VN Stock Sniper - Network Cassette (record / replay)
+Ghi lại toàn bộ HTTP response của pipeline (DNSE/TCBS/VCI, fetch_dnse, Claude)
+vào 1 file zip, rồi phát lại offline để tái hiện đúng 1 lần chạy.
+
+- Record:  NET_CASSETTE_MODE=record python main.py
+- Replay:  NET_CASSETTE_MODE=replay NET_CASSETTE=data/cassettes/2025-06-02.zip python main.py
+- Xem:     python -m src.cassette data/cassettes/2025-06-02.zip
+
+Cassette = zip gồm:
+    index.json            danh sách response theo thứ tự ghi
+    blobs/<sha256>.gz     body đã gzip, lưu theo nội dung (trùng body chỉ lưu 1 lần)
+
+Khớp request: method + host/path + query/body JSON đã bỏ tham số thời gian
+(from, to, countBack). Cùng 1 request gọi nhiều lần → phát lại theo đúng thứ tự.
+Riêng Claude (prompt có ngày giờ) nếu không khớp thì lấy response kế tiếp
+cùng endpoint.
+"""
+
+import atexit
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+import zipfile
+from collections import defaultdict, deque
+from datetime import datetime
+from urllib.parse import urlsplit, parse_qsl, urlencode
+
+import pytz
+import requests
+
+from src.config import NET_CASSETTE_MODE, NET_CASSETTE, NET_CASSETTE_DIR, TIMEZONE
+
+# Tham số đổi theo giờ chạy, không dùng để khớp request
+# (countBack = số phiên trong `days` ngày lịch tính tới hôm nay → đổi theo ngày chạy)
+VOLATILE_PARAMS = {'from', 'to', 'countBack'}
+# Endpoint được phép phát lại theo thứ tự khi không khớp chính xác
+SEQUENTIAL_PATHS = ('/v1/messages',)
+# Header không còn đúng sau khi body đã được giải nén
+DROP_HEADERS = {'content-encoding', 'content-length', 'transfer-encoding', 'connection'}
+
+
+class CassetteMiss(requests.ConnectionError):
+    """Replay: không có response nào đã ghi cho request này"""
+
+
+def _normalize_body(body) -> str:
+    if not body:
+        return ''
+    if isinstance(body, str):
+        body = body.encode('utf-8')
+    try:
+        data = json.loads(body)
+    except (ValueError, UnicodeDecodeError):
+        return hashlib.sha256(body).hexdigest()
+    if isinstance(data, dict):
+        data = {k: v for k, v in data.items() if k not in VOLATILE_PARAMS}
+    return json.dumps(data, sort_keys=True, ensure_ascii=False)
+
+
+def request_key(method: str, url: str, body=None):
+    """(route, key): route = 'GET host/path', key = hash của request đã chuẩn hóa"""
+    parts = urlsplit(str(url))
+    route = f"{method.upper()} {parts.netloc}{parts.path}"
+    query = sorted((k, v) for k, v in parse_qsl(parts.query) if k not in VOLATILE_PARAMS)
+    raw = f"{route}?{urlencode(query)}\n{_normalize_body(body)}"
+    return route, hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+def default_path(mode: str = NET_CASSETTE_MODE) -> str:
+    """Record: file theo ngày hôm nay; replay: file mới nhất trong thư mục"""
+    if NET_CASSETTE:
+        return NET_CASSETTE
+    if mode == 'replay' and os.path.isdir(NET_CASSETTE_DIR):
+        files = sorted(f for f in os.listdir(NET_CASSETTE_DIR) if f.endswith('.zip'))
+        if files:
+            return os.path.join(NET_CASSETTE_DIR, files[-1])
+    today = datetime.now(pytz.timezone(TIMEZONE)).strftime('%Y-%m-%d')
+    return os.path.join(NET_CASSETTE_DIR, f"{today}.zip")
+
+
+class Cassette:
+    """Kho response: đọc/ghi zip, tra cứu theo request key"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.entries = []      # [{route, key, status, headers, blob, elapsed}]
+        self.blobs = {}        # sha256 -> gzip bytes
+        self._lock = threading.Lock()
+        self._by_key = defaultdict(deque)
+        self._by_route = defaultdict(deque)
+        self._used = set()
+        self.hits = 0
+        self.misses = 0
+
+    # ------------------------------------------------------------------
+    def load(self):
+        if not os.path.exists(self.path):
+            return self
+        with zipfile.ZipFile(self.path) as zf:
+            self.entries = json.loads(zf.read('index.json'))
+            for name in zf.namelist():
+                if name.startswith('blobs/'):
+                    self.blobs[name[6:-3]] = zf.read(name)
+        for i, e in enumerate(self.entries):
+            self._by_key[e['key']].append(i)
+            self._by_route[e['route']].append(i)
+        return self
+
+    def save(self):
+        if not self.entries:
+            return
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        tmp = self.path + '.tmp'
+        with self._lock, zipfile.ZipFile(tmp, 'w', zipfile.ZIP_STORED) as zf:
+            zf.writestr('index.json', json.dumps(self.entries, ensure_ascii=False))
+            for digest, data in self.blobs.items():
+                zf.writestr(f'blobs/{digest}.gz', data)
+        os.replace(tmp, self.path)
+        size = os.path.getsize(self.path) / 1024
+        print(f"📼 Cassette: {len(self.entries)} response / {len(self.blobs)} blob "
+              f"({size:.0f} KB) → {self.path}")
+
+    # ------------------------------------------------------------------
+    def add(self, method, url, body, status, headers, content: bytes, elapsed: float):
+        route, key = request_key(method, url, body)
+        digest = hashlib.sha256(content).hexdigest()
+        headers = {k: v for k, v in headers.items() if k.lower() not in DROP_HEADERS}
+        with self._lock:
+            if digest not in self.blobs:
+                self.blobs[digest] = gzip.compress(content, mtime=0)
+            self.entries.append({'route': route, 'key': key, 'status': status,
+                                 'headers': headers, 'blob': digest,
+                                 'elapsed': round(elapsed, 4)})
+
+    def lookup(self, method, url, body):
+        """Trả về (status, headers, content) của response kế tiếp, hoặc raise CassetteMiss"""
+        route, key = request_key(method, url, body)
+        with self._lock:
+            idx = self._next(self._by_key[key])
+            if idx is None and any(route.endswith(p) for p in SEQUENTIAL_PATHS):
+                idx = self._next(self._by_route[route])
+            if idx is None:
+                self.misses += 1
+                raise CassetteMiss(f"Cassette miss: {method} {url}")
+            self._used.add(idx)
+            self.hits += 1
+        e = self.entries[idx]
+        return e['status'], e['headers'], gzip.decompress(self.blobs[e['blob']])
+
+    def _next(self, queue: deque):
+        while queue:
+            idx = queue.popleft()
+            if idx not in self._used:
+                return idx
+        return None
+
+    def summary(self) -> dict:
+        routes = defaultdict(int)
+        for e in self.entries:
+            routes[e['route']] += 1
+        return dict(routes)
+
+
+# ======================================================================
+# Patch HTTP clients
+# ======================================================================
+_active = None
+_originals = {}
+
+
+def _requests_send(session, request, **kwargs):
+    if _active.mode == 'replay':
+        status, headers, content = _active.cassette.lookup(request.method, request.url, request.body)
+        resp = requests.Response()
+        resp.status_code = status
+        resp._content = content
+        resp.headers = requests.structures.CaseInsensitiveDict(headers)
+        resp.url = request.url
+        resp.request = request
+        resp.encoding = requests.utils.get_encoding_from_headers(resp.headers)
+        return resp
+
+    t0 = time.time()
+    resp = _originals['requests'](session, request, **kwargs)
+    _active.cassette.add(request.method, request.url, request.body, resp.status_code,
+                         dict(resp.headers), resp.content, time.time() - t0)
+    return resp
+
+
+def _make_httpx_send(name, module):
+    def send(client, request, **kwargs):
+        body = request.content if hasattr(request, 'content') else b''
+        if _active.mode == 'replay':
+            try:
+                status, headers, content = _active.cassette.lookup(request.method, request.url, body)
+            except CassetteMiss as e:
+                raise module.ConnectError(str(e), request=request)
+            return module.Response(status, headers=headers, content=content, request=request)
+
+        t0 = time.time()
+        resp = _originals[name](client, request, **kwargs)
+        cassette = _active.cassette
+
+        def record(raw: bytes):
+            # Body đã giải nén (Content-Encoding bị bỏ khỏi header khi lưu)
+            content = module.Response(resp.status_code, headers=resp.headers, content=raw).content
+            cassette.add(request.method, request.url, body, resp.status_code,
+                         dict(resp.headers), content, time.time() - t0)
+
+        if kwargs.get('stream'):
+            # SSE (Claude stream): chuyển từng chunk cho SDK ngay, ghi cassette khi stream kết thúc
+            resp.stream = _tee_stream(module, resp.stream, record)
+        else:
+            cassette.add(request.method, request.url, body, resp.status_code,
+                         dict(resp.headers), resp.content, time.time() - t0)
+        return resp
+    return send
+
+
+def _tee_stream(module, stream, on_done):
+    """Bọc byte stream của response: giữ bản sao các chunk, gọi on_done(raw) khi đọc hết.
+
+    Stream lỗi / bị đóng giữa chừng thì không ghi (cassette không chứa body cụt)."""
+
+    class TeeStream(module.SyncByteStream):
+        def __init__(self):
+            self.chunks = []
+
+        def __iter__(self):
+            for chunk in stream:
+                self.chunks.append(chunk)
+                yield chunk
+            on_done(b''.join(self.chunks))
+
+        def close(self):
+            stream.close()
+
+    return TeeStream()
+
+
+class _Session:
+    def __init__(self, mode, cassette):
+        self.mode = mode
+        self.cassette = cassette
+
+
+def install(mode: str = NET_CASSETTE_MODE, path: str = None):
+    """Bật record/replay cho requests + httpx (Anthropic SDK). Trả về Cassette hoặc None."""
+    global _active
+    if mode not in ('record', 'replay'):
+        return None
+    if _active is not None:
+        return _active.cassette
+
+    path = path or default_path(mode)
+    cassette = Cassette(path).load()
+    if mode == 'replay' and not cassette.entries:
+        raise FileNotFoundError(f"Cassette trống hoặc không tồn tại: {path}")
+
+    _active = _Session(mode, cassette)
+    _originals['requests'] = requests.Session.send
+    requests.Session.send = _requests_send
+    for name in ('httpx', 'httpx2'):
+        try:
+            module = __import__(name)
+        except ImportError:
+            continue
+        _originals[name] = module.Client.send
+        module.Client.send = _make_httpx_send(name, module)
+
+    atexit.register(uninstall)
+    if mode == 'record':
+        print(f"📼 Record: ghi toàn bộ HTTP vào {path} ({len(cassette.entries)} response có sẵn)")
+    else:
+        print(f"📼 Replay: phát lại offline từ {path} ({len(cassette.entries)} response)")
+    return cassette
+
+
+def uninstall():
+    """Gỡ patch (record: lưu cassette, replay: in số hit/miss)"""
+    global _active
+    if _active is None:
+        return
+    if _active.mode == 'record':
+        _active.cassette.save()
+    else:
+        print(f"📼 Replay: {_active.cassette.hits} hit / {_active.cassette.misses} miss")
+    requests.Session.send = _originals.pop('requests')
+    for name in ('httpx', 'httpx2'):
+        if name in _originals:
+            __import__(name).Client.send = _originals.pop(name)
+    _active = None
+
+
+if __name__ == "__main__":
+    import sys
+
+    path = sys.argv[1] if len(sys.argv) > 1 else default_path('replay')
+    c = Cassette(path).load()
+    raw = sum(len(gzip.decompress(b)) for b in c.blobs.values()) / 1024
+    packed = sum(len(b) for b in c.blobs.values()) / 1024
+    print(f"📼 {path}: {len(c.entries)} response, {len(c.blobs)} blob, "
+          f"{raw:.0f} KB → {packed:.0f} KB gzip")
+    for route, n in sorted(c.summary().items(), key=lambda x: -x[1]):
+        print(f"   {n:>5}  {route}")
@@ -3,18 +3,77 @@ VN Stock Sniper - Configuration
 """
 
 import os
-from dotenv import load_dotenv
 
-load_dotenv()
+try:
+    from dotenv import load_dotenv
+    load_dotenv()
+except ImportError:  # Workflow kiểm tra lịch giao dịch trước khi cài dependencies
+    pass
 
 # === API KEYS ===
 CLAUDE_API_KEY = os.getenv("CLAUDE_API_KEY", "").strip().replace("\n", "").replace("\r", "").replace(" ", "")
+CLAUDE_MODEL = "claude-sonnet-4-5-20250929"
+CLAUDE_STREAM_TIMEOUT = 600  # Giây - V3 streaming, giữ các section đã nhận nếu quá hạn
+
+# === V3 AI MODE ===
+# single: 1 mega-prompt cho tất cả | parallel: 1 request/chỉ số song song + overview
+V3_AI_MODE = os.getenv("V3_AI_MODE", "single").lower()
+V3_AI_CONCURRENCY = int(os.getenv("V3_AI_CONCURRENCY", "4"))
+V3_INDEX_MAX_TOKENS = 5000     # 9 sections / chỉ số
+V3_OVERVIEW_MAX_TOKENS = 3000  # 4 sections overview
 
 # === DATA SETTINGS ===
-TOP_STOCKS_COUNT = 300  # Top 300 mã theo volume (HOSE + HNX)
+TOP_STOCKS_COUNT = int(os.getenv("TOP_STOCKS_COUNT", "300"))  # Top 300 mã theo volume (HOSE + HNX)
 DATA_START_DATE = "2024-01-01"  # Ngày bắt đầu lấy dữ liệu
 DATA_SOURCE = "DNSE+TCBS+VCI"  # Multi-source: DNSE primary + TCBS/VCI fallback (free, no auth)
 
+# === UNIVERSE (xếp hạng thanh khoản) ===
+UNIVERSE_REFRESH_DAYS = 7      # Xếp hạng lại mỗi tuần (lấy danh sách niêm yết đầy đủ)
+UNIVERSE_ADV_WINDOW = 20       # GTGD trung bình 20 phiên
+UNIVERSE_LOOKBACK_DAYS = 35    # Số ngày bars lấy thêm khi xếp hạng (đủ 20 phiên)
+UNIVERSE_EXCHANGES = ['HSX', 'HNX', 'UPCOM']
+UNIVERSE_REFRESH = os.getenv("UNIVERSE_REFRESH", "").lower() in ("1", "true", "yes")  # Ép xếp hạng lại
+
+# === NEGATIVE CACHE (mã không có dữ liệu) ===
+NEGATIVE_CACHE_BASE_DAYS = 1   # Kiểm tra lại sau 1, 2, 4, 8... ngày
+NEGATIVE_CACHE_MAX_DAYS = 30
+
+# === SOURCE HEALTH ===
+SOURCE_HEALTH_TTL_MINUTES = 180   # State nguồn còn hạn → bỏ qua probe lúc khởi động
+
+# === RATE LIMIT (AIMD theo nguồn) ===
+RATE_LIMIT_INITIAL = 6.0          # req/s khi chưa có state (≈ 150ms/request)
+RATE_LIMIT_MIN = 0.5
+RATE_LIMIT_MAX = 50.0
+RATE_LIMIT_INCREASE = 0.25        # +req/s mỗi response khỏe
+RATE_LIMIT_DECREASE = 0.5         # x rate khi 429 / 5xx / timeout
+RATE_LIMIT_LATENCY_FACTOR = 2.0   # Latency > 2x baseline → giảm nhẹ
+
+# === INCREMENTAL FETCH ===
+INCREMENTAL_FETCH = os.getenv("INCREMENTAL_FETCH", "1").lower() in ("1", "true", "yes")  # 0: luôn lấy đầy đủ
+INCREMENTAL_OVERLAP_BARS = 5      # Số phiên chồng lấn so checksum (phát hiện điều chỉnh giá)
+INCREMENTAL_MAX_GAP_DAYS = 20     # Lịch sử cũ hơn → lấy đầy đủ
+
+# === INTRADAY ===
+# Watchlist lấy nến trong phiên → nến ngày tạm tính cho phân tích (trống: tắt)
+INTRADAY_WATCHLIST = [s.strip().upper() for s in os.getenv("INTRADAY_WATCHLIST", "").split(",") if s.strip()]
+INTRADAY_RESOLUTION = os.getenv("INTRADAY_RESOLUTION", "15m")  # 1m | 15m | 1h
+
+# === LIVE MODE (python -m src.live) ===
+LIVE_INTERVAL_SECONDS = int(os.getenv("LIVE_INTERVAL_SECONDS", "15"))  # Chu kỳ lấy nến trong phiên
+LIVE_FETCH_WORKERS = 8            # Số request song song mỗi vòng (vẫn qua rate limiter)
+LIVE_PORT = int(os.getenv("LIVE_PORT", "8765"))  # SSE cho dashboard
+
+# === DATA VALIDATION ===
+PRICE_LIMITS = {'HSX': 0.07, 'HOSE': 0.07, 'HNX': 0.10, 'UPCOM': 0.15}  # Biên độ dao động theo sàn
+PRICE_LIMIT_DEFAULT = 0.15        # Chưa biết sàn → biên độ rộng nhất
+PRICE_LIMIT_TOLERANCE = 0.005     # Sai số làm tròn theo bước giá
+SPLIT_SUSPECT_MOVE = 0.3          # Gap > 30% → nghi chia tách / thưởng chưa điều chỉnh
+VOLUME_SPIKE_FACTOR = 50          # Volume > 50x trung vị của mã
+CALENDAR_MIN_COVERAGE = 0.5       # Ngày giao dịch: >= 50% số mã có nến
+VALIDATE_MAX_GAPS = 5             # Thiếu > 5 phiên → lấy lại
+VALIDATE_MAX_REFETCH = 30         # Tối đa số mã lấy lại mỗi lần chạy
+
 # === INDEX SYMBOLS ===
 INDEX_SYMBOLS = ['VNINDEX', 'HNX-INDEX', 'VN30', 'UPCOM']
 
@@ -80,8 +139,66 @@ DATA_DIR = "data"
 RAW_DATA_FILE = f"{DATA_DIR}/raw_data.csv"
 ANALYZED_DATA_FILE = f"{DATA_DIR}/analyzed_data.csv"
 SIGNALS_FILE = f"{DATA_DIR}/signals.csv"
+UNIVERSE_FILE = f"{DATA_DIR}/universe.json"
+NEGATIVE_CACHE_FILE = f"{DATA_DIR}/negative_cache.json"
+RATE_LIMIT_FILE = f"{DATA_DIR}/rate_limits.json"
+SOURCE_HEALTH_FILE = f"{DATA_DIR}/source_health.json"
+SIGNAL_STATE_FILE = f"{DATA_DIR}/signal_state.json"
+EXPIRED_SIGNALS_FILE = f"{DATA_DIR}/expired_signals.csv"
 PORTFOLIO_FILE = f"{DATA_DIR}/portfolio.json"
 HISTORY_DIR = f"{DATA_DIR}/history"
+SHARD_DIR = f"{DATA_DIR}/shards"  # Artifact từng shard (main.py --shard i/N)
+PANEL_DIR = f"{DATA_DIR}/panel"    # Panel giá memory-mapped [mã, ngày, trường]
+REVISIONS_FILE = f"{DATA_DIR}/revisions.json"  # Mã bị nguồn điều chỉnh lịch sử giá
+LIVE_DIR = "docs/live"  # snapshot.json + delta.json cho dashboard (live mode)
+
+# === PRICE PANEL ===
+PANEL_DTYPE = os.getenv("PANEL_DTYPE", "float64")  # float32: nhẹ 1/2, volume > 16.7 triệu mất chính xác
+PANEL_MAX_AGE_HOURS = 12  # v3 dùng panel thay vì gọi DNSE khi panel mới hơn mức này
+
+# === HISTORY QUERY ===
+HISTORY_CACHE_SIZE = 4096  # Số cột (ngày x cột) giữ trong bộ nhớ
+BITMAP_DIR = f"{DATA_DIR}/bitmaps"   # Bitmap index cột bool / phân loại mỗi snapshot (src.bitmap_index)
+BITMAP_MAX_CARDINALITY = 32          # Cột có nhiều giá trị hơn không lập bitmap
+
+# === QUERY SERVER (python -m src.query_server) ===
+QUERY_PORT = int(os.getenv("QUERY_PORT", "8780"))
+QUERY_CACHE_SIZE = 1024  # Số response (đã mã hóa + gzip) giữ trong bộ nhớ
+
+# === SCREENER (python -m src.screener 'rsi < 35 and vol_ratio > 2') ===
+SCREEN_CACHE_SIZE = 256  # Số biểu thức đã biên dịch / mask giữ trong bộ nhớ
+# Bộ lọc thêm vào tab Screener của dashboard: {tên: (nhãn, biểu thức)}
+SCREEN_PRESETS = {
+    "oversold_surge": ("Quá bán + volume", "rsi < 35 and vol_ratio > 2"),
+    "breakout_uptrend": ("Breakout kênh xanh", 'breakout_20 and channel == "XANH"'),
+    "macd_cross": ("MACD cắt lên", "macd_cross_up and macd_hist > 0"),
+}
+
+# === AI PROMPT ===
+AI_SUMMARY_TOKEN_BUDGET = 5000  # Ngân sách token (ước lượng) cho phần dữ liệu gửi AI
+
+# === AI RESPONSE CACHE ===
+AI_CACHE_DIR = f"{DATA_DIR}/ai_cache"
+AI_CACHE_TTL_HOURS = 24      # Hết hạn sau 24h
+AI_CACHE_MAX_ENTRIES = 30    # Giữ tối đa 30 response (xóa cũ nhất)
+AI_CACHE_REFRESH = os.getenv("AI_CACHE_REFRESH", "").lower() in ("1", "true", "yes")  # Bỏ qua cache
+
+# === NETWORK RECORD / REPLAY ===
+# off | record | replay - ghi/phát lại toàn bộ HTTP (giá + Claude) qua cassette zip
+NET_CASSETTE_MODE = os.getenv("NET_CASSETTE_MODE", "off").lower()
+NET_CASSETTE_DIR = f"{DATA_DIR}/cassettes"
+NET_CASSETTE = os.getenv("NET_CASSETTE", "")  # Mặc định: record → {ngày}.zip, replay → file mới nhất
+if NET_CASSETTE_MODE == "replay":
+    # Replay: lời gọi Claude lấy từ cassette, không từ cache AI hiện tại.
+    # Record vẫn đọc cache (cache hit không gọi HTTP → không có gì để ghi)
+    AI_CACHE_REFRESH = True
+if NET_CASSETTE_MODE == "replay" and not CLAUDE_API_KEY:
+    CLAUDE_API_KEY = "replay"  # Không cần key thật khi chạy offline
 
 # === TIMEZONE ===
 TIMEZONE = "Asia/Ho_Chi_Minh"
+
+# === TRADING CALENDAR ===
+MARKET_OPEN_TIME = "09:00"
+MARKET_CLOSE_TIME = "15:00"  # Sau giờ này phiên hôm nay được tính là đã đóng cửa
+MARKET_HOLIDAYS_FILE = f"{DATA_DIR}/market_holidays.json"  # Bổ sung ngày nghỉ (năm chưa có lịch)
@@ -3,6 +3,7 @@ VN Stock Sniper - Dashboard Generator V8
 Reference design: Sidebar nav, IBM Plex fonts, 11 modules
 """
 
+import numpy as np
 import pandas as pd
 import json
 import os
@@ -12,8 +13,9 @@ import pytz
 
 from src.config import (
     ANALYZED_DATA_FILE, SIGNALS_FILE, PORTFOLIO_FILE,
-    HISTORY_DIR, TIMEZONE
+    HISTORY_DIR, TIMEZONE, EXPIRED_SIGNALS_FILE, SCREEN_PRESETS
 )
+from src.screener import Screener, FrameSource, ScreenError
 
 
 def safe_float(val, default=0):
@@ -63,6 +65,37 @@ def get_signal_label(row):
     return 'TRUNG LAP'
 
 
+def _numeric(df: pd.DataFrame, col: str) -> np.ndarray:
+    """Cột số như safe_float: thiếu / NaN / inf / không phải số → 0"""
+    if col not in df.columns:
+        return np.zeros(len(df))
+    values = pd.to_numeric(df[col], errors='coerce').to_numpy(dtype=np.float64, na_value=np.nan)
+    return np.where(np.isfinite(values), values, 0.0)
+
+
+def _present(df: pd.DataFrame, col: str) -> np.ndarray:
+    """Cột chuỗi có giá trị như safe_str: khác None / NaN / '' / 'nan'"""
+    if col not in df.columns:
+        return np.zeros(len(df), dtype=bool)
+    s = df[col]
+    text = s.astype(str).str.lower()
+    return (s.notna() & (text != '') & (text != 'nan')).to_numpy()
+
+
+def classify_stocks(df: pd.DataFrame) -> pd.DataFrame:
+    """signal_label + score_100 cho mọi mã trong 1 lượt theo cột (cùng quy tắc get_signal_label)"""
+    buy = _present(df, 'buy_signal')
+    sell = _present(df, 'sell_signal')
+    stars = np.trunc(_numeric(df, 'stars'))
+    score = _numeric(df, 'total_score')
+    labels = np.select(
+        [buy & (stars >= 4), buy & (stars >= 3), sell & (stars <= 1), sell, score >= 28, score <= 8],
+        ['MUA MANH', 'MUA', 'BAN MANH', 'BAN', 'MUA', 'BAN'],
+        default='TRUNG LAP')
+    return pd.DataFrame({'signal_label': labels.astype(object),
+                         'score_100': np.round(score / 40 * 100, 0)}, index=df.index)
+
+
 class DashboardGenerator:
     def __init__(self):
         self.timezone = pytz.timezone(TIMEZONE)
@@ -73,12 +106,16 @@ class DashboardGenerator:
     def load_data(self):
         self.analyzed_df = pd.DataFrame()
         self.signals_df = pd.DataFrame()
+        self.expired_df = pd.DataFrame()
         self.portfolio = {"positions": [], "cash_percent": 100}
         self.ai_report = ""
         if os.path.exists(ANALYZED_DATA_FILE):
             self.analyzed_df = pd.read_csv(ANALYZED_DATA_FILE)
+        self.classified = classify_stocks(self.analyzed_df)
         if os.path.exists(SIGNALS_FILE):
             self.signals_df = pd.read_csv(SIGNALS_FILE)
+        if os.path.exists(EXPIRED_SIGNALS_FILE):
+            self.expired_df = pd.read_csv(EXPIRED_SIGNALS_FILE)
         if os.path.exists(PORTFOLIO_FILE):
             with open(PORTFOLIO_FILE, 'r', encoding='utf-8') as f:
                 self.portfolio = json.load(f)
@@ -98,30 +135,28 @@ class DashboardGenerator:
             }
         df = self.analyzed_df
         total = len(df)
-        uptrend = len(df[df['channel'].str.contains('XANH', na=False)])
-        sideways = len(df[df['channel'].str.contains('XÁM', na=False)])
-        downtrend = len(df[df['channel'].str.contains('ĐỎ', na=False)])
+        channel = df['channel'].astype(str)
+        uptrend = int(channel.str.contains('XANH', regex=False).sum())
+        sideways = int(channel.str.contains('XÁM', regex=False).sum())
+        downtrend = int(channel.str.contains('ĐỎ', regex=False).sum())
         advance = decline = unchanged = 0
         if 'change_pct' in df.columns:
-            advance = len(df[df['change_pct'] > 0])
-            decline = len(df[df['change_pct'] < 0])
-            unchanged = len(df[df['change_pct'] == 0])
+            change = df['change_pct'].to_numpy(dtype=np.float64, na_value=np.nan)
+            advance = int((change > 0).sum())
+            decline = int((change < 0).sum())
+            unchanged = int((change == 0).sum())
         elif 'close' in df.columns and 'open' in df.columns:
-            advance = len(df[df['close'] > df['open']])
-            decline = len(df[df['close'] < df['open']])
+            close = df['close'].to_numpy(dtype=np.float64, na_value=np.nan)
+            open_ = df['open'].to_numpy(dtype=np.float64, na_value=np.nan)
+            advance = int((close > open_).sum())
+            decline = int((close < open_).sum())
             unchanged = total - advance - decline
-        buy_strong = buy = neutral = sell = sell_strong = 0
-        for _, row in df.iterrows():
-            label = get_signal_label(row.to_dict())
-            if label == 'MUA MANH': buy_strong += 1
-            elif label == 'MUA': buy += 1
-            elif label == 'BAN MANH': sell_strong += 1
-            elif label == 'BAN': sell += 1
-            else: neutral += 1
+        labels = self.classified['signal_label'].value_counts()
         return {
             'total': total, 'uptrend': uptrend, 'sideways': sideways, 'downtrend': downtrend,
-            'buy_strong': buy_strong, 'buy': buy, 'neutral': neutral,
-            'sell': sell, 'sell_strong': sell_strong,
+            'buy_strong': int(labels.get('MUA MANH', 0)), 'buy': int(labels.get('MUA', 0)),
+            'neutral': int(labels.get('TRUNG LAP', 0)),
+            'sell': int(labels.get('BAN', 0)), 'sell_strong': int(labels.get('BAN MANH', 0)),
             'avg_rsi': round(safe_float(df['rsi'].mean(), 50), 1),
             'avg_mfi': round(safe_float(df['mfi'].mean(), 50), 1),
             'avg_score': round(safe_float(df['total_score'].mean(), 0), 1),
@@ -130,32 +165,37 @@ class DashboardGenerator:
             'advance': advance, 'decline': decline, 'unchanged': unchanged,
         }
 
-    def _clean_for_json(self, records):
-        clean = []
-        for row in records:
-            item = {}
-            for k, v in row.items():
-                if isinstance(v, float) and (math.isnan(v) or math.isinf(v)):
-                    item[k] = None
-                elif isinstance(v, (bool,)):
-                    item[k] = v
-                else:
-                    item[k] = v
-            clean.append(item)
-        return clean
+    def _clean_for_json(self, df: pd.DataFrame) -> list:
+        """DataFrame → list dict, NaN / inf → None (theo cột, không duyệt từng ô)"""
+        if df.empty:
+            return []
+        df = df.replace([np.inf, -np.inf], np.nan).astype(object)
+        return df.where(df.notna(), None).to_dict('records')
 
     def generate_html(self):
         self.load_data()
         stats = self.get_market_stats()
 
-        all_stocks = self.analyzed_df.to_dict('records') if not self.analyzed_df.empty else []
-        signals = self.signals_df.to_dict('records') if not self.signals_df.empty else []
-        clean_stocks = self._clean_for_json(all_stocks)
-        clean_signals = self._clean_for_json(signals)
+        clean_stocks = self._clean_for_json(self.analyzed_df.assign(**self.classified))
+        clean_signals = self._clean_for_json(self.signals_df)
+        clean_expired = self._clean_for_json(self.expired_df)
 
         for stock in clean_stocks:
-            stock['signal_label'] = get_signal_label(stock)
-            stock['score_100'] = round(safe_float(stock.get('total_score', 0)) / 40 * 100, 0)
+            stock['screens'] = []
+
+        # Bộ lọc SCREEN_PRESETS: tính sẵn bằng src.screener, JS chỉ lọc theo tên
+        screens = {}
+        if clean_stocks:
+            screen = Screener(FrameSource(self.analyzed_df))
+            for name, (label, expr) in SCREEN_PRESETS.items():
+                try:
+                    hits = np.flatnonzero(screen.mask(expr))
+                except ScreenError as e:
+                    print(f"⚠️ Bỏ bộ lọc {name}: {e}")
+                    continue
+                screens[name] = label
+                for i in hits:
+                    clean_stocks[i]['screens'].append(name)
 
         positions = self.portfolio.get('positions', [])
         for pos in positions:
@@ -173,11 +213,15 @@ class DashboardGenerator:
         signals_json = json.dumps(clean_signals, ensure_ascii=False, default=str)
         stats_json = json.dumps(stats, ensure_ascii=False)
         positions_json = json.dumps(positions, ensure_ascii=False, default=str)
+        expired_json = json.dumps(clean_expired, ensure_ascii=False, default=str)
+        screens_json = json.dumps(screens, ensure_ascii=False)
 
-        html = self._build_html(stocks_json, signals_json, stats_json, positions_json, ai_escaped)
+        html = self._build_html(stocks_json, signals_json, stats_json, positions_json, ai_escaped,
+                                expired_json, screens_json)
         return html
 
-    def _build_html(self, stocks_json, signals_json, stats_json, positions_json, ai_report):
+    def _build_html(self, stocks_json, signals_json, stats_json, positions_json, ai_report,
+                    expired_json='[]', screens_json='{}'):
         return f'''<!DOCTYPE html>
 <html lang="vi">
 <head>
@@ -354,6 +398,8 @@ const ALL_STOCKS = {stocks_json};
 const ALL_SIGNALS = {signals_json};
 const STATS = {stats_json};
 const POSITIONS = {positions_json};
+const EXPIRED_SIGNALS = {expired_json};
+const SCREENS = {screens_json};
 const AI_REPORT = `{ai_report}`;
 
 // Derived data
@@ -908,6 +954,12 @@ function renderSector(){{
 // ═══════════════════════════════════════════
 // MODULE 5: TRADING SIGNALS
 // ═══════════════════════════════════════════
+function lifeBadge(s){{
+  if(s.signal_status==='NEW') return '<span class="bdg bdg-g" style="font-size:8px">MỚI</span>';
+  if(s.signal_status==='CONTINUING') return `<span class="bdg bdg-b" style="font-size:8px">${{s.signal_age||0}} phiên</span>`;
+  return '';
+}}
+
 function renderSignals(){{
   const sigStocks=DISPLAY_STOCKS.map(s=>{{
     const label=s.signal_label||'TRUNG LAP';
@@ -928,6 +980,8 @@ function renderSignals(){{
 
   const buys=sigStocks.filter(s=>s.type==='BUY');
   const sells=sigStocks.filter(s=>s.type==='SELL');
+  const lifeNew=DISPLAY_STOCKS.filter(s=>s.signal_status==='NEW');
+  const lifeCont=DISPLAY_STOCKS.filter(s=>s.signal_status==='CONTINUING');
   const holds=sigStocks.filter(s=>s.type==='HOLD');
   const top10=sigStocks.slice(0,10);
 
@@ -968,9 +1022,30 @@ function renderSignals(){{
         <div class="sig" style="border-color:var(--g)">
           <span class="sig-name">${{s.symbol}}</span>
           <span class="sig-val up">${{s.score}}/40</span>
+          ${{lifeBadge(s)}}
           <span class="bdg bdg-g" style="font-size:8px">${{s.stars}}★</span>
         </div>`).join('')}}
       </div>
+      <div class="cd cd-sm fade-in d2">
+        <div class="cd-title">Vòng đời tín hiệu</div>
+        <div style="display:flex;gap:6px;margin-bottom:8px">
+          <span class="bdg bdg-g">${{lifeNew.length}} MỚI</span>
+          <span class="bdg bdg-b">${{lifeCont.length}} TIẾP DIỄN</span>
+          <span class="bdg bdg-r">${{EXPIRED_SIGNALS.length}} HẾT HẠN</span>
+        </div>
+        ${{lifeNew.slice(0,4).map(s=>`
+        <div class="sig" style="border-color:var(--g)">
+          <span class="sig-name">${{s.symbol}}</span>
+          <span style="font-size:10px;color:var(--g2)">${{s.buy_signal}}</span>
+          <span class="bdg bdg-g" style="font-size:8px">MỚI</span>
+        </div>`).join('')}}
+        ${{EXPIRED_SIGNALS.slice(0,4).map(e=>`
+        <div class="sig" style="border-color:var(--r)">
+          <span class="sig-name">${{e.symbol}}</span>
+          <span style="font-size:10px;color:var(--t3)">${{e.signal}} · ${{e.age||0}} phiên</span>
+          <span class="bdg bdg-r" style="font-size:8px">HẾT</span>
+        </div>`).join('')}}
+      </div>
       <div class="cd cd-sm fade-in d3">
         <div class="cd-title">Cảnh báo bán ⚠️</div>
         ${{sells.slice(0,4).map(s=>{{
@@ -1193,6 +1268,7 @@ function renderScreener(){{
   else if(scrFilter==='surge') data=data.filter(s=>s.vol_surge);
   else if(scrFilter==='squeeze') data=data.filter(s=>s.bb_squeeze);
   else if(scrFilter==='uptrend') data=data.filter(s=>(s.channel||'').includes('XANH'));
+  else if(SCREENS[scrFilter]) data=data.filter(s=>(s.screens||[]).includes(scrFilter));
 
   // Search
   if(scrSearch) data=data.filter(s=>(s.symbol||'').includes(scrSearch.toUpperCase()));
@@ -1218,6 +1294,7 @@ function renderScreener(){{
       <option value="surge" ${{scrFilter==='surge'?'selected':''}}>Volume đột biến</option>
       <option value="squeeze" ${{scrFilter==='squeeze'?'selected':''}}>BB Squeeze</option>
       <option value="uptrend" ${{scrFilter==='uptrend'?'selected':''}}>Uptrend</option>
+      ${{Object.entries(SCREENS).map(([k,label])=>`<option value="${{k}}" ${{scrFilter===k?'selected':''}}>${{label}}</option>`).join('')}}
     </select>
     <span style="font-size:10px;color:var(--t3)">${{data.length}} / ${{DISPLAY_STOCKS.length}} mã</span>
   </div>
@@ -1379,6 +1456,51 @@ setInterval(tick,1000);tick();
 
 // Init
 renderNav();render();
+
+// ═══════════════════════════════════════════
+// LIVE — python -m src.live
+// ?live → đọc docs/live/delta.json mỗi 15s (?live=5: mỗi 5s), ?live=http://127.0.0.1:8765 → SSE
+// ═══════════════════════════════════════════
+const LIVE_PARAM = new URLSearchParams(location.search).get('live');
+let liveSeq = 0;
+function applyLive(stocks){{
+  Object.entries(stocks||{{}}).forEach(([sym,fields])=>{{
+    const s = ALL_STOCKS.find(x=>x.symbol===sym);
+    if(s) Object.assign(s, fields);
+  }});
+  STOCKS.sort((a,b)=>(b.total_score||0)-(a.total_score||0));
+  DISPLAY_STOCKS.sort((a,b)=>(b.total_score||0)-(a.total_score||0));
+  const act = document.activeElement;
+  if(act && (act.tagName==='INPUT' || act.tagName==='SELECT')) return;  // đang gõ: vẽ lại ở vòng sau
+  const el = document.getElementById('view'), top = el.scrollTop;
+  render(); el.scrollTop = top;
+}}
+// true = lệch seq (mất delta) → cần snapshot
+function onLive(kind, msg){{
+  if(!msg) return false;
+  if(kind==='snapshot'){{ liveSeq = msg.seq; applyLive(msg.stocks); return false; }}
+  if(msg.seq<=liveSeq) return false;
+  if(msg.base!==liveSeq) return true;
+  liveSeq = msg.seq; applyLive(msg.changes); return false;
+}}
+if(LIVE_PARAM!==null){{
+  if(LIVE_PARAM.startsWith('http')){{
+    const base = LIVE_PARAM.replace(/\\/$/,'');
+    const es = new EventSource(base+'/events');
+    es.addEventListener('snapshot', e=>onLive('snapshot', JSON.parse(e.data)));
+    es.addEventListener('delta', e=>{{
+      if(onLive('delta', JSON.parse(e.data)))
+        fetch(base+'/snapshot').then(r=>r.json()).then(s=>onLive('snapshot', s)).catch(()=>{{}});
+    }});
+  }} else {{
+    const get = f=>fetch('live/'+f+'.json?t='+Date.now()).then(r=>r.ok?r.json():null).catch(()=>null);
+    const pollLive = async()=>{{
+      if(onLive('delta', await get('delta'))) onLive('snapshot', await get('snapshot'));
+      setTimeout(pollLive, (+LIVE_PARAM||15)*1000);
+    }};
+    pollLive();
+  }}
+}}
 </script>
 </body>
 </html>'''
@@ -1,18 +1,20 @@
 """
 VN Stock Sniper - Data Fetcher V10
-Universe: Top ~300 ma theo volume (HOSE + HNX)
+Universe: Top ~300 ma theo GTGD 20 phien (src/universe.py, xep hang lai hang tuan)
 Multi-source: DNSE (primary) + TCBS (fallback 1) + VCI (fallback 2)
 
-Sources:
+Sources (resolution: 1D mac dinh, 1m / 15m / 1h cho watchlist intraday):
   1. DNSE: https://services.entrade.com.vn/chart-api/v2/ohlcs/stock
-     - GET, params: symbol, resolution=1D, from (unix), to (unix)
+     - GET, params: symbol, resolution=1D|1|15|1H, from (unix), to (unix)
      - No auth, needs Origin/Referer headers from banggia.dnse.com.vn
      - Prices divided by 1000 (need to multiply back)
      - Source: vietfin library (github.com/vietfin/vietfin)
   2. TCBS: https://apiextaws.tcbs.com.vn/stock-insight/v2/stock/bars-long-term
      - GET, params: resolution=D, ticker, type=stock, to (unix), countBack
+     - Intraday: .../stock-insight/v2/stock/bars, resolution=1|15|60
   3. VCI:  https://trading.vietcap.com.vn/api/chart/OHLCChart/gap-chart
      - POST, json: {timeFrame, symbols, to (unix), countBack}
+     - timeFrame ONE_DAY | ONE_HOUR | ONE_MINUTE (15m: lay 1 phut roi resample)
 """
 
 import pandas as pd
@@ -21,20 +23,52 @@ from datetime import datetime, timedelta
 import time
 import os
 import json
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, as_completed, FIRST_COMPLETED
+from concurrent.futures import TimeoutError as FuturesTimeout
 import requests
 
 from src.config import (
-    DATA_START_DATE, DATA_DIR, RAW_DATA_FILE, TOP_STOCKS_COUNT
+    DATA_START_DATE, RAW_DATA_FILE, PANEL_DIR, TOP_STOCKS_COUNT, NET_CASSETTE_MODE,
+    VALIDATE_MAX_REFETCH, INCREMENTAL_FETCH, INTRADAY_WATCHLIST, INTRADAY_RESOLUTION
 )
+from src.sharding import shard_symbols, shard_dir
+from src.universe import UniverseBuilder
+from src.negative_cache import NegativeCache, OK, EMPTY, ERROR
+from src.rate_limiter import AIMDLimiter, parse_retry_after
+from src.source_health import SourceHealth
+from src.panel import PricePanel
+from src.validator import DataValidator
+from src.incremental import IncrementalUpdater, StoredHistory
+from src.trading_calendar import TradingCalendar
+from src.bars import (BarBuffer, decode_columnar, columns_from_dict, columns_from_frame,
+                      frame_from_columns)
+from src.resample import resample, partial_daily, BARS_PER_SESSION
 
-REQUEST_DELAY = 0.15  # 150ms between requests
 REQUEST_TIMEOUT = 15  # 15s timeout per request
+NOT_FOUND_STATUS = (400, 404, 422)  # Ma khong ton tai: tinh la "rong", khong phai loi
+# days (ngay lich) → countBack (so phien) cho TCBS / VCI
+TRADING_CALENDAR = TradingCalendar()
+
+
+def count_back(days: int, resolution: str = '1D') -> int:
+    """days (ngay lich) → so nen can lay o khung `resolution`"""
+    return TRADING_CALENDAR.count_sessions(days) * BARS_PER_SESSION[resolution]
+
+# Hedged requests: nguon chinh cham hon p90 → gui them 1 request sang nguon khac
+HEDGE_BUDGET = 0.1         # Toi da 10% so request duoc hedge
+HEDGE_BURST = 2            # Cho phep vai hedge dau tien truoc khi du mau
+HEDGE_DEFAULT_DELAY = 2.0  # Giay, khi chua du mau do latency
+HEDGE_MIN_DELAY = 0.3      # Giay, khong hedge som hon muc nay
+HEDGE_MIN_SAMPLES = 20
 
 
 class DNSEFetcher:
     """DNSE/Entrade chart API - No auth required"""
 
     BASE_URL = "https://services.entrade.com.vn/chart-api/v2/ohlcs/stock"
+    RESOLUTIONS = {'1D': '1D', '1m': '1', '15m': '15', '1h': '1H'}
 
     def __init__(self):
         self.session = requests.Session()
@@ -45,41 +79,38 @@ class DNSEFetcher:
             'Referer': 'https://banggia.dnse.com.vn/',
         })
 
-    def get_price_history(self, symbol: str, days: int = 365) -> pd.DataFrame:
+    def get_price_history(self, symbol: str, days: int = 365, resolution: str = '1D') -> pd.DataFrame:
+        return frame_from_columns(self.get_bars(symbol, days, resolution), symbol)
+
+    def get_bars(self, symbol: str, days: int = 365, resolution: str = '1D') -> dict:
+        """Nen dang cot {t, o, h, l, c, v} (NumPy), None neu khong co du lieu"""
         to_ts = int(time.time())
         from_ts = int((datetime.now() - timedelta(days=days)).timestamp())
 
         params = {
             'symbol': symbol,
-            'resolution': '1D',
+            'resolution': self.RESOLUTIONS[resolution],
             'from': from_ts,
             'to': to_ts,
         }
 
         resp = self.session.get(self.BASE_URL, params=params, timeout=REQUEST_TIMEOUT)
         resp.raise_for_status()
-        data = resp.json()
 
         # Response: {"t": [...], "o": [...], "h": [...], "l": [...], "c": [...], "v": [...]}
-        if not data or 't' not in data or not data['t']:
-            return pd.DataFrame()
-
-        df = pd.DataFrame({
-            'time': pd.to_datetime(data['t'], unit='s'),
-            'open': np.array(data['o'], dtype=float) * 1000,
-            'high': np.array(data['h'], dtype=float) * 1000,
-            'low': np.array(data['l'], dtype=float) * 1000,
-            'close': np.array(data['c'], dtype=float) * 1000,
-            'volume': data['v'],
-        })
-        df['symbol'] = symbol
-        return df[['time', 'open', 'high', 'low', 'close', 'volume', 'symbol']]
+        # Gia DNSE tinh theo nghin dong → x1000
+        cols = decode_columnar(resp.content, scale=1000)
+        if cols is None:
+            cols = columns_from_dict(resp.json(), scale=1000)
+        return cols
 
 
 class TCBSFetcher:
     """TCBS API v2 - Updated endpoint (apiextaws), deprecated March 2026"""
 
     BASE_URL = "https://apiextaws.tcbs.com.vn/stock-insight/v2/stock/bars-long-term"
+    INTRADAY_URL = "https://apiextaws.tcbs.com.vn/stock-insight/v2/stock/bars"
+    RESOLUTIONS = {'1D': 'D', '1m': '1', '15m': '15', '1h': '60'}
 
     def __init__(self):
         self.session = requests.Session()
@@ -88,11 +119,12 @@ class TCBSFetcher:
             'Accept': 'application/json',
         })
 
-    def get_price_history(self, symbol: str, days: int = 365) -> pd.DataFrame:
+    def get_price_history(self, symbol: str, days: int = 365, resolution: str = '1D') -> pd.DataFrame:
         to_ts = int(time.time())
+        base = self.BASE_URL if resolution == '1D' else self.INTRADAY_URL
         url = (
-            f"{self.BASE_URL}?resolution=D&ticker={symbol}"
-            f"&type=stock&to={to_ts}&countBack={days}"
+            f"{base}?resolution={self.RESOLUTIONS[resolution]}&ticker={symbol}"
+            f"&type=stock&to={to_ts}&countBack={count_back(days, resolution)}"
         )
 
         resp = self.session.get(url, timeout=REQUEST_TIMEOUT)
@@ -134,11 +166,16 @@ class TCBSFetcher:
 
         return pd.DataFrame()
 
+    def get_bars(self, symbol: str, days: int = 365, resolution: str = '1D') -> dict:
+        return columns_from_frame(self.get_price_history(symbol, days, resolution))
+
 
 class VCIFetcher:
     """VCI (Vietcap) API - Recommended long-term source"""
 
     BASE_URL = "https://trading.vietcap.com.vn/api/chart/OHLCChart/gap-chart"
+    # Khong co khung 15 phut → lay nen 1 phut roi resample
+    TIME_FRAMES = {'1D': 'ONE_DAY', '1m': 'ONE_MINUTE', '15m': 'ONE_MINUTE', '1h': 'ONE_HOUR'}
 
     def __init__(self):
         self.session = requests.Session()
@@ -148,23 +185,46 @@ class VCIFetcher:
             'Content-Type': 'application/json',
         })
 
-    def get_price_history(self, symbol: str, days: int = 365) -> pd.DataFrame:
+    def get_bars(self, symbol: str, days: int = 365, resolution: str = '1D') -> dict:
+        """Duong nhanh khi response chi co 1 ma dang cot; con lai qua _parse"""
+        resp = self._post(symbol, days, resolution)
+        cols = decode_columnar(resp.content)
+        if cols is None:
+            cols = columns_from_frame(self._parse(resp.json(), symbol))
+        if cols is not None and self.TIME_FRAMES[resolution] == 'ONE_MINUTE' and resolution != '1m':
+            cols = resample(cols, resolution)
+        return cols
+
+    def get_price_history(self, symbol: str, days: int = 365, resolution: str = '1D') -> pd.DataFrame:
+        if resolution != '1D':
+            return frame_from_columns(self.get_bars(symbol, days, resolution), symbol)
+        return self._parse(self._post(symbol, days).json(), symbol)
+
+    def _post(self, symbol: str, days: int, resolution: str = '1D'):
         to_ts = int(time.time())
+        time_frame = self.TIME_FRAMES[resolution]
         payload = {
-            "timeFrame": "ONE_DAY",
+            "timeFrame": time_frame,
             "symbols": [symbol],
             "to": to_ts,
-            "countBack": days,
+            "countBack": count_back(days, '1m' if time_frame == 'ONE_MINUTE' else resolution),
         }
 
         resp = self.session.post(self.BASE_URL, json=payload, timeout=REQUEST_TIMEOUT)
         resp.raise_for_status()
-        data = resp.json()
+        return resp
 
+    def _parse(self, data, symbol: str) -> pd.DataFrame:
         records = data
         if isinstance(data, dict) and 'data' in data:
             records = data['data']
 
+        # Response thật: [{"symbol": ..., "t": [...], "o": [...], ...}] (1 phần tử / mã)
+        if isinstance(records, list) and records and isinstance(records[0], dict) \
+                and isinstance(records[0].get('t'), list):
+            records = next((r for r in records if r.get('symbol') == symbol), records[0])
+            records = {k: records[k] for k in ('t', 'o', 'h', 'l', 'c', 'v') if k in records}
+
         if isinstance(records, dict) and 't' in records:
             df = pd.DataFrame(records)
             df = df.rename(columns={'t': 'time', 'o': 'open', 'h': 'high',
@@ -196,6 +256,9 @@ class VCIFetcher:
 
         if 'time' in df.columns:
             sample = df['time'].iloc[0]
+            if isinstance(sample, str) and sample.isdigit():
+                df['time'] = df['time'].astype('int64')
+                sample = df['time'].iloc[0]
             if isinstance(sample, (int, float, np.integer, np.floating)):
                 unit = 'ms' if sample > 1e12 else 's'
                 df['time'] = pd.to_datetime(df['time'], unit=unit)
@@ -211,8 +274,51 @@ class VCIFetcher:
         return pd.DataFrame()
 
 
+class SourceStats:
+    """Latency + ti le thanh cong gan day cua tung nguon (trong bo nho)"""
+
+    def __init__(self, window: int = 200):
+        self._latency = {}
+        self._outcomes = {}
+        self._window = window
+        self._lock = threading.Lock()
+
+    def record(self, source: str, latency: float, outcome: str):
+        with self._lock:
+            self._outcomes.setdefault(source, deque(maxlen=self._window)).append(outcome == OK)
+            if outcome != ERROR:
+                self._latency.setdefault(source, deque(maxlen=self._window)).append(latency)
+
+    def hedge_delay(self, source: str) -> float:
+        """p90 latency cua nguon (giay) - moc de gui hedge"""
+        with self._lock:
+            samples = list(self._latency.get(source, ()))
+        if len(samples) < HEDGE_MIN_SAMPLES:
+            return HEDGE_DEFAULT_DELAY
+        return max(HEDGE_MIN_DELAY, float(np.percentile(samples, 90)))
+
+    def snapshot(self) -> dict:
+        """{source: (so mau, ti le thanh cong, latency trung vi)}"""
+        with self._lock:
+            out = {}
+            for source, outcomes in self._outcomes.items():
+                lat = list(self._latency.get(source, ()))
+                out[source] = (len(outcomes), sum(outcomes) / len(outcomes) if outcomes else 0.0,
+                               float(np.median(lat)) if lat else None)
+            return out
+
+    def success_rate(self, source: str) -> float:
+        with self._lock:
+            outcomes = self._outcomes.get(source)
+            return sum(outcomes) / len(outcomes) if outcomes else 1.0
+
+    def healthiest(self, sources: list) -> str:
+        """Nguon co ti le thanh cong cao nhat (hoa: giu thu tu uu tien)"""
+        return max(sources, key=lambda s: (self.success_rate(s), -sources.index(s)))
+
+
 class MultiSourceFetcher:
-    """Try multiple data sources: DNSE -> TCBS -> VCI"""
+    """Try multiple data sources: DNSE -> TCBS -> VCI (hedge sang nguon khac khi cham)"""
 
     SOURCES = ["DNSE", "TCBS", "VCI"]
 
@@ -221,58 +327,173 @@ class MultiSourceFetcher:
         self.tcbs = TCBSFetcher()
         self.vci = VCIFetcher()
         self._request_count = 0
-        self._last_request_time = 0
+        self.limiter = AIMDLimiter(enabled=NET_CASSETTE_MODE != "replay")
         self._active_source = None
-
-    def _throttle(self):
-        now = time.time()
-        elapsed = now - self._last_request_time
-        if elapsed < REQUEST_DELAY:
-            time.sleep(REQUEST_DELAY - elapsed)
-        self._last_request_time = time.time()
-        self._request_count += 1
+        self.negative_cache = None
+        self.last_outcome = {}
+        self.stats = SourceStats()
+        self.health = SourceHealth()
+        self.hedges = 0
+        self.hedge_wins = 0
+        self._pool = None
 
     def _get_fetcher(self, source: str):
         return {"DNSE": self.dnse, "TCBS": self.tcbs, "VCI": self.vci}[source]
 
-    def probe_sources(self) -> str:
-        """Test each data source with ACB, return first working one"""
-        test_symbol = "ACB"
+    def probe_sources(self, force: bool = False) -> str:
+        """Chon nguon: dung state con han (data/source_health.json), neu khong thi
+        dua song song ca 3 nguon voi ACB, nguon OK nhanh nhat thang"""
+        if not force:
+            source = self.health.fresh_active()
+            if source:
+                info = self.health.state['sources'][source]
+                print(f"   {source}: OK theo state {self.health.state['checked_at']} "
+                      f"({info.get('latency_ms', '?')}ms) - bo qua probe")
+                return source
 
-        for source in self.SOURCES:
-            fetcher = self._get_fetcher(source)
-            print(f"   Testing {source}...")
-            try:
-                df = fetcher.get_price_history(test_symbol, days=5)
-                if not df.empty and len(df) > 0:
-                    print(f"   {source}: OK ({len(df)} rows)")
-                    return source
-                else:
-                    print(f"   {source}: Empty response")
-            except Exception as e:
-                print(f"   {source}: Failed - {type(e).__name__}: {e}")
-
-        print("   All sources failed!")
-        return ""
-
-    def get_price_history(self, symbol: str, days: int = 365) -> pd.DataFrame:
-        self._throttle()
+        test_symbol = "ACB"
+        print(f"   Probe song song: {', '.join(self.SOURCES)}...")
+        pool = ThreadPoolExecutor(max_workers=len(self.SOURCES), thread_name_prefix='probe')
+        futures = [pool.submit(self._probe_one, source, test_symbol) for source in self.SOURCES]
+        winner = ""
+        try:
+            for future in as_completed(futures, timeout=REQUEST_TIMEOUT + 5):
+                source, ok, latency, detail = future.result()
+                print(f"   {source}: {'OK' if ok else 'Failed'} - {detail} ({latency*1000:.0f}ms)")
+                if ok:
+                    winner = source
+                    break
+        except FuturesTimeout:
+            pass
+        pool.shutdown(wait=False)
+
+        if winner:
+            self.health.set_active(winner)
+        else:
+            print("   All sources failed!")
+        self.health.save()
+        return winner
+
+    def _probe_one(self, source: str, symbol: str):
+        """Probe 1 nguon → (source, ok, latency, mo ta); ghi vao source health"""
+        t0 = time.perf_counter()
+        try:
+            df = self._get_fetcher(source).get_price_history(symbol, days=5)
+            ok = not df.empty
+            detail = f"{len(df)} rows" if ok else "Empty response"
+        except Exception as e:
+            ok, detail = False, f"{type(e).__name__}: {e}"
+        latency = time.perf_counter() - t0
+        self.health.record(source, ok, latency, '' if ok else detail)
+        return source, ok, latency, detail
+
+    def update_health(self):
+        """Ghi tinh trang thuc te sau khi fetch (ti le thanh cong, latency trung vi)"""
+        for source, (n, rate, latency) in self.stats.snapshot().items():
+            if n:
+                self.health.record(source, rate >= 0.5, latency, success_rate=rate)
+        active = self._active_source
+        if not active or self.stats.success_rate(active) < 0.5:
+            active = self.health.best_source(self.SOURCES) or active
+        if active:
+            self.health.set_active(active)
+        self.health.save()
+
+    def get_price_history(self, symbol: str, days: int = 365, resolution: str = '1D') -> pd.DataFrame:
+        return frame_from_columns(self.get_bars(symbol, days, resolution=resolution), symbol)
+
+    def get_bars(self, symbol: str, days: int = 365, avoid: list = None,
+                 resolution: str = '1D') -> dict:
+        """Nen dang cot {t, o, h, l, c, v} tu nguon dau tien co du lieu, None neu khong co.
+
+        avoid: cac nguon thu sau cung (lay lai ma co du lieu loi tu nguon khac)
+        resolution: 1D | 1m | 15m | 1h"""
+        self._request_count += 1
 
         # Try active source first, then fallbacks
         sources_to_try = [self._active_source] if self._active_source else []
         sources_to_try += [s for s in self.SOURCES if s != self._active_source]
-
-        for source in sources_to_try:
-            if not source:
+        if self.negative_cache is not None:
+            sources_to_try = self.negative_cache.order_sources(symbol, sources_to_try)
+        if avoid:
+            sources_to_try = ([s for s in sources_to_try if s not in avoid]
+                              + [s for s in sources_to_try if s in avoid])
+        # Nguon dang bi Retry-After chan: thu sau cung
+        sources_to_try = ([s for s in sources_to_try if not self.limiter.is_blocked(s)]
+                          + [s for s in sources_to_try if self.limiter.is_blocked(s)])
+
+        # Ket qua tung nguon cho negative cache: ok / empty (rong, 404) / error
+        self.last_outcome = {}
+        remaining = [s for s in sources_to_try if s]
+        while remaining:
+            primary = remaining.pop(0)
+            if not remaining or not self._hedge_allowed():
+                _, outcome, cols = self._call(primary, symbol, days, resolution)
+                self.last_outcome[primary] = outcome
+                if outcome == OK:
+                    return cols
                 continue
-            try:
-                df = self._get_fetcher(source).get_price_history(symbol, days)
-                if not df.empty:
-                    return df
-            except Exception:
-                pass
 
-        return pd.DataFrame()
+            cols = self._hedged_call(primary, remaining, symbol, days, resolution)
+            if cols is not None:
+                return cols
+
+        return None
+
+    def _call(self, source: str, symbol: str, days: int, resolution: str = '1D'):
+        """Goi 1 nguon → (source, outcome, cols)"""
+        self.limiter.acquire(source)
+        t0 = time.perf_counter()
+        cols = None
+        status, retry_after = 200, None
+        try:
+            cols = self._get_fetcher(source).get_bars(symbol, days, resolution)
+            outcome = OK if cols is not None and len(cols['t']) else EMPTY
+        except requests.HTTPError as e:
+            status = e.response.status_code if e.response is not None else 0
+            if e.response is not None:
+                retry_after = parse_retry_after(e.response.headers.get('Retry-After'))
+            outcome = EMPTY if status in NOT_FOUND_STATUS else ERROR
+        except Exception:
+            status, outcome = 0, ERROR
+        latency = time.perf_counter() - t0
+        self.stats.record(source, latency, outcome)
+        self.limiter.feedback(source, status, latency, retry_after)
+        return source, outcome, cols
+
+    def _hedge_allowed(self) -> bool:
+        return self.hedges < HEDGE_BUDGET * self._request_count + HEDGE_BURST
+
+    def _hedged_call(self, primary: str, remaining: list, symbol: str, days: int,
+                     resolution: str = '1D'):
+        """Goi primary; neu qua p90 chua xong thi gui hedge sang nguon khoe nhat con lai.
+
+        Lay ket qua co du lieu dau tien; request con lai bi bo (huy neu chua chay).
+        Nguon hedge duoc lay ra khoi `remaining`. Tra ve cols hoac None."""
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix='hedge')
+
+        pending = {self._pool.submit(self._call, primary, symbol, days, resolution)}
+        done, _ = wait(pending, timeout=self.stats.hedge_delay(primary))
+        hedge_source = None
+        if not done and self._hedge_allowed():
+            hedge_source = self.stats.healthiest(remaining)
+            remaining.remove(hedge_source)
+            pending.add(self._pool.submit(self._call, hedge_source, symbol, days, resolution))
+            self.hedges += 1
+
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                source, outcome, cols = future.result()
+                self.last_outcome[source] = outcome
+                if outcome == OK:
+                    for other in pending:
+                        other.cancel()
+                    if source == hedge_source:
+                        self.hedge_wins += 1
+                    return cols
+        return None
 
 
 class DataFetcher:
@@ -304,7 +525,7 @@ class DataFetcher:
         'DAH', 'DAT', 'DBD', 'DHA', 'DHG', 'DLG', 'DMC', 'DPG', 'DPR', 'DRC',
         'DRL', 'DSN', 'DTA', 'DTL', 'DVP', 'ELC', 'EMC', 'EVG', 'FDC', 'FIT',
         'FMC', 'FOX', 'FTS', 'GDT', 'GIL', 'GLW', 'GSP', 'GTA', 'GTN', 'HAG',
-        'HAI', 'HAP', 'HAS', 'HAX', 'HBC', 'HCD', 'HCT', 'HDG', 'HHP', 'HHS',
+        'HAI', 'HAP', 'HAS', 'HAX', 'HBC', 'HCD', 'HCT', 'HHP', 'HHS',
         'HID', 'HII', 'HLG', 'HMC', 'HNG', 'HOT', 'HPX', 'HQC', 'HRC', 'HSL',
         'HTI', 'HTL', 'HTN', 'HTV', 'HU1', 'HUB', 'ICT', 'IJC', 'ILB', 'ITA',
         'ITD', 'JVC', 'KHA', 'KHP', 'KMR', 'KPF', 'KSB', 'KSH', 'L10', 'LAF',
@@ -325,28 +546,34 @@ class DataFetcher:
         'NBC', 'NHC', 'NHT', 'NSH', 'PHP', 'PMC', 'PMS', 'PPE', 'PSC',
     ]
 
-    def __init__(self):
+    def __init__(self, shard: tuple = None):
         self.fetcher = MultiSourceFetcher()
+        self.shard = shard  # (i, N): chỉ lấy các mã thuộc shard i
+        self.bar_sources = {}  # Nguon da tra du lieu cho tung ma
 
-    def get_symbols(self) -> list:
-        print(f"📋 Lay danh sach top {TOP_STOCKS_COUNT} ma...")
+    def seed_symbols(self) -> list:
+        """Danh sach co dinh - chi dung khi khong lay duoc danh sach niem yet"""
+        return list(dict.fromkeys(self.VN100_SYMBOLS + self.HNX30_SYMBOLS
+                                  + self.EXTRA_HOSE_SYMBOLS + self.EXTRA_HNX_SYMBOLS))
 
-        all_symbols = list(dict.fromkeys(self.VN100_SYMBOLS + self.HNX30_SYMBOLS))
-        print(f"   📋 VN100 + HNX30: {len(all_symbols)} ma (co dinh)")
+    def get_symbols(self) -> list:
+        print(f"📋 Lay danh sach top {TOP_STOCKS_COUNT} ma theo GTGD 20 phien...")
 
-        if len(all_symbols) < TOP_STOCKS_COUNT:
-            extra = [s for s in self.EXTRA_HOSE_SYMBOLS + self.EXTRA_HNX_SYMBOLS
-                     if s not in all_symbols]
-            need = TOP_STOCKS_COUNT - len(all_symbols)
-            all_symbols.extend(extra[:need])
+        shard_filter = (lambda syms: shard_symbols(syms, self.shard)) if self.shard else None
+        save_path = os.path.join(shard_dir(self.shard), 'universe.json') if self.shard else None
+        all_symbols = UniverseBuilder().get_symbols(
+            self.fetcher, TOP_STOCKS_COUNT, self.seed_symbols(),
+            shard=self.shard, shard_filter=shard_filter, save_path=save_path)
 
         print(f"   📊 Tong: {len(all_symbols)} ma")
+
+        if self.shard:
+            all_symbols = shard_symbols(all_symbols, self.shard)
+            print(f"   🧩 Shard {self.shard[0]}/{self.shard[1]}: {len(all_symbols)} ma")
         return all_symbols
 
     def fetch_all_data(self) -> pd.DataFrame:
-        symbols = self.get_symbols()
-
-        print("\n🔍 Kiem tra nguon du lieu...")
+        print("🔍 Kiem tra nguon du lieu...")
         source = self.fetcher.probe_sources()
         if not source:
             print("❌ Khong the ket noi den bat ky nguon du lieu nao!")
@@ -358,10 +585,32 @@ class DataFetcher:
         self.fetcher._active_source = source
         print(f"✅ Su dung nguon: {source}\n")
 
-        print(f"📥 Lay du lieu {len(symbols)} ma tu {source}...")
-        print(f"⏰ Rate limit: {REQUEST_DELAY}s/req | Timeout: {REQUEST_TIMEOUT}s/ma\n")
+        symbols = self.get_symbols()
 
-        all_data = []
+        # Bo qua ma khong co du lieu (huy niem yet / tam ngung), kiem tra lai theo lich
+        neg = NegativeCache()
+        self.fetcher.negative_cache = neg
+        symbols, skipped, recheck = neg.partition(symbols)
+        if skipped:
+            print(f"💀 Bo qua {len(skipped)} ma khong co du lieu: {', '.join(skipped[:15])}"
+                  f"{' ...' if len(skipped) > 15 else ''}")
+        if recheck:
+            print(f"🔁 Kiem tra lai {len(recheck)} ma: {', '.join(recheck[:15])}")
+
+        print(f"📥 Lay du lieu {len(symbols)} ma tu {source}...")
+        print(f"⏰ Rate limit: AIMD theo nguon ({source} {self.fetcher.limiter.rate(source):.1f} req/s)"
+              f" | Timeout: {REQUEST_TIMEOUT}s/ma\n")
+
+        # Lich su da luu → chi lay phien moi, kiem tra checksum phien chong lan
+        updater = None
+        if INCREMENTAL_FETCH:
+            stored = StoredHistory()
+            if stored:
+                updater = IncrementalUpdater(self.fetcher, stored, calendar=TRADING_CALENDAR)
+                print(f"🧬 Incremental: ghep vao lich su {len(stored.panel)} ma da luu\n")
+
+        # ~250 phien/nam: 1 buffer cot cho ca batch thay vi 300 DataFrame + concat
+        buf = BarBuffer(capacity=len(symbols) * 260)
         ok = 0
         fail = 0
         t0 = time.time()
@@ -372,10 +621,13 @@ class DataFetcher:
                 print(f"\n⚠️ QUA 30 PHUT - Dung ({ok} ma)")
                 break
 
-            df = self.fetcher.get_price_history(symbol)
+            cols = updater.update(symbol) if updater else self.fetcher.get_bars(symbol)
+            neg.record(symbol, self.fetcher.last_outcome)
 
-            if not df.empty:
-                all_data.append(df)
+            if cols is not None:
+                buf.append(symbol, cols)
+                self.bar_sources[symbol] = next(
+                    (s for s, o in self.fetcher.last_outcome.items() if o == OK), None)
                 ok += 1
                 if (i + 1) % 20 == 0 or (i + 1) == len(symbols):
                     print(f"   [{i+1}/{len(symbols)}] ✅ {ok} ma OK / {fail} fail")
@@ -391,25 +643,111 @@ class DataFetcher:
                 break
 
         total = time.time() - t0
+        neg.save()
+        dead = neg.dead_symbols()
         print(f"\n{'='*50}")
         print(f"📊 {ok} ✅ / {fail} ❌ / {len(symbols)} tong")
+        if skipped:
+            print(f"💀 Bo qua (negative cache): {len(skipped)} ma")
+        if dead:
+            print(f"💀 Khong co du lieu: {', '.join(dead[:20])}{' ...' if len(dead) > 20 else ''}")
+        if neg.revived:
+            print(f"♻️ Co du lieu tro lai: {', '.join(neg.revived)}")
+        if updater:
+            updater.save_revisions()
+            print(f"🧬 Incremental: {updater.summary()}")
+            if updater.revised:
+                print(f"🧬 Lich su bi dieu chinh (lay lai day du): {', '.join(updater.revised)}")
+        self.fetcher.limiter.save()
+        self.fetcher.update_health()
+        print(f"🚦 Rate: {self.fetcher.limiter.summary()}")
+        if self.fetcher.hedges:
+            print(f"🪁 Hedge: {self.fetcher.hedges} request ({self.fetcher.hedge_wins} nhanh hon nguon chinh)")
         print(f"📡 Nguon: {source}")
         print(f"⏱️ {total:.0f}s ({total/60:.1f} phut)")
         print(f"{'='*50}")
 
-        if all_data:
-            return pd.concat(all_data, ignore_index=True)
-        return pd.DataFrame()
+        return buf.to_frame()
+
+    def validate(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Kiem tra chat luong ca bang 1 luot, lay lai cac ma loi nang tu nguon khac"""
+        if df.empty:
+            return df
+        validator = DataValidator(UniverseBuilder.exchange_map(UniverseBuilder().load()))
+        times = pd.to_datetime(df['time'])
+        calendar = pd.DatetimeIndex(TRADING_CALENDAR.sessions(times.min(), times.max()))
+        df, report = validator.validate(df, calendar)
+        validator.print_report(report)
+
+        refetch = report['refetch'][:VALIDATE_MAX_REFETCH]
+        if not refetch:
+            return df
+        print(f"🔁 Lay lai {len(refetch)} ma loi: {', '.join(refetch[:15])}{' ...' if len(refetch) > 15 else ''}")
+        replaced = {}
+        for symbol in refetch:
+            source = self.bar_sources.get(symbol)
+            cols = self.fetcher.get_bars(symbol, avoid=[source] if source else None)
+            if cols is None:
+                continue
+            new_df, new_report = validator.validate(frame_from_columns(cols, symbol), report['calendar'])
+            if validator.severity(new_report, symbol) < validator.severity(report, symbol):
+                replaced[symbol] = new_df
+
+        if replaced:
+            df = pd.concat([df[~df['symbol'].isin(list(replaced))], *replaced.values()],
+                           ignore_index=True)
+            print(f"   ✅ Thay {len(replaced)} ma bang du lieu tot hon: {', '.join(replaced)}")
+        else:
+            print("   Khong co ban tot hon, giu du lieu da sua")
+        return df
 
-    def save_data(self, df: pd.DataFrame):
+    def fetch_intraday(self, symbols: list, resolution: str = INTRADAY_RESOLUTION) -> BarBuffer:
+        """Nen trong phien cua watchlist (khung `resolution`) vao 1 buffer cot"""
+        buf = BarBuffer(capacity=len(symbols) * BARS_PER_SESSION[resolution] * 2)
+        for symbol in symbols:
+            buf.append(symbol, self.fetcher.get_bars(symbol, days=1, resolution=resolution))
+        return buf
+
+    def merge_intraday(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Dang trong phien: gop nen intraday cua watchlist thanh nen ngay tam tinh,
+        thay nen hom nay trong df (chi de phan tich, khong luu vao raw_data)"""
+        if not INTRADAY_WATCHLIST or df.empty or not TRADING_CALENDAR.in_session():
+            return df
+        session = TRADING_CALENDAR.today()
+        t0 = time.time()
+        buf = self.fetch_intraday(INTRADAY_WATCHLIST)
+        partial = partial_daily(buf, session)
+        print(f"🕯️ Intraday {INTRADAY_RESOLUTION}: {len(buf)} nen / {len(buf.symbols)} ma"
+              f" → {len(partial)} nen ngay tam tinh phien {session} ({time.time() - t0:.1f}s)")
+        if partial.empty:
+            return df
+        missing = [s for s in INTRADAY_WATCHLIST if s not in set(partial['symbol'])]
+        if missing:
+            print(f"   Khong co nen trong phien: {', '.join(missing)}")
+
+        today = pd.to_datetime(df['time']).dt.normalize() == pd.Timestamp(session)
+        df = df[~(today & df['symbol'].isin(partial['symbol']))]
+        return pd.concat([df, partial], ignore_index=True).sort_values(
+            ['symbol', 'time'], kind='stable').reset_index(drop=True)
+
+    @staticmethod
+    def closed_sessions(df: pd.DataFrame) -> pd.DataFrame:
+        """Bo nen cua phien chua dong cua (nguon tra nen ngay dang hinh thanh khi chay trong phien)"""
+        last = pd.Timestamp(TRADING_CALENDAR.last_closed_session())
+        return df[pd.to_datetime(df['time']).dt.normalize() <= last]
+
+    def save_data(self, df: pd.DataFrame, filepath: str = RAW_DATA_FILE):
         if df.empty:
             print("❌ Khong co data")
             return
 
-        os.makedirs(DATA_DIR, exist_ok=True)
-        df.to_csv(RAW_DATA_FILE, index=False)
+        os.makedirs(os.path.dirname(filepath), exist_ok=True)
+        df.to_csv(filepath, index=False)
         symbols_count = df['symbol'].nunique() if 'symbol' in df.columns else 0
-        print(f"✅ Saved: {RAW_DATA_FILE} ({len(df)} rows, {symbols_count} ma)")
+        print(f"✅ Saved: {filepath} ({len(df)} rows, {symbols_count} ma)")
+
+        if filepath == RAW_DATA_FILE:
+            PricePanel.from_frame(df).save(PANEL_DIR)
 
     def run(self) -> pd.DataFrame:
         print("=" * 60)
@@ -418,9 +756,13 @@ class DataFetcher:
         print("=" * 60)
 
         df = self.fetch_all_data()
+        df = self.validate(df)
 
-        if not df.empty:
-            self.save_data(df)
+        # Shard: raw_data được ghi cùng artifact shard (main.py)
+        if not df.empty and not self.shard:
+            # Chỉ lưu phiên đã đóng cửa → lịch giao dịch vẫn nhận ra phiên hôm nay là "mới"
+            self.save_data(self.closed_sessions(df))
+            df = self.merge_intraday(df)
 
         return df
 
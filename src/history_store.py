@@ -0,0 +1,270 @@
+"""
+VN Stock Sniper - History Store
+Truy vấn nhanh lịch sử các snapshot đã phân tích (data/history/YYYY-MM-DD_data.csv)
+
+- Column projection: chỉ đọc các cột cần (usecols)
+- Date-range pruning: lọc ngày theo tên file, không mở file ngoài khoảng
+- Cache: giữ các cột (ngày x cột) và các panel hay dùng trong bộ nhớ (LRU)
+
+Ví dụ:
+    store = HistoryStore()
+    store.symbol_series('VCB', 'total_score', days=60)     # VCB 60 ngày
+    stars = store.panel('stars', start='2025-06-02', end='2025-06-06')
+    stars.columns[(stars >= 5).any()]                       # mã 5 sao tuần trước
+    store.signal_counts(days=30)                             # số tín hiệu mỗi ngày
+"""
+
+import os
+import re
+import threading
+from collections import OrderedDict
+from datetime import datetime, date, timedelta
+
+import pandas as pd
+
+from src.config import HISTORY_DIR, HISTORY_CACHE_SIZE
+
+DATA_FILE_RE = re.compile(r'^(\d{4}-\d{2}-\d{2})_data\.csv$')
+
+# Các cột truy vấn nhiều nhất, đọc kèm mỗi khi phải mở 1 snapshot
+PREFETCH_COLUMNS = ['close', 'total_score', 'stars', 'buy_signal', 'sell_signal', 'channel']
+
+
+def _to_date_str(val) -> str:
+    """Chuẩn hóa str/date/datetime/Timestamp về 'YYYY-MM-DD'"""
+    if val is None:
+        return None
+    if isinstance(val, str) and len(val) == 10:
+        return val
+    if isinstance(val, (datetime, date)):
+        return val.strftime('%Y-%m-%d')
+    return pd.Timestamp(val).strftime('%Y-%m-%d')
+
+
+class _LRU:
+    """LRU cache tối giản dựa trên OrderedDict (an toàn khi dùng từ nhiều thread)"""
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            if key not in self._data:
+                return None
+            self._data.move_to_end(key)
+            return self._data[key]
+
+    def put(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def discard(self, predicate):
+        """Bỏ các key thỏa predicate(key)"""
+        with self._lock:
+            for key in [k for k in self._data if predicate(k)]:
+                del self._data[key]
+
+    def __len__(self):
+        return len(self._data)
+
+
+class HistoryStore:
+    """Truy vấn time-series / cross-section / thống kê tín hiệu trên lịch sử"""
+
+    def __init__(self, history_dir: str = HISTORY_DIR, cache_size: int = HISTORY_CACHE_SIZE):
+        self.history_dir = history_dir
+        self._columns = _LRU(cache_size)     # (date, col) -> (mtime, Series index=symbol)
+        self._panels = _LRU(64)              # (col, dates) -> DataFrame / signal counts
+        self._files = {}                     # date -> (path, mtime)
+        self._dir_mtime = None
+        self._scan_lock = threading.Lock()
+
+    # ------------------------------------------------------------------
+    # File index
+    # ------------------------------------------------------------------
+    def _scan(self):
+        """Quét thư mục lịch sử: liệt kê lại khi thư mục thay đổi, stat từng file để bắt
+        snapshot bị ghi đè tại chỗ (chạy lại cùng ngày không đổi mtime thư mục)"""
+        with self._scan_lock:
+            self._rescan()
+
+    def _rescan(self):
+        if not os.path.isdir(self.history_dir):
+            self._files = {}
+            self._dir_mtime = None
+            return
+        dir_mtime = os.stat(self.history_dir).st_mtime_ns
+        if dir_mtime != self._dir_mtime:
+            paths = {}
+            for name in os.listdir(self.history_dir):
+                m = DATA_FILE_RE.match(name)
+                if m:
+                    paths[m.group(1)] = os.path.join(self.history_dir, name)
+        else:
+            paths = {d: path for d, (path, _) in self._files.items()}
+        files = {}
+        for d, path in paths.items():
+            try:
+                files[d] = (path, os.stat(path).st_mtime_ns)
+            except FileNotFoundError:
+                continue
+        changed = {d for d in files.keys() | self._files.keys() if files.get(d) != self._files.get(d)}
+        self._files = files
+        self._dir_mtime = dir_mtime
+        if changed:
+            # Bỏ cột / panel của các ngày đã đổi (key panel kết thúc bằng tuple ngày)
+            self._columns.discard(lambda key: key[0] in changed)
+            self._panels.discard(lambda key: any(d in changed for d in key[-1]))
+
+    def list_dates(self, start=None, end=None, days: int = None) -> list:
+        """Danh sách ngày có snapshot trong khoảng [start, end] (tăng dần).
+
+        days: lấy `days` ngày lịch tính ngược từ end (hoặc snapshot mới nhất)."""
+        self._scan()
+        dates = sorted(self._files)
+        if not dates:
+            return []
+        end = _to_date_str(end) or dates[-1]
+        start = _to_date_str(start)
+        if days is not None:
+            floor = (pd.Timestamp(end) - timedelta(days=days)).strftime('%Y-%m-%d')
+            start = max(start, floor) if start else floor
+        return [d for d in dates if (start is None or d >= start) and d <= end]
+
+    def latest_date(self) -> str:
+        dates = self.list_dates()
+        return dates[-1] if dates else None
+
+    # ------------------------------------------------------------------
+    # Column-level loading
+    # ------------------------------------------------------------------
+    def _load_columns(self, d: str, columns: list) -> dict:
+        """Trả về {col: Series(index=symbol)} cho 1 ngày, chỉ đọc cột còn thiếu.
+
+        Khi phải mở file, đọc kèm các cột hay dùng (PREFETCH_COLUMNS) vì chi phí
+        parse gần như không đổi theo số cột được chọn."""
+        path, mtime = self._files[d]
+        out = {}
+        missing = []
+        for col in columns:
+            hit = self._columns.get((d, col))
+            if hit is not None and hit[0] == mtime:
+                out[col] = hit[1]
+            else:
+                missing.append(col)
+
+        if missing:
+            wanted = set(missing) | {c for c in PREFETCH_COLUMNS
+                                     if self._columns.get((d, c)) is None}
+            wanted.add('symbol')
+            df = pd.read_csv(path, usecols=lambda c: c in wanted)
+            if 'symbol' in df.columns:
+                df = df.drop_duplicates('symbol').set_index('symbol')
+                for col in df.columns:
+                    self._columns.put((d, col), (mtime, df[col]))
+            for col in missing:
+                out[col] = df[col] if col in df.columns else pd.Series(dtype=float)
+        return out
+
+    # ------------------------------------------------------------------
+    # Queries
+    # ------------------------------------------------------------------
+    def panel(self, column: str, start=None, end=None, days: int = None) -> pd.DataFrame:
+        """Ma trận ngày x mã cho 1 cột (index = ngày, columns = symbol)"""
+        dates = tuple(self.list_dates(start, end, days))
+        key = (column, dates)
+        cached = self._panels.get(key)
+        if cached is not None:
+            return cached
+
+        if not dates:
+            result = pd.DataFrame()
+        else:
+            series = {d: self._load_columns(d, [column])[column] for d in dates}
+            result = pd.DataFrame(series).T
+            result.index.name = 'date'
+        self._panels.put(key, result)
+        return result
+
+    def symbol_series(self, symbol: str, column: str = 'total_score',
+                      start=None, end=None, days: int = None) -> pd.Series:
+        """Time-series 1 cột của 1 mã (index = ngày)"""
+        p = self.panel(column, start, end, days)
+        if symbol not in p.columns:
+            return pd.Series(dtype=float, name=symbol)
+        return p[symbol].dropna()
+
+    def symbol_history(self, symbol: str, columns: list, start=None, end=None,
+                       days: int = None) -> pd.DataFrame:
+        """Nhiều cột của 1 mã theo thời gian (index = ngày)"""
+        return pd.DataFrame({
+            col: self.symbol_series(symbol, col, start, end, days) for col in columns
+        })
+
+    def cross_section(self, d=None, columns: list = None) -> pd.DataFrame:
+        """Snapshot 1 ngày (mặc định ngày mới nhất), chỉ các cột yêu cầu"""
+        self._scan()
+        d = _to_date_str(d) or self.latest_date()
+        if d not in self._files:
+            return pd.DataFrame()
+        if columns is None:
+            df = pd.read_csv(self._files[d][0])
+            return df.drop_duplicates('symbol').reset_index(drop=True)
+        data = self._load_columns(d, list(columns))
+        df = pd.DataFrame(data)
+        df.index.name = 'symbol'
+        return df.reset_index()
+
+    def signal_counts(self, start=None, end=None, days: int = None,
+                      column: str = 'buy_signal') -> pd.DataFrame:
+        """Số mã theo từng loại tín hiệu mỗi ngày (index = ngày, columns = tín hiệu)"""
+        p = self.panel(column, start, end, days)
+        key = ('__counts__', column, tuple(p.index))
+        cached = self._panels.get(key)
+        if cached is not None:
+            return cached
+        if p.empty:
+            return pd.DataFrame()
+        stacked = p.stack()
+        stacked = stacked[stacked.astype(str).str.len() > 0]
+        if stacked.empty:
+            counts = pd.DataFrame(index=p.index)
+        else:
+            counts = stacked.groupby(level=0).value_counts().unstack(fill_value=0)
+            counts = counts.reindex(p.index, fill_value=0)
+        self._panels.put(key, counts)
+        return counts
+
+    def clear_cache(self):
+        self._columns.clear()
+        self._panels.clear()
+
+
+if __name__ == "__main__":
+    import sys
+    import time
+
+    symbol = sys.argv[1] if len(sys.argv) > 1 else 'VCB'
+    column = sys.argv[2] if len(sys.argv) > 2 else 'total_score'
+    days = int(sys.argv[3]) if len(sys.argv) > 3 else 60
+
+    store = HistoryStore()
+    print(f"📚 {len(store.list_dates())} snapshot trong {HISTORY_DIR}")
+
+    for label in ("cold", "hot"):
+        t0 = time.perf_counter()
+        series = store.symbol_series(symbol, column, days=days)
+        ms = (time.perf_counter() - t0) * 1000
+        print(f"   {symbol}.{column} ({days} ngày, {label}): {len(series)} điểm - {ms:.2f}ms")
+
+    print(series.tail(10))
+    print(store.signal_counts(days=days).tail(10))
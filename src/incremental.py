@@ -0,0 +1,177 @@
+"""
+VN Stock Sniper - Incremental Fetch
+Chỉ lấy các phiên mới từ nguồn, ghép vào lịch sử đã lưu (panel / raw_data.csv),
+và phát hiện khi nguồn điều chỉnh giá quá khứ (chia tách, cổ tức, thưởng).
+
+Mỗi mã:
+    1. Lấy từ (phiên cuối đã lưu - INCREMENTAL_OVERLAP_BARS phiên) tới hôm nay
+    2. So checksum OHLC của N phiên chồng lấn: lưu trữ vs nguồn
+       (bỏ phiên cuối đã lưu - có thể lấy lúc đang giao dịch, chưa chốt)
+    3. Khớp → ghép; lệch → nguồn đã điều chỉnh lịch sử → lấy lại đầy đủ
+       và ghi vào data/revisions.json (state chỉ báo của mã đó phải tính lại)
+"""
+
+import json
+import math
+import os
+import time
+import zlib
+from datetime import date, datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+from src.config import (
+    RAW_DATA_FILE, PANEL_DIR, REVISIONS_FILE,
+    INCREMENTAL_OVERLAP_BARS, INCREMENTAL_MAX_GAP_DAYS
+)
+from src.bars import COLUMNS, columns_from_frame
+from src.panel import PricePanel
+from src.validator import repair_ohlc
+
+DAY = 86400
+FULL = "full"
+INCREMENTAL = "incremental"
+REVISED = "revised"
+
+
+def ohlc_checksum(cols: dict, idx: np.ndarray) -> int:
+    """crc32 của OHLC (làm tròn tới đồng) tại các vị trí idx.
+
+    Giá được sửa như DataValidator trước khi băm: lịch sử đã lưu là nến đã sửa, nguồn
+    trả nến thô → nến lỗi (open = 0, high < close...) không bị coi là điều chỉnh giá."""
+    o, h, l = repair_ohlc(*(np.asarray(cols[k][idx], dtype=np.float64) for k in ('o', 'h', 'l', 'c')))
+    c = np.asarray(cols['c'][idx], dtype=np.float64)
+    block = np.column_stack([np.round(x) for x in (o, h, l, c)])
+    return zlib.crc32(np.ascontiguousarray(block, dtype=np.float64).tobytes())
+
+
+def _take(cols: dict, mask: np.ndarray) -> dict:
+    return {k: cols[k][mask] for k in COLUMNS}
+
+
+def _concat(a: dict, b: dict) -> dict:
+    return {k: np.concatenate([a[k], b[k]]) for k in COLUMNS}
+
+
+class StoredHistory:
+    """Lịch sử đã lưu: panel memory-mapped nếu không cũ hơn raw_data.csv, ngược lại đọc CSV"""
+
+    def __init__(self):
+        self.panel = None
+        raw_mtime = os.path.getmtime(RAW_DATA_FILE) if os.path.exists(RAW_DATA_FILE) else 0
+        if PricePanel.mtime(PANEL_DIR) >= raw_mtime and raw_mtime:
+            self.panel = PricePanel.open(PANEL_DIR)
+        elif raw_mtime:
+            try:
+                self.panel = PricePanel.from_frame(pd.read_csv(RAW_DATA_FILE))
+            except (OSError, ValueError, KeyError) as e:
+                print(f"⚠️ Khong doc duoc {RAW_DATA_FILE}: {e}")
+
+    def __bool__(self):
+        return self.panel is not None and len(self.panel) > 0
+
+    def bars(self, symbol: str) -> dict:
+        if self.panel is None or symbol not in self.panel:
+            return None
+        return columns_from_frame(self.panel.history(symbol))
+
+
+class IncrementalUpdater:
+    """Cập nhật nến từng mã: incremental khi lịch sử còn khớp, đầy đủ khi nguồn đã điều chỉnh"""
+
+    def __init__(self, fetcher, stored: StoredHistory, days: int = 365,
+                 overlap: int = INCREMENTAL_OVERLAP_BARS, calendar=None):
+        self.fetcher = fetcher
+        self.calendar = calendar
+        self.stored = stored
+        self.days = days
+        self.overlap = overlap
+        self.counts = {FULL: 0, INCREMENTAL: 0, REVISED: 0}
+        self.revised = []
+
+    def update(self, symbol: str) -> dict:
+        """Nến dạng cột của mã (None nếu không lấy được)"""
+        cols, status = self._update(symbol)
+        if cols is not None:
+            self.counts[status] += 1
+            if status == REVISED:
+                self.revised.append(symbol)
+        return cols
+
+    def _update(self, symbol: str) -> tuple:
+        stored = self.stored.bars(symbol) if self.stored else None
+        now = time.time()
+        if stored is None or len(stored['t']) <= self.overlap:
+            return self.fetcher.get_bars(symbol, self.days), FULL
+
+        stored_days = stored['t'] // DAY
+        age = now / DAY - stored_days[-1]
+        if age > INCREMENTAL_MAX_GAP_DAYS:
+            return self.fetcher.get_bars(symbol, self.days), FULL
+
+        if self.calendar is not None:
+            # Lùi đúng N phiên giao dịch trước phiên cuối đã lưu (bỏ qua lễ / cuối tuần)
+            last = date(1970, 1, 1) + timedelta(days=int(stored_days[-1]))
+            start = self.calendar.sessions_back(last, self.overlap)
+            fetch_days = (self.calendar.today() - start).days + 1
+        else:
+            # N phiên chồng lấn ≈ N x 7/5 ngày lịch + dư cho ngày lễ
+            fetch_days = math.ceil(age + self.overlap * 7 / 5) + 4
+        fresh = self.fetcher.get_bars(symbol, fetch_days)
+        if fresh is None:
+            return None, FULL
+
+        fresh_days = fresh['t'] // DAY
+        window = np.flatnonzero((stored_days >= fresh_days[0]) & (stored_days < stored_days[-1]))
+        window = window[-self.overlap:]
+        pos = np.searchsorted(fresh_days, stored_days[window])
+        pos = np.clip(pos, 0, len(fresh_days) - 1)
+        if len(window) < min(self.overlap, len(stored_days) - 1) or \
+                not np.array_equal(fresh_days[pos], stored_days[window]):
+            # Không đủ phiên chồng lấn để kiểm chứng → lấy đầy đủ
+            return self.fetcher.get_bars(symbol, self.days), FULL
+
+        if ohlc_checksum(stored, window) != ohlc_checksum(fresh, pos):
+            return self.fetcher.get_bars(symbol, self.days), REVISED
+
+        # Giữ độ dài cửa sổ như lịch sử đã lưu (VCI/TCBS tính `days` theo số phiên, DNSE theo ngày lịch)
+        merged = _concat(_take(stored, stored_days < fresh_days[0]), fresh)
+        keep = max(len(stored['t']), int(np.count_nonzero(merged['t'] >= now - self.days * DAY)))
+        return {k: v[-keep:] for k, v in merged.items()}, INCREMENTAL
+
+    def summary(self) -> str:
+        return (f"{self.counts[INCREMENTAL]} incremental / {self.counts[FULL]} day du"
+                f" / {self.counts[REVISED]} dieu chinh")
+
+    def save_revisions(self, path: str = REVISIONS_FILE):
+        """Ghi các mã có lịch sử bị điều chỉnh: {symbol: [ngày phát hiện, ...]}"""
+        if not self.revised:
+            return
+        data = {}
+        if os.path.exists(path):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+            except (json.JSONDecodeError, OSError):
+                data = {}
+        today = datetime.now().strftime('%Y-%m-%d')
+        for symbol in self.revised:
+            dates = data.setdefault(symbol, [])
+            if today not in dates:
+                dates.append(today)
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=1, sort_keys=True)
+
+
+def revised_since(since: str, path: str = REVISIONS_FILE) -> set:
+    """Mã có lịch sử bị điều chỉnh từ ngày `since` (YYYY-MM-DD) → state chỉ báo phải tính lại"""
+    if not os.path.exists(path):
+        return set()
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except (json.JSONDecodeError, OSError):
+        return set()
+    return {s for s, dates in data.items() if dates and dates[-1] >= since}
@@ -0,0 +1,544 @@
+"""
+VN Stock Sniper - Live Mode
+Chạy suốt phiên: mỗi LIVE_INTERVAL_SECONDS lấy nến intraday của universe, gộp thành
+nến ngày tạm tính rồi cập nhật chỉ báo + điểm từng mã theo kiểu incremental:
+
+    - Khởi động: tính state từ lịch sử đã đóng cửa (panel) 1 lần - giá trị EMA,
+      cửa sổ close/high/low/volume gần nhất, đuôi các chuỗi dẫn xuất (RSI, BB width,
+      %K, OBV, TR, money flow)
+    - Mỗi vòng: chỉ tính dòng hôm nay cho cả universe bằng NumPy trên mảng [mã, cửa sổ],
+      cùng công thức với TechnicalAnalyzer, rồi chấm điểm bằng TechnicalAnalyzer.score_latest
+    - Panel có phiên mới → tính lại toàn bộ state; cùng phiên nhưng nguồn điều chỉnh
+      lịch sử (data/revisions.json) → chỉ tính lại các mã đó
+
+Đẩy ra dashboard:
+    docs/live/snapshot.json   toàn bộ trường live {seq, session, stocks: {mã: {...}}}
+    docs/live/delta.json      thay đổi của vòng cuối {seq, base, changes: {mã: {...}}}
+    SSE http://127.0.0.1:8765/events   (event snapshot khi kết nối, delta mỗi vòng)
+
+    python -m src.live                          # universe đã lưu, SSE cổng 8765
+    python -m src.live --symbols FPT,HPG --interval 5
+    python -m src.live --once --force           # 1 vòng (cả ngoài giờ giao dịch)
+
+Dashboard: docs/index.html?live (đọc file) hoặc ?live=http://127.0.0.1:8765 (SSE).
+"""
+
+import argparse
+import json
+import math
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+import pandas as pd
+
+from src.config import (
+    MA_PERIODS, RSI_OVERBOUGHT, RSI_OVERSOLD, MACD_FAST, MACD_SLOW, MACD_SIGNAL,
+    BB_PERIOD, BB_STD, LR_PERIOD, LR_STD, STOCH_K, STOCH_D, ATR_PERIOD, MFI_PERIOD,
+    VOL_MA_PERIOD, VOL_SURGE_THRESHOLD, CHANNEL_UPTREND_THRESHOLD, CHANNEL_DOWNTREND_THRESHOLD,
+    PANEL_DIR, REVISIONS_FILE, INTRADAY_RESOLUTION, LIVE_INTERVAL_SECONDS,
+    LIVE_FETCH_WORKERS, LIVE_PORT, LIVE_DIR
+)
+from src.analyzer import TechnicalAnalyzer
+from src.bars import BarBuffer
+from src.data_fetcher import DataFetcher, TRADING_CALENDAR
+from src.dashboard_generator import classify_stocks
+from src.incremental import StoredHistory, revised_since
+from src.panel import PricePanel
+from src.resample import partial_daily, BARS_PER_SESSION
+
+# Cửa sổ close cần giữ (gồm nến hôm nay): MA200 là dài nhất
+WINDOW = max(max(MA_PERIODS), LR_PERIOD, BB_PERIOD)
+EMA_SPANS = {f'ma{p}': p for p in MA_PERIODS if p != 200}
+EMA_SPANS.update(exp_fast=MACD_FAST, exp_slow=MACD_SLOW, macd_signal=MACD_SIGNAL)
+
+# Trường gửi sang dashboard (so với vòng trước → delta)
+LIVE_FIELDS = ['open', 'high', 'low', 'close', 'volume', 'rsi', 'mfi', 'vol_ratio', 'vol_surge',
+               'bb_squeeze', 'macd_hist', 'quality_score', 'momentum_score', 'total_score', 'stars',
+               'buy_signal', 'sell_signal', 'channel', 'signal_label', 'score_100']
+
+
+def _tail(values, n: int) -> np.ndarray:
+    """n giá trị cuối, thiếu thì đệm NaN bên trái (= chưa có phiên)"""
+    values = np.asarray(values, dtype=np.float64)[-n:]
+    out = np.full(n, np.nan)
+    if len(values):
+        out[n - len(values):] = values
+    return out
+
+
+def _ema(prev: np.ndarray, x: np.ndarray, span: int) -> np.ndarray:
+    """1 bước ewm(span, adjust=False)"""
+    alpha = 2 / (span + 1)
+    return np.where(np.isnan(prev), x, prev + alpha * (x - prev))
+
+
+def _mean_with(history: np.ndarray, today: np.ndarray) -> np.ndarray:
+    """rolling mean dòng cuối: NaN nếu cửa sổ thiếu phiên (như pandas min_periods = window)"""
+    return np.column_stack([history, today]).mean(axis=1)
+
+
+class IndicatorState:
+    """State chỉ báo tại phiên đã đóng cửa gần nhất cho nhiều mã, dạng mảng [mã, ...]"""
+
+    def __init__(self, symbols: list):
+        self.symbols = list(symbols)
+        self.index = {s: i for i, s in enumerate(self.symbols)}
+        self.analyzer = TechnicalAnalyzer()
+        n = len(self.symbols)
+        self.loaded = np.zeros(n, dtype=bool)
+        self.close = np.full((n, WINDOW - 1), np.nan)
+        self.high = np.full((n, 50), np.nan)
+        self.low = np.full((n, 50), np.nan)
+        self.volume = np.full((n, VOL_MA_PERIOD - 1), np.nan)
+        self.ema = {k: np.full(n, np.nan) for k in EMA_SPANS}
+        self.prev = {k: np.full(n, np.nan) for k in ('macd', 'macd_hist', 'stoch_d', 'obv', 'tp')}
+        self.rsi = np.full((n, 13), np.nan)
+        self.bb_width = np.full((n, 19), np.nan)
+        self.stoch_k = np.full((n, STOCH_D - 1), np.nan)
+        self.obv = np.full((n, 19), np.nan)
+        self.tr = np.full((n, ATR_PERIOD - 1), np.nan)
+        self.pos_flow = np.full((n, MFI_PERIOD - 1), np.nan)
+        self.neg_flow = np.full((n, MFI_PERIOD - 1), np.nan)
+
+    def load(self, symbol: str, hist: pd.DataFrame):
+        """Tính state của 1 mã từ lịch sử đã đóng cửa (các calculate_* của TechnicalAnalyzer)"""
+        i = self.index[symbol]
+        self.loaded[i] = False
+        if hist is None or hist.empty:
+            return
+        a = self.analyzer
+        df = hist.sort_values('time').reset_index(drop=True)
+        for calc in (a.calculate_ma, a.calculate_rsi, a.calculate_macd, a.calculate_bollinger,
+                     a.calculate_stochastic, a.calculate_obv):
+            df = calc(df)
+
+        close = df['close'].astype(float)
+        high, low, volume = df['high'].astype(float), df['low'].astype(float), df['volume'].astype(float)
+        self.close[i] = _tail(close, WINDOW - 1)
+        self.high[i] = _tail(high, 50)
+        self.low[i] = _tail(low, 50)
+        self.volume[i] = _tail(volume, VOL_MA_PERIOD - 1)
+
+        for key, span in EMA_SPANS.items():
+            series = df[key] if key in df else close.ewm(span=span, adjust=False).mean()
+            self.ema[key][i] = series.iloc[-1]
+        for key in ('macd', 'macd_hist', 'stoch_d', 'obv'):
+            self.prev[key][i] = df[key].iloc[-1]
+        self.rsi[i] = _tail(df['rsi'], 13)
+        self.bb_width[i] = _tail(df['bb_width'], 19)
+        self.stoch_k[i] = _tail(df['stoch_k'], STOCH_D - 1)
+        self.obv[i] = _tail(df['obv'], 19)
+
+        # Chuỗi trung gian của ATR / MFI (analyzer không giữ lại)
+        prev_close = close.shift(1)
+        tr = pd.concat([high - low, (high - prev_close).abs(), (low - prev_close).abs()], axis=1).max(axis=1)
+        self.tr[i] = _tail(tr, ATR_PERIOD - 1)
+        tp = (high + low + close) / 3
+        flow = tp * volume
+        self.pos_flow[i] = _tail(flow.where(tp > tp.shift(1), 0), MFI_PERIOD - 1)
+        self.neg_flow[i] = _tail(flow.where(tp < tp.shift(1), 0), MFI_PERIOD - 1)
+        self.prev['tp'][i] = tp.iloc[-1]
+        self.loaded[i] = True
+
+    def update(self, o, h, l, c, v) -> dict:
+        """Nến hôm nay (mảng [mã], NaN = chưa có) → {cột: mảng [mã]} như dòng cuối
+        của calculate_all_indicators trên lịch sử + nến hôm nay"""
+        out = {'open': o, 'high': h, 'low': l, 'close': c, 'volume': v}
+        with np.errstate(invalid='ignore', divide='ignore'):
+            cw = np.column_stack([self.close, c])
+            prev_close = self.close[:, -1]
+
+            # MA
+            for key, span in EMA_SPANS.items():
+                if key.startswith('ma'):
+                    out[key] = _ema(self.ema[key], c, span)
+            out['ma200'] = cw[:, -200:].mean(axis=1)
+            out['ma_aligned'] = (out['ma5'] > out['ma10']) & (out['ma10'] > out['ma20']) & (out['ma20'] > out['ma50'])
+            out['ma_partial_aligned'] = (out['ma10'] > out['ma20']) & (out['ma20'] > out['ma50'])
+            out['above_ma200'] = c > out['ma200']
+            out['above_ma50'] = c > out['ma50']
+            out['above_ma20'] = c > out['ma20']
+
+            # RSI: 14 delta gần nhất, delta NaN (phiên đầu) → 0 như delta.where(...)
+            delta = np.diff(cw[:, -15:], axis=1)
+            gain = np.where(delta > 0, delta, 0).mean(axis=1)
+            loss = np.where(delta < 0, -delta, 0).mean(axis=1)
+            rsi = 100 - (100 / (1 + gain / (loss + 0.0001)))
+            out['rsi'] = np.where(np.isnan(cw[:, -14]), np.nan, rsi)
+            out['rsi_overbought'] = out['rsi'] > RSI_OVERBOUGHT
+            out['rsi_oversold'] = out['rsi'] < RSI_OVERSOLD
+            out['rsi_ma'] = _mean_with(self.rsi, out['rsi'])
+            out['rsi_above_ma'] = out['rsi'] > out['rsi_ma']
+
+            # MACD
+            fast = _ema(self.ema['exp_fast'], c, MACD_FAST)
+            slow = _ema(self.ema['exp_slow'], c, MACD_SLOW)
+            macd = fast - slow
+            signal = _ema(self.ema['macd_signal'], macd, MACD_SIGNAL)
+            prev_signal = self.ema['macd_signal']
+            out.update(macd=macd, macd_signal=signal, macd_hist=macd - signal)
+            out['macd_bullish'] = macd > signal
+            out['macd_cross_up'] = (macd > signal) & (self.prev['macd'] <= prev_signal)
+            out['macd_cross_down'] = (macd < signal) & (self.prev['macd'] >= prev_signal)
+            out['macd_above_zero'] = macd > 0
+            out['macd_accel'] = out['macd_hist'] - self.prev['macd_hist']
+            out['macd_accelerating'] = out['macd_accel'] > 0
+
+            # Bollinger
+            window = cw[:, -BB_PERIOD:]
+            out['bb_mid'] = window.mean(axis=1)
+            out['bb_std'] = window.std(axis=1, ddof=1)
+            out['bb_upper'] = out['bb_mid'] + BB_STD * out['bb_std']
+            out['bb_lower'] = out['bb_mid'] - BB_STD * out['bb_std']
+            out['bb_percent'] = (c - out['bb_lower']) / (out['bb_upper'] - out['bb_lower']) * 100
+            out['bb_width'] = (out['bb_upper'] - out['bb_lower']) / out['bb_mid'] * 100
+            out['bb_squeeze'] = out['bb_width'] < _mean_with(self.bb_width, out['bb_width']) * 0.8
+            out['near_bb_lower'] = out['bb_percent'] < 20
+            out['near_bb_upper'] = out['bb_percent'] > 80
+
+            # Stochastic
+            low_min = np.column_stack([self.low[:, -(STOCH_K - 1):], l]).min(axis=1)
+            high_max = np.column_stack([self.high[:, -(STOCH_K - 1):], h]).max(axis=1)
+            out['stoch_k'] = 100 * (c - low_min) / (high_max - low_min + 0.0001)
+            out['stoch_d'] = _mean_with(self.stoch_k, out['stoch_k'])
+            out['stoch_overbought'] = out['stoch_k'] > 80
+            out['stoch_oversold'] = out['stoch_k'] < 20
+            out['stoch_bullish_cross'] = (out['stoch_k'] > out['stoch_d']) & \
+                (self.stoch_k[:, -1] <= self.prev['stoch_d'])
+
+            # ATR
+            tr = np.fmax(h - l, np.fmax(np.abs(h - prev_close), np.abs(l - prev_close)))
+            out['atr'] = _mean_with(self.tr, tr)
+            out['atr_percent'] = out['atr'] / c * 100
+
+            # Volume
+            out['vol_ma'] = _mean_with(self.volume, v)
+            out['vol_ratio'] = v / (out['vol_ma'] + 1)
+            out['vol_surge'] = out['vol_ratio'] > VOL_SURGE_THRESHOLD
+            out['vol_above_avg'] = out['vol_ratio'] > 1
+
+            # MFI
+            tp = (h + l + c) / 3
+            flow = tp * v
+            positive = np.column_stack([self.pos_flow, np.where(tp > self.prev['tp'], flow, 0)]).sum(axis=1)
+            negative = np.column_stack([self.neg_flow, np.where(tp < self.prev['tp'], flow, 0)]).sum(axis=1)
+            out['mfi'] = 100 - (100 / (1 + positive / (negative + 0.0001)))
+            out['mfi_bullish'] = out['mfi'] > 50
+            out['mfi_overbought'] = out['mfi'] > 80
+            out['mfi_oversold'] = out['mfi'] < 20
+
+            # OBV
+            step = np.where(c > prev_close, v, np.where(c < prev_close, -v, 0))
+            out['obv'] = self.prev['obv'] + step
+            out['obv_ma'] = _mean_with(self.obv, out['obv'])
+            out['obv_rising'] = out['obv'] > out['obv_ma']
+
+            # Linear Regression (nghiệm đóng của polyfit bậc 1)
+            y = cw[:, -LR_PERIOD:]
+            x = np.arange(LR_PERIOD) - (LR_PERIOD - 1) / 2
+            y_mean = y.mean(axis=1)
+            slope = ((y - y_mean[:, None]) * x).sum(axis=1) / (x ** 2).sum()
+            out['lr_value'] = y_mean + slope * (LR_PERIOD - 1) / 2
+            out['lr_slope'] = slope
+            out['lr_slope_pct'] = slope / c * 100
+            lr_std = y.std(axis=1, ddof=1)
+            out['lr_upper'] = out['lr_value'] + LR_STD * lr_std
+            out['lr_lower'] = out['lr_value'] - LR_STD * lr_std
+            out['is_uptrend_channel'] = out['lr_slope_pct'] > CHANNEL_UPTREND_THRESHOLD
+            out['is_downtrend_channel'] = out['lr_slope_pct'] < CHANNEL_DOWNTREND_THRESHOLD
+            out['is_sideways_channel'] = ~out['is_uptrend_channel'] & ~out['is_downtrend_channel']
+            out['channel_slope_up'] = out['lr_slope_pct'] > 0.02
+            out['channel_slope_down'] = out['lr_slope_pct'] < -0.02
+            out['channel_slope_flat'] = ~out['channel_slope_up'] & ~out['channel_slope_down']
+            out['channel_position'] = (c - out['lr_lower']) / (out['lr_upper'] - out['lr_lower'] + 0.0001) * 100
+            out['near_channel_bottom'] = out['channel_position'] < 30
+            out['near_channel_top'] = out['channel_position'] > 70
+
+            # Breakout: đỉnh / đáy các phiên trước (không gồm hôm nay)
+            for n in (20, 50):
+                out[f'highest_{n}'] = self.high[:, -n:].max(axis=1)
+                out[f'lowest_{n}'] = self.low[:, -n:].min(axis=1)
+            out['breakout_20'] = c > out['highest_20']
+            out['breakout_50'] = c > out['highest_50']
+            out['breakdown_20'] = c < out['lowest_20']
+            out['breakdown_50'] = c < out['lowest_50']
+
+            # Support / Resistance
+            out['support'] = np.column_stack([self.low[:, -19:], l]).min(axis=1)
+            out['resistance'] = np.column_stack([self.high[:, -19:], h]).max(axis=1)
+            out['near_support'] = (c - out['support']) / c < 0.03
+            out['near_resistance'] = (out['resistance'] - c) / c < 0.03
+        return out
+
+    def rows(self, cols: dict, mask: np.ndarray) -> dict:
+        """{mã: dòng chỉ báo đã chấm điểm} cho các mã trong mask"""
+        out = {}
+        for i in np.flatnonzero(mask & self.loaded):
+            row = {k: v[i].item() for k, v in cols.items()}
+            row['symbol'] = self.symbols[i]
+            out[self.symbols[i]] = self.analyzer.score_latest(row)
+        return out
+
+
+def _live_value(value):
+    if isinstance(value, float):
+        return None if math.isnan(value) or math.isinf(value) else round(value, 2)
+    return value
+
+
+def _write_json(path: str, payload: dict):
+    """Ghi nguyên tử (file tạm + rename) để dashboard không đọc phải file ghi dở"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.tmp"
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(payload, f, ensure_ascii=False, separators=(',', ':'))
+    os.replace(tmp, path)
+
+
+class LiveServer:
+    """SSE cho dashboard: GET /events (snapshot rồi delta mỗi vòng), GET /snapshot"""
+
+    def __init__(self, port: int = LIVE_PORT):
+        self.clients = []
+        self.lock = threading.Lock()
+        self.snapshot = '{}'
+        live = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def _headers(self, content_type):
+                self.send_response(200)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Cache-Control', 'no-cache')
+                self.send_header('Access-Control-Allow-Origin', '*')
+
+            def do_GET(self):
+                if self.path.startswith('/snapshot'):
+                    body = live.snapshot.encode('utf-8')
+                    self._headers('application/json; charset=utf-8')
+                    self.send_header('Content-Length', str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+                elif self.path.startswith('/events'):
+                    self._headers('text/event-stream; charset=utf-8')
+                    self.end_headers()
+                    live.stream(self.wfile)
+                else:
+                    self.send_error(404)
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', port), Handler)
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def stream(self, wfile):
+        """Giữ kết nối SSE: gửi snapshot hiện tại, sau đó các delta; ping mỗi 15s"""
+        q = queue.Queue(maxsize=100)
+        with self.lock:
+            self.clients.append(q)
+            first = self.snapshot
+        try:
+            wfile.write(f"event: snapshot\ndata: {first}\n\n".encode('utf-8'))
+            wfile.flush()
+            while True:
+                try:
+                    message = q.get(timeout=15)
+                except queue.Empty:
+                    message = ': ping\n\n'
+                wfile.write(message.encode('utf-8'))
+                wfile.flush()
+        except (BrokenPipeError, ConnectionResetError, OSError):
+            pass
+        finally:
+            with self.lock:
+                self.clients.remove(q)
+
+    def publish(self, event: str, data: str):
+        """'snapshot': chỉ giữ lại cho kết nối mới và /snapshot; sự kiện khác: đẩy tới mọi client"""
+        with self.lock:
+            if event == 'snapshot':
+                self.snapshot = data
+                return
+            for q in self.clients:
+                try:
+                    q.put_nowait(f"event: {event}\ndata: {data}\n\n")
+                except queue.Full:
+                    pass  # client quá chậm: bỏ delta, client tự lấy lại /snapshot khi lệch seq
+
+    def close(self):
+        self.server.shutdown()
+
+
+class LiveSession:
+    """Vòng lặp live: lấy nến intraday → nến ngày tạm tính → chỉ báo incremental → delta"""
+
+    def __init__(self, symbols: list = None, resolution: str = INTRADAY_RESOLUTION,
+                 out_dir: str = LIVE_DIR, server: LiveServer = None):
+        self.data = DataFetcher()
+        self.fetcher = self.data.fetcher
+        self.requested = symbols
+        self.resolution = resolution
+        self.out_dir = out_dir
+        self.server = server
+        self.session = TRADING_CALENDAR.today()
+        self.state = None
+        self.stocks = {}
+        self.seq = 0
+        self._pool = ThreadPoolExecutor(max_workers=LIVE_FETCH_WORKERS, thread_name_prefix='live')
+
+    # ------------------------------------------------------------------
+    def _closed_history(self, panel: PricePanel, symbol: str) -> pd.DataFrame:
+        if symbol not in panel:
+            return None
+        hist = panel.history(symbol)
+        return hist[pd.to_datetime(hist['time']) < pd.Timestamp(self.session)]
+
+    def bootstrap(self, symbols: list = None):
+        """Tính state từ panel (toàn bộ, hoặc chỉ `symbols` khi nguồn điều chỉnh lịch sử)"""
+        t0 = time.time()
+        stored = StoredHistory()
+        if not stored:
+            raise RuntimeError("Chưa có lịch sử giá (chạy main.py trước)")
+        panel = stored.panel
+        if symbols is None:
+            universe = self.requested or panel.symbols
+            self.state = IndicatorState(universe)
+            self.stocks = {}
+            symbols = universe
+        for symbol in symbols:
+            self.state.load(symbol, self._closed_history(panel, symbol))
+        self._panel_mtime = PricePanel.mtime(PANEL_DIR)
+        self._last_date = panel.dates[-1] if len(panel.dates) else None
+        print(f"🧮 State chỉ báo: {int(self.state.loaded.sum())}/{len(self.state.symbols)} mã"
+              f" (lịch sử tới {self._last_date.date() if self._last_date is not None else '?'},"
+              f" {time.time() - t0:.1f}s)")
+
+    def _check_invalidation(self):
+        """Panel được ghi lại: phiên mới → tính lại toàn bộ; cùng phiên → chỉ các mã bị điều chỉnh"""
+        mtime = PricePanel.mtime(PANEL_DIR)
+        if mtime <= self._panel_mtime:
+            return
+        panel = StoredHistory().panel
+        if panel is None:
+            return
+        if self._last_date is None or panel.dates[-1] > self._last_date:
+            print("🔁 Panel có phiên mới → tính lại toàn bộ state")
+            self.bootstrap()
+            return
+        revised = sorted(revised_since(self.session.isoformat(), REVISIONS_FILE) & set(self.state.symbols))
+        if revised:
+            print(f"🔁 Lịch sử bị điều chỉnh, tính lại: {', '.join(revised)}")
+            self.bootstrap(revised)
+        self._panel_mtime = mtime
+
+    # ------------------------------------------------------------------
+    def _fetch(self) -> BarBuffer:
+        symbols = self.state.symbols
+        results = self._pool.map(
+            lambda s: self.fetcher.get_bars(s, days=1, resolution=self.resolution), symbols)
+        buf = BarBuffer(capacity=len(symbols) * BARS_PER_SESSION[self.resolution])
+        for symbol, cols in zip(symbols, results):
+            buf.append(symbol, cols)
+        return buf
+
+    def poll(self) -> dict:
+        """1 vòng: trả về delta {seq, base, time, changes}"""
+        self._check_invalidation()
+        t0 = time.perf_counter()
+        buf = self._fetch()
+        t1 = time.perf_counter()
+
+        today = partial_daily(buf, self.session)
+        n = len(self.state.symbols)
+        bar = {k: np.full(n, np.nan) for k in ('open', 'high', 'low', 'close', 'volume')}
+        idx = np.array([self.state.index[s] for s in today['symbol']], dtype=np.int64)
+        for key in bar:
+            bar[key][idx] = today[key].to_numpy(np.float64)
+        cols = self.state.update(bar['open'], bar['high'], bar['low'], bar['close'], bar['volume'])
+        rows = self.state.rows(cols, ~np.isnan(bar['close']))
+
+        changes = {}
+        classified = classify_stocks(pd.DataFrame(list(rows.values())))
+        for (symbol, row), label, score_100 in zip(rows.items(), classified['signal_label'],
+                                                   classified['score_100']):
+            row['signal_label'] = label
+            row['score_100'] = score_100
+            fields = {k: _live_value(row.get(k)) for k in LIVE_FIELDS}
+            old = self.stocks.get(symbol, {})
+            diff = {k: v for k, v in fields.items() if old.get(k) != v}
+            if diff:
+                changes[symbol] = diff
+                self.stocks[symbol] = fields
+        t2 = time.perf_counter()
+
+        base = self.seq
+        self.seq += 1
+        now = datetime.now(TRADING_CALENDAR.tz).strftime('%Y-%m-%d %H:%M:%S')
+        delta = {'seq': self.seq, 'base': base, 'time': now, 'changes': changes}
+        snapshot = {'seq': self.seq, 'time': now, 'session': self.session.isoformat(),
+                    'stocks': self.stocks}
+        self.publish(snapshot, delta)
+        print(f"🔄 #{self.seq} {now[11:]} | {len(rows)}/{n} mã có nến | lấy {t1 - t0:.1f}s"
+              f" | tính {(t2 - t1) * 1000:.0f}ms | {len(changes)} mã thay đổi")
+        return delta
+
+    def publish(self, snapshot: dict, delta: dict):
+        _write_json(os.path.join(self.out_dir, 'snapshot.json'), snapshot)
+        _write_json(os.path.join(self.out_dir, 'delta.json'), delta)
+        if self.server:
+            self.server.publish('snapshot', json.dumps(snapshot, ensure_ascii=False, separators=(',', ':')))
+            self.server.publish('delta', json.dumps(delta, ensure_ascii=False, separators=(',', ':')))
+
+    def run(self, interval: int = LIVE_INTERVAL_SECONDS, once: bool = False, force: bool = False):
+        if not force and not TRADING_CALENDAR.in_session():
+            print(f"🏖️ Ngoài giờ giao dịch ({TRADING_CALENDAR.now():%H:%M}) - dùng --force để chạy")
+            return
+        source = self.fetcher.probe_sources()
+        if not source:
+            print("❌ Không kết nối được nguồn dữ liệu nào")
+            return
+        self.fetcher._active_source = source
+        self.bootstrap()
+        while True:
+            started = time.time()
+            self.poll()
+            if once or (not force and not TRADING_CALENDAR.in_session()):
+                break
+            time.sleep(max(0.0, interval - (time.time() - started)))
+        self.fetcher.limiter.save()
+        print(f"⏹️ Dừng live ({self.seq} vòng)")
+
+
+def main():
+    ap = argparse.ArgumentParser(description='Live mode: cập nhật chỉ báo trong phiên')
+    ap.add_argument('--symbols', help='danh sách mã, vd FPT,HPG (mặc định: universe trong panel)')
+    ap.add_argument('--interval', type=int, default=LIVE_INTERVAL_SECONDS, help='giây giữa 2 vòng')
+    ap.add_argument('--resolution', default=INTRADAY_RESOLUTION, help='1m | 15m | 1h')
+    ap.add_argument('--port', type=int, default=LIVE_PORT, help='cổng SSE (0: không chạy server)')
+    ap.add_argument('--once', action='store_true', help='chạy 1 vòng rồi thoát')
+    ap.add_argument('--force', action='store_true', help='chạy cả ngoài giờ giao dịch')
+    args = ap.parse_args()
+
+    symbols = [s.strip().upper() for s in args.symbols.split(',')] if args.symbols else None
+    server = LiveServer(args.port) if args.port else None
+    if server:
+        print(f"📡 SSE: {server.url}/events | dashboard: docs/index.html?live={server.url}")
+    try:
+        LiveSession(symbols, args.resolution, server=server).run(args.interval, args.once, args.force)
+    except KeyboardInterrupt:
+        print("\n⏹️ Dừng live")
+    finally:
+        if server:
+            server.close()
+
+
+if __name__ == '__main__':
+    main()
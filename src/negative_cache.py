@@ -0,0 +1,99 @@
+"""
+VN Stock Sniper - Negative Cache
+Ghi nhớ các mã không có dữ liệu (hủy niêm yết / tạm ngừng / sai mã) để không
+tốn request mỗi ngày.
+
+State tại data/negative_cache.json:
+    {symbol: {sources: {DNSE: "empty", ...}, fails, first_seen, last_checked, next_check}}
+
+- Mã bị đánh dấu khi mọi nguồn đều trả về rỗng / 404 (lỗi mạng không tính).
+- Kiểm tra lại theo chu kỳ tăng gấp đôi: 1, 2, 4, 8... ngày (tối đa NEGATIVE_CACHE_MAX_DAYS).
+- Có dữ liệu trở lại → xóa khỏi cache.
+- Nguồn từng trả rỗng cho 1 mã được thử sau cùng (mã chỉ có trên 1 nguồn).
+"""
+
+import json
+import os
+from datetime import datetime, timedelta
+
+from src.config import NEGATIVE_CACHE_FILE, NEGATIVE_CACHE_BASE_DAYS, NEGATIVE_CACHE_MAX_DAYS
+
+EMPTY = "empty"
+ERROR = "error"
+OK = "ok"
+
+
+class NegativeCache:
+    """Cache các kết quả 'không có dữ liệu' theo mã và nguồn"""
+
+    def __init__(self, path: str = NEGATIVE_CACHE_FILE):
+        self.path = path
+        self.entries = self.load()
+        self.revived = []
+
+    def load(self) -> dict:
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    return json.load(f)
+            except (json.JSONDecodeError, OSError):
+                print(f"⚠️ Không đọc được {self.path}, khởi tạo lại")
+        return {}
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        with open(self.path, 'w', encoding='utf-8') as f:
+            json.dump(self.entries, f, ensure_ascii=False, indent=1, sort_keys=True)
+
+    # ------------------------------------------------------------------
+    def is_dead(self, symbol: str) -> bool:
+        """Mã đã bị đánh dấu và chưa tới hạn kiểm tra lại"""
+        entry = self.entries.get(symbol)
+        if not entry or entry.get('fails', 0) == 0:
+            return False
+        return datetime.now().isoformat(timespec='seconds') < entry.get('next_check', '')
+
+    def partition(self, symbols: list) -> tuple:
+        """(cần lấy, bỏ qua, kiểm tra lại) - kiểm tra lại là mã trong cache đã tới hạn"""
+        skip = [s for s in symbols if self.is_dead(s)]
+        skip_set = set(skip)
+        fetch = [s for s in symbols if s not in skip_set]
+        recheck = [s for s in fetch if self.entries.get(s, {}).get('fails', 0) > 0]
+        return fetch, skip, recheck
+
+    def order_sources(self, symbol: str, sources: list) -> list:
+        """Đưa các nguồn từng trả rỗng cho mã này xuống cuối"""
+        empty = self.entries.get(symbol, {}).get('sources', {})
+        if not empty:
+            return sources
+        return ([s for s in sources if empty.get(s) != EMPTY]
+                + [s for s in sources if empty.get(s) == EMPTY])
+
+    def record(self, symbol: str, outcome: dict):
+        """Cập nhật sau 1 lần lấy: outcome = {source: 'ok' | 'empty' | 'error'}"""
+        if not outcome:
+            return
+        if OK in outcome.values():
+            if self.entries.pop(symbol, None) is not None:
+                self.revived.append(symbol)
+            return
+
+        now = datetime.now()
+        entry = self.entries.setdefault(symbol, {'sources': {}, 'fails': 0,
+                                                 'first_seen': now.strftime('%Y-%m-%d')})
+        for source, result in outcome.items():
+            if result == EMPTY:
+                entry['sources'][source] = EMPTY
+        entry['last_checked'] = now.isoformat(timespec='seconds')
+
+        # Chỉ đánh dấu chết khi mọi nguồn đã trả lời "không có" (không phải lỗi mạng)
+        if all(r == EMPTY for r in outcome.values()):
+            entry['fails'] = entry.get('fails', 0) + 1
+            wait = min(NEGATIVE_CACHE_BASE_DAYS * 2 ** (entry['fails'] - 1), NEGATIVE_CACHE_MAX_DAYS)
+            # Trừ 1 giờ để lần chạy hằng ngày (giờ lệch vài phút) vẫn tới hạn
+            entry['next_check'] = (now + timedelta(days=wait, hours=-1)).isoformat(timespec='seconds')
+        elif entry.get('fails', 0) == 0 and not entry['sources']:
+            self.entries.pop(symbol, None)
+
+    def dead_symbols(self) -> list:
+        return sorted(s for s in self.entries if self.is_dead(s))
@@ -0,0 +1,157 @@
+"""
+VN Stock Sniper - Price Panel
+Panel giá dày [mã, ngày, trường] lưu bằng file .npy memory-mapped: mở tức thì,
+chỉ đọc vào RAM phần dữ liệu thực sự dùng tới.
+
+Thư mục data/panel/:
+    values.npy   float64 (hoặc float32) shape [S, D, F], NaN = không có nến
+    mask.npy     bool [S, D], True = có nến
+    meta.json    {symbols, dates, fields, dtype, created_at}
+
+    panel = PricePanel.open()                  # memmap, không đọc cả file
+    panel.history('FPT')                       # DataFrame 1 mã (time, open, ..., symbol)
+    closes = panel.field('close')              # view [S, D]
+    panel.values[panel.sym_index['FPT'], -20:, :]
+"""
+
+import json
+import os
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from src.config import PANEL_DIR, PANEL_DTYPE
+
+FIELDS = ('open', 'high', 'low', 'close', 'volume')
+
+
+class PricePanel:
+    """Panel giá [symbols, dates, fields] + bảng tra mã / ngày"""
+
+    def __init__(self, values: np.ndarray, mask: np.ndarray, symbols: list, dates,
+                 fields: tuple = FIELDS, path: str = None):
+        self.values = values
+        self.mask = mask
+        self.symbols = list(symbols)
+        self.dates = pd.DatetimeIndex(dates)
+        self.fields = tuple(fields)
+        self.path = path
+        self.sym_index = {s: i for i, s in enumerate(self.symbols)}
+        self.field_index = {f: i for i, f in enumerate(self.fields)}
+
+    def __len__(self):
+        return len(self.symbols)
+
+    def __contains__(self, symbol):
+        return symbol in self.sym_index
+
+    @property
+    def shape(self) -> tuple:
+        return self.values.shape
+
+    # ------------------------------------------------------------------
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, dtype: str = PANEL_DTYPE) -> 'PricePanel':
+        """Long frame (time, open, high, low, close, volume, symbol) → panel trong RAM"""
+        times = pd.to_datetime(df['time']).dt.normalize()
+        if getattr(times.dt, 'tz', None) is not None:
+            times = times.dt.tz_localize(None)
+        sym_codes, symbols = pd.factorize(df['symbol'], sort=False)
+        dates = pd.DatetimeIndex(np.unique(times.to_numpy()))
+        date_codes = dates.get_indexer(times)
+
+        values = np.full((len(symbols), len(dates), len(FIELDS)), np.nan, dtype=dtype)
+        values[sym_codes, date_codes, :] = df[list(FIELDS)].to_numpy(dtype=dtype)
+        mask = np.zeros((len(symbols), len(dates)), dtype=bool)
+        mask[sym_codes, date_codes] = True
+        return cls(values, mask, [str(s) for s in symbols], dates)
+
+    def save(self, path: str = PANEL_DIR):
+        """Ghi values/mask qua open_memmap, meta.json ghi sau cùng (đánh dấu panel hoàn chỉnh)"""
+        os.makedirs(path, exist_ok=True)
+        for name, arr in (('values', self.values), ('mask', self.mask)):
+            tmp = os.path.join(path, f'{name}.tmp.npy')
+            out = np.lib.format.open_memmap(tmp, mode='w+', dtype=arr.dtype, shape=arr.shape)
+            out[...] = arr
+            out.flush()
+            del out
+            os.replace(tmp, os.path.join(path, f'{name}.npy'))
+
+        meta = {
+            'symbols': self.symbols,
+            'dates': [d.strftime('%Y-%m-%d') for d in self.dates],
+            'fields': list(self.fields),
+            'dtype': str(self.values.dtype),
+            'shape': list(self.values.shape),
+            'created_at': datetime.now().isoformat(timespec='seconds'),
+        }
+        tmp = os.path.join(path, 'meta.tmp.json')
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(meta, f, ensure_ascii=False)
+        os.replace(tmp, os.path.join(path, 'meta.json'))
+        self.path = path
+        mb = self.values.nbytes / 1e6
+        print(f"✅ Panel: {path} ({len(self.symbols)} mã x {len(self.dates)} ngày, {mb:.1f} MB)")
+
+    @classmethod
+    def open(cls, path: str = PANEL_DIR, mode: str = 'r') -> 'PricePanel':
+        """Mở panel dạng memmap (None nếu chưa có / không khớp meta)"""
+        meta_file = os.path.join(path, 'meta.json')
+        if not os.path.exists(meta_file):
+            return None
+        try:
+            with open(meta_file, 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+            values = np.load(os.path.join(path, 'values.npy'), mmap_mode=mode)
+            mask = np.load(os.path.join(path, 'mask.npy'), mmap_mode=mode)
+        except (OSError, ValueError, json.JSONDecodeError) as e:
+            print(f"⚠️ Không mở được panel {path}: {e}")
+            return None
+        if list(values.shape) != meta.get('shape') or mask.shape != values.shape[:2]:
+            print(f"⚠️ Panel {path} không khớp meta.json, bỏ qua")
+            return None
+        return cls(values, mask, meta['symbols'], pd.to_datetime(meta['dates']),
+                   meta['fields'], path=path)
+
+    @staticmethod
+    def mtime(path: str = PANEL_DIR) -> float:
+        """Thời điểm ghi panel (0 nếu chưa có)"""
+        meta_file = os.path.join(path, 'meta.json')
+        return os.path.getmtime(meta_file) if os.path.exists(meta_file) else 0.0
+
+    # ------------------------------------------------------------------
+    def field(self, name: str) -> np.ndarray:
+        """View [S, D] của 1 trường (không copy)"""
+        return self.values[:, :, self.field_index[name]]
+
+    def date_loc(self, date) -> int:
+        """Vị trí ngày trong panel (-1 nếu không có)"""
+        return int(self.dates.get_indexer([pd.Timestamp(date).normalize()])[0])
+
+    def history(self, symbol: str, last: int = None) -> pd.DataFrame:
+        """DataFrame 1 mã, chỉ các ngày có nến (cùng cột như raw_data)"""
+        i = self.sym_index.get(symbol)
+        if i is None:
+            return pd.DataFrame()
+        valid = np.flatnonzero(self.mask[i])
+        if last:
+            valid = valid[-last:]
+        block = np.asarray(self.values[i, valid, :], dtype=np.float64)
+        df = pd.DataFrame(block, columns=list(self.fields))
+        if 'volume' in df.columns:
+            df['volume'] = df['volume'].astype(np.int64)
+        df.insert(0, 'time', self.dates[valid])
+        df['symbol'] = symbol
+        return df
+
+    def to_frame(self) -> pd.DataFrame:
+        """Panel → long frame (symbol, time) như raw_data.csv"""
+        s_idx, d_idx = np.nonzero(np.asarray(self.mask))
+        block = np.asarray(self.values[s_idx, d_idx, :], dtype=np.float64)
+        df = pd.DataFrame(block, columns=list(self.fields))
+        if 'volume' in df.columns:
+            df['volume'] = df['volume'].astype(np.int64)
+        df.insert(0, 'time', self.dates[d_idx])
+        df['symbol'] = np.array(self.symbols, dtype=object)[s_idx]
+        return df
@@ -0,0 +1,411 @@
+"""
+VN Stock Sniper - Query Server
+Server HTTP cục bộ (chỉ đọc) cho các tool nội bộ: nạp analyzed_data.csv, panel giá
+và lịch sử snapshot vào bộ nhớ 1 lần, trả JSON có cache, gzip và ETag.
+
+    GET /health                              trạng thái, số mã, thời điểm nạp
+    GET /symbols                             danh sách mã
+    GET /symbol/FPT                          toàn bộ trường phân tích của 1 mã
+    GET /screener?min_total_score=25&min_stars=4&signal=buy&channel=XANH&vol_surge=1
+                 &sort=total_score&order=desc&limit=50&fields=symbol,close,rsi
+    GET /screener?stars=5&fields=symbol,close,total_score  (= q=stars == 5)
+    GET /rankings?by=total_score&limit=20[&order=asc][&fields=...]
+    GET /screener?q=rsi < 35 and vol_ratio > 2 and channel == "XANH"     (src.screener)
+    GET /scan?q=macd_cross_up and vol_surge&days=365&limit=20  (lọc trên lịch sử snapshot)
+    GET /breadth?terms=vol_surge,channel=XANH,stars=5&days=30   (bitmap index, số mã mỗi ngày)
+    GET /history/FPT?fields=close,total_score&days=60    (snapshot data/history)
+    GET /prices/FPT?last=120                               (OHLCV từ panel)
+
+Screener: min_<cột> / max_<cột> cho cột số, <cột>=1|0 cho cột bool, <cột>=<giá trị> cho cột
+số nguyên / phân loại (stars=5, signal_status=...), signal=buy|sell, channel=XANH|ĐỎ|XÁM,
+symbols=FPT,HPG, q=<biểu thức> (kết hợp AND với các tham số khác).
+
+Mỗi response được mã hóa 1 lần rồi cache theo (đường dẫn, query), kèm bản gzip và
+ETag; If-None-Match khớp → 304. analyzed_data.csv hoặc panel thay đổi → nạp lại và xóa cache.
+
+    python -m src.query_server                 # http://127.0.0.1:8780
+    curl -s --compressed 'localhost:8780/rankings?limit=5'
+"""
+
+import argparse
+import gzip
+import json
+import os
+import threading
+import time
+import zlib
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qsl
+
+import numpy as np
+import pandas as pd
+
+from src.config import ANALYZED_DATA_FILE, PANEL_DIR, QUERY_PORT, QUERY_CACHE_SIZE
+from src.bitmap_index import BitmapIndex, _bool_values
+from src.history_store import HistoryStore, _LRU
+from src.panel import PricePanel
+from src.screener import Screener, FrameSource, HistorySource, ScreenError
+
+RELOAD_CHECK_SECONDS = 2      # Kiểm tra file thay đổi tối đa 1 lần / 2s
+GZIP_MIN_BYTES = 1024         # Response nhỏ hơn: không nén
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 1000
+SCREENER_RESERVED = {'signal', 'channel', 'symbols', 'sort', 'order', 'limit', 'fields', 'q'}
+
+
+class QueryError(Exception):
+    """Lỗi truy vấn → HTTP status + thông báo"""
+
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+def _records(df: pd.DataFrame) -> list:
+    """DataFrame → list dict thuần JSON (NaN → null, numpy → kiểu Python)"""
+    if df.empty:
+        return []
+    return json.loads(df.to_json(orient='records', date_format='iso', force_ascii=False))
+
+
+def _int_param(params: dict, key: str, default: int, limit: int = MAX_LIMIT) -> int:
+    try:
+        value = int(params.get(key, default))
+    except ValueError:
+        raise QueryError(400, f"{key} phải là số nguyên")
+    return max(0, min(value, limit))
+
+
+class QueryIndex:
+    """Dữ liệu đã phân tích trong bộ nhớ + các truy vấn (trả object Python)"""
+
+    def __init__(self, analyzed_file: str = ANALYZED_DATA_FILE, panel_dir: str = PANEL_DIR,
+                 history: HistoryStore = None):
+        self.analyzed_file = analyzed_file
+        self.panel_dir = panel_dir
+        self.history_store = history or HistoryStore()
+        self.bitmaps = BitmapIndex(self.history_store)
+        self.version = 0
+        self._stamp = None
+        self._checked_at = 0.0
+        self.reload()
+
+    def _file_stamp(self) -> tuple:
+        analyzed = os.path.getmtime(self.analyzed_file) if os.path.exists(self.analyzed_file) else 0
+        return analyzed, PricePanel.mtime(self.panel_dir)
+
+    def maybe_reload(self) -> bool:
+        """Nạp lại nếu analyzed_data.csv / panel đổi (stat tối đa 1 lần mỗi RELOAD_CHECK_SECONDS)"""
+        now = time.monotonic()
+        if now - self._checked_at < RELOAD_CHECK_SECONDS:
+            return False
+        self._checked_at = now
+        if self._file_stamp() == self._stamp:
+            return False
+        self.reload()
+        return True
+
+    def reload(self):
+        self._stamp = self._file_stamp()
+        df = pd.read_csv(self.analyzed_file) if os.path.exists(self.analyzed_file) else pd.DataFrame()
+        if 'symbol' in df.columns:
+            df = df.drop_duplicates('symbol').reset_index(drop=True)
+        else:
+            df = pd.DataFrame(columns=['symbol'])
+        self.frame = df
+        self.screen = Screener(FrameSource(df))
+        self.scans = {}
+        self.records = {r['symbol']: r for r in _records(df)}
+        self.panel = PricePanel.open(self.panel_dir) if self._stamp[1] else None
+        self.version += 1
+        self.loaded_at = datetime.now().isoformat(timespec='seconds')
+        print(f"📚 Nạp {len(self.records)} mã từ {self.analyzed_file}"
+              f"{f', panel {len(self.panel)} mã' if self.panel is not None else ''} (v{self.version})")
+
+    # ------------------------------------------------------------------
+    def _column(self, name: str) -> pd.Series:
+        if name not in self.frame.columns:
+            raise QueryError(400, f"không có cột '{name}'")
+        return self.frame[name]
+
+    def _fields(self, params: dict) -> list:
+        fields = [f for f in params.get('fields', '').split(',') if f]
+        for f in fields:
+            self._column(f)
+        return fields
+
+    def _select(self, mask, params: dict, sort: str, order: str) -> list:
+        df = self.frame[mask] if mask is not None else self.frame
+        if sort:
+            self._column(sort)
+            df = df.sort_values(sort, ascending=order == 'asc', kind='stable', na_position='last')
+        df = df.head(_int_param(params, 'limit', DEFAULT_LIMIT))
+        fields = self._fields(params)
+        if fields:
+            return _records(df[fields])
+        return [self.records[s] for s in df['symbol']]
+
+    def health(self) -> dict:
+        return {'status': 'ok', 'symbols': len(self.records), 'version': self.version,
+                'loaded_at': self.loaded_at,
+                'panel': list(self.panel.shape) if self.panel is not None else None,
+                'history_dates': len(self.history_store.list_dates())}
+
+    def symbols(self) -> list:
+        return list(self.records)
+
+    def symbol(self, symbol: str) -> dict:
+        record = self.records.get(symbol.upper())
+        if record is None:
+            raise QueryError(404, f"không có mã {symbol}")
+        return record
+
+    def _equals(self, key: str, value: str) -> np.ndarray:
+        """<cột>=<giá trị>: cột bool nhận 1|0, cột số nguyên / phân loại so bằng"""
+        col = self._column(key)
+        flags = _bool_values(col)
+        if flags is not None:
+            if value.lower() in ('1', 'true', 'yes'):
+                return flags
+            if value.lower() in ('0', 'false', 'no'):
+                return ~flags
+            raise QueryError(400, f"{key} là cột bool: dùng {key}=1 hoặc {key}=0")
+        if pd.api.types.is_integer_dtype(col.dtype):
+            try:
+                return (col == int(value)).to_numpy()
+            except ValueError:
+                raise QueryError(400, f"{key} phải là số nguyên")
+        if not pd.api.types.is_numeric_dtype(col.dtype):
+            return (col.astype(str).str.upper() == value.upper()).to_numpy() & col.notna().to_numpy()
+        raise QueryError(400, f"{key} là cột số thực: dùng min_{key} / max_{key} hoặc q=")
+
+    def screener(self, params: dict) -> dict:
+        mask = np.ones(len(self.frame), dtype=bool)
+        for key, value in params.items():
+            if key in SCREENER_RESERVED:
+                continue
+            if key.startswith(('min_', 'max_')):
+                col = pd.to_numeric(self._column(key[4:]), errors='coerce')
+                try:
+                    bound = float(value)
+                except ValueError:
+                    raise QueryError(400, f"{key} phải là số")
+                mask &= (col >= bound if key.startswith('min_') else col <= bound).to_numpy()
+            else:
+                mask &= self._equals(key, value)
+
+        signal = params.get('signal', '').lower()
+        if signal in ('buy', 'sell'):
+            col = self.frame.get(f'{signal}_signal', pd.Series('', index=self.frame.index))
+            mask &= (col.fillna('').astype(str) != '').to_numpy()
+        elif signal:
+            raise QueryError(400, "signal phải là buy hoặc sell")
+        if params.get('channel'):
+            mask &= self._column('channel').fillna('').str.contains(
+                params['channel'].upper(), regex=False).to_numpy()
+        if params.get('q'):
+            try:
+                mask &= self.screen.mask(params['q'])
+            except ScreenError as e:
+                raise QueryError(400, f"q: {e}")
+        if params.get('symbols'):
+            wanted = {s.strip().upper() for s in params['symbols'].split(',')}
+            mask &= self.frame['symbol'].isin(wanted).to_numpy()
+
+        rows = self._select(mask, params, params.get('sort', 'total_score'), params.get('order', 'desc'))
+        return {'count': int(mask.sum()), 'rows': rows}
+
+    def rankings(self, params: dict) -> list:
+        by = params.get('by', 'total_score')
+        order = params.get('order', 'desc')
+        if 'fields' not in params:
+            params = {**params, 'fields': ','.join(f for f in ('symbol', by, 'close', 'stars', 'buy_signal')
+                                                   if f in self.frame.columns)}
+        return self._select(None, {**params, 'limit': params.get('limit', 20)}, by, order)
+
+    def scan(self, params: dict) -> dict:
+        """Biểu thức trên lịch sử snapshot: các mã thỏa theo từng ngày (mới nhất trước)"""
+        if not params.get('q'):
+            raise QueryError(400, "/scan?q=<biểu thức>")
+        days = _int_param(params, 'days', 365, limit=3650)
+        screen = self.scans.get(days)
+        if screen is None:
+            screen = self.scans[days] = Screener(HistorySource(self.history_store, days=days))
+        try:
+            rows = screen.select(params['q'])
+        except ScreenError as e:
+            raise QueryError(400, f"q: {e}")
+        by_date = rows.groupby('date', sort=True)['symbol'].apply(list)
+        by_date = by_date.iloc[::-1].head(_int_param(params, 'limit', 20))
+        return {'count': len(rows), 'dates': screen.source.shape[0],
+                'matches': [{'date': d, 'symbols': symbols} for d, symbols in by_date.items()]}
+
+    def breadth(self, params: dict) -> list:
+        """Số mã thỏa từng điều kiện bool / phân loại mỗi ngày (bitmap index)"""
+        terms = [t for t in params.get('terms', 'vol_surge,bb_squeeze,channel=XANH').split(',') if t]
+        days = _int_param(params, 'days', 30, limit=3650)
+        try:
+            df = self.bitmaps.breadth(terms, days=days)
+        except ValueError as e:
+            raise QueryError(400, str(e))
+        return _records(df.reset_index())
+
+    def history(self, symbol: str, params: dict) -> list:
+        fields = [f for f in params.get('fields', 'close,total_score,stars').split(',') if f]
+        days = _int_param(params, 'days', 60, limit=3650)
+        if self.history_store.list_dates(days=days):
+            for f in fields:
+                p = self.history_store.panel(f, days=days)
+                if p.empty or p.isna().all().all():
+                    raise QueryError(400, f"không có cột '{f}' trong lịch sử")
+        df = self.history_store.symbol_history(symbol.upper(), fields, days=days)
+        if df.empty:
+            return []
+        df.index.name = 'date'
+        return _records(df.reset_index())
+
+    def prices(self, symbol: str, params: dict) -> list:
+        if self.panel is None or symbol.upper() not in self.panel:
+            raise QueryError(404, f"không có giá của {symbol}")
+        df = self.panel.history(symbol.upper(), last=_int_param(params, 'last', 120, limit=100000))
+        df['time'] = df['time'].dt.strftime('%Y-%m-%d')
+        return _records(df.drop(columns=['symbol']))
+
+    def route(self, path: str, params: dict):
+        parts = [p for p in path.split('/') if p]
+        if not parts:
+            parts = ['health']
+        name, arg = parts[0], (parts[1] if len(parts) > 1 else None)
+        if name in ('symbol', 'history', 'prices') and arg is None:
+            raise QueryError(400, f"/{name}/<mã>")
+        if name == 'health':
+            return self.health()
+        if name == 'symbols':
+            return self.symbols()
+        if name == 'symbol':
+            return self.symbol(arg)
+        if name == 'screener':
+            return self.screener(params)
+        if name == 'rankings':
+            return self.rankings(params)
+        if name == 'scan':
+            return self.scan(params)
+        if name == 'breadth':
+            return self.breadth(params)
+        if name == 'history':
+            return self.history(arg, params)
+        if name == 'prices':
+            return self.prices(arg, params)
+        raise QueryError(404, f"không có endpoint /{name}")
+
+
+class CachedResponse:
+    """Body JSON đã mã hóa + bản gzip + ETag"""
+
+    def __init__(self, status: int, payload, version: int):
+        self.status = status
+        self.body = json.dumps(payload, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        self.etag = f'"{version}-{zlib.crc32(self.body):08x}"'
+        self.gzip = gzip.compress(self.body, 6) if len(self.body) >= GZIP_MIN_BYTES else None
+
+
+class QueryServer:
+    """HTTP server đa luồng trên QueryIndex, cache response theo (đường dẫn, query)"""
+
+    def __init__(self, index: QueryIndex, port: int = QUERY_PORT, host: str = '127.0.0.1'):
+        self.index = index
+        self.cache = _LRU(QUERY_CACHE_SIZE)
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'   # keep-alive: tool gọi liên tục không mở lại kết nối
+            disable_nagle_algorithm = True  # header + body gửi riêng: tránh trễ ~40ms delayed ACK
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                resp = server.respond(self.path)
+                if resp.etag in (self.headers.get('If-None-Match') or ''):
+                    self.send_response(304)
+                    self.send_header('ETag', resp.etag)
+                    self.send_header('Content-Length', '0')
+                    self.end_headers()
+                    return
+                body = resp.body
+                use_gzip = resp.gzip is not None and 'gzip' in (self.headers.get('Accept-Encoding') or '')
+                if use_gzip:
+                    body = resp.gzip
+                self.send_response(resp.status)
+                self.send_header('Content-Type', 'application/json; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.send_header('ETag', resp.etag)
+                self.send_header('Cache-Control', 'no-cache')
+                self.send_header('Vary', 'Accept-Encoding')
+                self.send_header('Access-Control-Allow-Origin', '*')
+                if use_gzip:
+                    self.send_header('Content-Encoding', 'gzip')
+                self.end_headers()
+                self.wfile.write(body)
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        self.url = f"http://{host}:{self.server.server_address[1]}"
+
+    def respond(self, raw_path: str) -> CachedResponse:
+        url = urlparse(raw_path)
+        params = dict(parse_qsl(url.query))
+        key = (url.path.rstrip('/'), tuple(sorted(params.items())))
+        with self.lock:
+            if self.index.maybe_reload():
+                self.cache.clear()
+            cached = self.cache.get(key)
+            if cached is not None:
+                self.hits += 1
+                return cached
+            self.misses += 1
+            version = self.index.version
+        # Tính ngoài lock: /scan, /breadth nguội đọc hàng trăm snapshot, không chặn request khác
+        try:
+            resp = CachedResponse(200, self.index.route(url.path, params), version)
+        except QueryError as e:
+            resp = CachedResponse(e.status, {'error': str(e)}, version)
+        with self.lock:
+            # Dữ liệu đã nạp lại trong lúc tính → không cache kết quả của bản cũ
+            if resp.status != 400 and self.index.version == version:
+                self.cache.put(key, resp)
+        return resp
+
+    def serve_forever(self):
+        self.server.serve_forever()
+
+    def start(self):
+        """Chạy trong thread nền (dùng khi nhúng vào tool khác / kiểm thử)"""
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def close(self):
+        self.server.shutdown()
+
+
+def main():
+    ap = argparse.ArgumentParser(description='Query server cho dữ liệu đã phân tích')
+    ap.add_argument('--port', type=int, default=QUERY_PORT)
+    ap.add_argument('--host', default='127.0.0.1')
+    args = ap.parse_args()
+
+    server = QueryServer(QueryIndex(), args.port, args.host)
+    print(f"🔎 Query server: {server.url}  (Ctrl+C để dừng)")
+    print("   /health /symbols /symbol/<mã> /screener /scan /breadth /rankings /history/<mã> /prices/<mã>")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print(f"\n⏹️ Dừng ({server.hits} cache hit / {server.misses} miss)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,156 @@
+"""
+VN Stock Sniper - Adaptive Rate Limiter (AIMD)
+Giới hạn tốc độ request riêng cho từng nguồn, thay cho REQUEST_DELAY cố định.
+
+- Response khỏe: tăng rate cộng dồn (+RATE_LIMIT_INCREASE req/s)
+- 429 / 5xx / timeout: giảm rate nhân (x RATE_LIMIT_DECREASE)
+- Latency vượt RATE_LIMIT_LATENCY_FACTOR x baseline: giảm nhẹ (x0.9)
+- Retry-After: chặn nguồn tới hết thời gian server yêu cầu
+- Rate đã học lưu tại data/rate_limits.json, lần chạy sau bắt đầu từ đó
+"""
+
+import json
+import os
+import threading
+import time
+from datetime import datetime
+from email.utils import parsedate_to_datetime
+
+from src.config import (
+    RATE_LIMIT_FILE, RATE_LIMIT_INITIAL, RATE_LIMIT_MIN, RATE_LIMIT_MAX,
+    RATE_LIMIT_INCREASE, RATE_LIMIT_DECREASE, RATE_LIMIT_LATENCY_FACTOR
+)
+
+# Status được coi là "server quá tải / đang chặn"
+BACKOFF_STATUS = (429, 500, 502, 503, 504)
+
+
+class _SourceState:
+    def __init__(self, rate: float = RATE_LIMIT_INITIAL, baseline: float = None):
+        self.rate = rate
+        self.baseline = baseline      # EWMA latency khi khỏe (giây)
+        self.next_slot = 0.0          # time.monotonic() sớm nhất cho request kế tiếp
+        self.blocked_until = 0.0
+        self.throttled = 0            # Số lần 429/5xx trong lần chạy này
+        self.requests = 0
+
+
+class AIMDLimiter:
+    """Rate limiter AIMD theo nguồn, an toàn đa luồng"""
+
+    def __init__(self, state_file: str = RATE_LIMIT_FILE, enabled: bool = True):
+        self.state_file = state_file
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._sources = {}
+        self.load()
+
+    # ------------------------------------------------------------------
+    def load(self):
+        if not self.state_file or not os.path.exists(self.state_file):
+            return
+        try:
+            with open(self.state_file, 'r', encoding='utf-8') as f:
+                saved = json.load(f)
+        except (json.JSONDecodeError, OSError):
+            return
+        for source, st in saved.items():
+            rate = min(max(float(st.get('rate', RATE_LIMIT_INITIAL)), RATE_LIMIT_MIN), RATE_LIMIT_MAX)
+            self._sources[source] = _SourceState(rate, st.get('baseline_latency'))
+
+    def save(self):
+        if not self.state_file:
+            return
+        with self._lock:
+            data = {s: {'rate': round(st.rate, 3),
+                        'baseline_latency': round(st.baseline, 4) if st.baseline else None,
+                        'updated_at': datetime.now().isoformat(timespec='seconds')}
+                    for s, st in self._sources.items() if st.requests}
+        if not data:
+            return
+        # Giữ state các nguồn không dùng trong lần chạy này
+        if os.path.exists(self.state_file):
+            try:
+                with open(self.state_file, 'r', encoding='utf-8') as f:
+                    data = {**json.load(f), **data}
+            except (json.JSONDecodeError, OSError):
+                pass
+        os.makedirs(os.path.dirname(self.state_file) or '.', exist_ok=True)
+        with open(self.state_file, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=1)
+
+    def _state(self, source: str) -> _SourceState:
+        st = self._sources.get(source)
+        if st is None:
+            st = self._sources[source] = _SourceState()
+        return st
+
+    # ------------------------------------------------------------------
+    def acquire(self, source: str):
+        """Chờ tới lượt gửi request cho nguồn (giữ chỗ trước, ngủ ngoài lock)"""
+        with self._lock:
+            st = self._state(source)
+            st.requests += 1
+            if not self.enabled:
+                return
+            now = time.monotonic()
+            slot = max(now, st.next_slot, st.blocked_until)
+            st.next_slot = slot + 1.0 / st.rate
+        wait = slot - now
+        if wait > 0:
+            time.sleep(wait)
+
+    def feedback(self, source: str, status: int = 200, latency: float = None,
+                 retry_after: float = None):
+        """Cập nhật rate theo kết quả request.
+
+        status: HTTP status (0 = lỗi mạng / timeout)."""
+        with self._lock:
+            st = self._state(source)
+            now = time.monotonic()
+            if retry_after:
+                st.blocked_until = max(st.blocked_until, now + retry_after)
+
+            if status == 0 or status in BACKOFF_STATUS:
+                st.throttled += 1
+                st.rate = max(RATE_LIMIT_MIN, st.rate * RATE_LIMIT_DECREASE)
+                return
+
+            if latency is None:
+                return
+            if st.baseline and latency > RATE_LIMIT_LATENCY_FACTOR * st.baseline:
+                st.rate = max(RATE_LIMIT_MIN, st.rate * 0.9)
+            else:
+                st.rate = min(RATE_LIMIT_MAX, st.rate + RATE_LIMIT_INCREASE)
+            st.baseline = latency if st.baseline is None else 0.9 * st.baseline + 0.1 * latency
+
+    def is_blocked(self, source: str) -> bool:
+        """Nguồn đang bị Retry-After chặn"""
+        with self._lock:
+            st = self._sources.get(source)
+            return bool(st) and self.enabled and st.blocked_until > time.monotonic()
+
+    def rate(self, source: str) -> float:
+        with self._lock:
+            return self._state(source).rate
+
+    def summary(self) -> str:
+        with self._lock:
+            parts = [f"{s} {st.rate:.1f} req/s" + (f" ({st.throttled}x 429/5xx)" if st.throttled else "")
+                     for s, st in self._sources.items() if st.requests]
+        return " | ".join(parts)
+
+
+def parse_retry_after(value) -> float:
+    """Retry-After: số giây hoặc ngày HTTP → số giây cần chờ (None nếu không có)"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except (TypeError, ValueError):
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, when.timestamp() - time.time())
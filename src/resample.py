@@ -0,0 +1,85 @@
+"""
+VN Stock Sniper - Resampler
+Gộp nến intraday (1m / 15m / 1h) lên khung lớn hơn bằng NumPy reduceat, không
+groupby theo từng mã. Mốc thời gian theo giờ Việt Nam (UTC+7):
+
+    - Intraday: t = đầu khung (epoch UTC), vd 15m → 09:00, 09:15, ... giờ VN
+    - 1D: t = 00:00 UTC của ngày giao dịch (cùng quy ước với nến ngày DNSE/VCI)
+
+    cols15 = resample(cols1m, '15m')
+    daily, codes = resample(buf_cols, '1D', codes=buf.code)   # nhiều mã 1 lượt
+    today = partial_daily(buf)      # BarBuffer intraday → nến ngày tạm tính (DataFrame)
+"""
+
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+from src.bars import COLUMNS, FRAME_COLUMNS
+
+RESOLUTIONS = {'1m': 60, '15m': 900, '1h': 3600, '1D': 86400}
+VN_OFFSET = 7 * 3600
+# Số nến 1 phiên HOSE/HNX (9:00-11:30, 13:00-14:45 = 255 phút)
+BARS_PER_SESSION = {'1m': 255, '15m': 18, '1h': 6, '1D': 1}
+
+
+def resample(cols: dict, rule: str, codes: np.ndarray = None):
+    """Gộp nến đã sắp xếp theo (mã, thời gian) lên khung `rule`.
+
+    Trả về cols mới; nếu truyền `codes` (mã của từng nến) thì trả (cols, codes)."""
+    period = RESOLUTIONS[rule]
+    t = cols['t']
+    n = len(t)
+    if n == 0:
+        out = {k: cols[k][:0] for k in COLUMNS}
+        return (out, codes[:0]) if codes is not None else out
+
+    bucket = (t + VN_OFFSET) // period
+    change = np.empty(n, dtype=bool)
+    change[0] = True
+    change[1:] = bucket[1:] != bucket[:-1]
+    if codes is not None:
+        change[1:] |= codes[1:] != codes[:-1]
+    starts = np.flatnonzero(change)
+    ends = np.r_[starts[1:], n] - 1
+
+    out = {
+        't': bucket[starts] * period - (0 if rule == '1D' else VN_OFFSET),
+        'o': cols['o'][starts],
+        'h': np.fmax.reduceat(cols['h'], starts),
+        'l': np.fmin.reduceat(cols['l'], starts),
+        'c': cols['c'][ends],
+        'v': np.add.reduceat(cols['v'], starts),
+    }
+    return (out, codes[starts]) if codes is not None else out
+
+
+def session_day(t: np.ndarray) -> np.ndarray:
+    """epoch UTC → ngày giao dịch (số ngày từ 1970-01-01, theo giờ VN)"""
+    return (t + VN_OFFSET) // 86400
+
+
+def partial_daily(buf, session: date = None) -> pd.DataFrame:
+    """BarBuffer intraday nhiều mã → nến ngày (đang hình thành) của phiên `session`
+    (mặc định: phiên mới nhất trong buffer), cùng định dạng raw_data"""
+    n = len(buf)
+    if not n:
+        return pd.DataFrame(columns=FRAME_COLUMNS)
+    order = np.lexsort((buf.t[:n], buf.code[:n]))
+    cols = {k: getattr(buf, k)[:n][order] for k in COLUMNS}
+    daily, codes = resample(cols, '1D', codes=buf.code[:n][order])
+
+    days = daily['t'] // 86400
+    day = days.max() if session is None else (session - date(1970, 1, 1)).days
+    keep = days == day
+    df = pd.DataFrame({
+        'time': pd.to_datetime(daily['t'][keep], unit='s'),
+        'open': daily['o'][keep],
+        'high': daily['h'][keep],
+        'low': daily['l'][keep],
+        'close': daily['c'][keep],
+        'volume': daily['v'][keep],
+        'symbol': np.array(buf.symbols, dtype=object)[codes[keep]],
+    })
+    return df[FRAME_COLUMNS]
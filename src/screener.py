@@ -0,0 +1,557 @@
+"""
+VN Stock Sniper - Screener Expressions
+Ngôn ngữ lọc cổ phiếu nhỏ, biên dịch thành mask boolean NumPy trên toàn bộ
+analyzed_data.csv (1 chiều: mã) hoặc lịch sử snapshot (2 chiều: ngày x mã).
+
+    rsi < 35 and vol_ratio > 2 and channel == "XANH"
+    (breakout_20 or macd_cross_up) and not rsi_overbought
+    close > ma20 and prev(close) <= prev(ma20)          # vừa cắt lên MA20 (chỉ --history)
+    buy_signal in ("PULLBACK", "BREAKOUT") and stars >= 4
+
+- Toán tử: and / or / not, < <= > >= == !=, in (...), + - * /, ngoặc
+- Hàm: abs(x), min(a, b), max(a, b), prev(x[, n]) (giá trị n phiên trước, chỉ với lịch sử)
+- Cột bool / số / chuỗi đứng 1 mình = điều kiện "đúng / khác 0 / không rỗng" (vd `buy_signal`)
+- Chuỗi so sánh theo nhãn, bỏ emoji đầu: '🟢 XANH' == "XANH"
+- NaN không thỏa điều kiện nào (kể cả !=)
+
+Biểu thức được biên dịch 1 lần; mask được cache theo hash của cây cú pháp (viết
+khác khoảng trắng vẫn dùng chung kết quả).
+
+    screen = Screener(FrameSource(df))
+    screen.select('rsi < 35 and vol_ratio > 2')            # DataFrame các mã thỏa
+    hist = Screener(HistorySource(HistoryStore(), days=365))
+    hist.select('macd_cross_up and vol_surge')             # (date, symbol) thỏa trong 1 năm
+
+    python -m src.screener 'rsi < 35 and vol_ratio > 2' --fields symbol,close,rsi
+    python -m src.screener 'macd_cross_up and vol_surge' --history 365
+"""
+
+import argparse
+import hashlib
+import re
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from src.config import ANALYZED_DATA_FILE, SCREEN_CACHE_SIZE
+from src.history_store import HistoryStore, _LRU
+
+TOKEN_RE = re.compile(r'''\s*(?:
+    (?P<num>\d+\.?\d*(?:[eE][-+]?\d+)?|\.\d+)
+  | (?P<str>"[^"]*"|'[^']*')
+  | (?P<name>[A-Za-z_]\w*)
+  | (?P<op><=|>=|==|!=|<|>|[-+*/(),])
+)''', re.VERBOSE)
+
+KEYWORDS = {'and', 'or', 'not', 'in', 'true', 'false'}
+COMPARE = ('<', '<=', '>', '>=', '==', '!=')
+FUNCTIONS = {'abs': (1, 1), 'min': (2, 2), 'max': (2, 2), 'prev': (1, 2)}
+
+
+class ScreenError(ValueError):
+    """Biểu thức sai cú pháp / tham chiếu cột không có / sai kiểu"""
+
+
+def _label(value) -> str:
+    """Nhãn so sánh của chuỗi: bỏ emoji / ký hiệu đầu ('🟢 XANH' → 'XANH')"""
+    text = str(value).strip()
+    i = 0
+    while i < len(text) and not text[i].isalnum():
+        i += 1
+    return text[i:] or text
+
+
+# ----------------------------------------------------------------------
+# Parser: biểu thức → cây tuple
+# ----------------------------------------------------------------------
+def _tokenize(text: str) -> list:
+    tokens, pos = [], 0
+    text = text.rstrip()
+    while pos < len(text):
+        m = TOKEN_RE.match(text, pos)
+        if not m or m.end() == pos:
+            raise ScreenError(f"ký tự không hợp lệ tại vị trí {pos}: {text[pos:pos + 10]!r}")
+        kind = m.lastgroup
+        value = m.group(kind)
+        if kind == 'name' and value.lower() in KEYWORDS:
+            kind, value = 'kw', value.lower()
+        tokens.append((kind, value))
+        pos = m.end()
+    tokens.append(('end', ''))
+    return tokens
+
+
+class _Parser:
+    """Recursive descent: or → and → not → so sánh → cộng trừ → nhân chia → đơn"""
+
+    def __init__(self, text: str):
+        self.tokens = _tokenize(text)
+        self.i = 0
+
+    def peek(self, kind=None, value=None) -> bool:
+        k, v = self.tokens[self.i]
+        return (kind is None or k == kind) and (value is None or v == value)
+
+    def take(self, kind=None, value=None):
+        if not self.peek(kind, value):
+            k, v = self.tokens[self.i]
+            want = value or ('hết biểu thức' if kind == 'end' else kind)
+            raise ScreenError(f"cần {want}, gặp {v or 'hết biểu thức'!r}")
+        tok = self.tokens[self.i]
+        self.i += 1
+        return tok[1]
+
+    def parse(self):
+        if self.peek('end'):
+            raise ScreenError("biểu thức rỗng")
+        node = self.or_()
+        self.take('end')
+        return node
+
+    def or_(self):
+        node = self.and_()
+        while self.peek('kw', 'or'):
+            self.take()
+            node = ('or', node, self.and_())
+        return node
+
+    def and_(self):
+        node = self.not_()
+        while self.peek('kw', 'and'):
+            self.take()
+            node = ('and', node, self.not_())
+        return node
+
+    def not_(self):
+        if self.peek('kw', 'not'):
+            self.take()
+            return ('not', self.not_())
+        return self.compare()
+
+    def compare(self):
+        node = self.sum()
+        if self.peek('op') and self.tokens[self.i][1] in COMPARE:
+            op = self.take()
+            return ('cmp', op, node, self.sum())
+        if self.peek('kw', 'in'):
+            self.take()
+            self.take('op', '(')
+            items = [self.literal()]
+            while self.peek('op', ','):
+                self.take()
+                items.append(self.literal())
+            self.take('op', ')')
+            return ('in', node, tuple(items))
+        return node
+
+    def literal(self):
+        neg = self.peek('op', '-') and self.take()
+        if self.peek('num'):
+            value = float(self.take())
+            return -value if neg else value
+        if not neg and self.peek('str'):
+            return self.take()[1:-1]
+        raise ScreenError("in (...) chỉ nhận số hoặc chuỗi")
+
+    def sum(self):
+        node = self.term()
+        while self.peek('op', '+') or self.peek('op', '-'):
+            op = self.take()
+            node = ('arith', op, node, self.term())
+        return node
+
+    def term(self):
+        node = self.unary()
+        while self.peek('op', '*') or self.peek('op', '/'):
+            op = self.take()
+            node = ('arith', op, node, self.unary())
+        return node
+
+    def unary(self):
+        if self.peek('op', '-'):
+            self.take()
+            return ('neg', self.unary())
+        return self.atom()
+
+    def atom(self):
+        kind, value = self.tokens[self.i]
+        if kind == 'num':
+            self.take()
+            return ('num', float(value))
+        if kind == 'str':
+            self.take()
+            return ('str', value[1:-1])
+        if kind == 'kw' and value in ('true', 'false'):
+            self.take()
+            return ('bool', value == 'true')
+        if kind == 'op' and value == '(':
+            self.take()
+            node = self.or_()
+            self.take('op', ')')
+            return node
+        if kind == 'name':
+            self.take()
+            if self.peek('op', '('):
+                return self.call(value)
+            return ('col', value)
+        raise ScreenError(f"không mong đợi {value or 'hết biểu thức'!r}")
+
+    def call(self, name: str):
+        if name not in FUNCTIONS:
+            raise ScreenError(f"không có hàm {name}() (có: {', '.join(FUNCTIONS)})")
+        self.take('op', '(')
+        args = [self.sum()]
+        while self.peek('op', ','):
+            self.take()
+            args.append(self.sum())
+        self.take('op', ')')
+        lo, hi = FUNCTIONS[name]
+        if not lo <= len(args) <= hi:
+            raise ScreenError(f"{name}() nhận {lo if lo == hi else f'{lo}-{hi}'} tham số")
+        if name == 'prev' and len(args) == 2 and args[1][0] != 'num':
+            raise ScreenError("prev(x, n): n phải là số")
+        return ('call', name, tuple(args))
+
+
+# ----------------------------------------------------------------------
+# Biên dịch cây → closure chạy trên NumPy
+# ----------------------------------------------------------------------
+class _Labels:
+    """Cột chuỗi đã factorize: codes (-1 = trống) + bảng nhãn"""
+
+    def __init__(self, codes: np.ndarray, labels: list):
+        self.codes = codes
+        self.labels = labels
+        self.lookup = {}
+        for i, lab in enumerate(labels):
+            self.lookup.setdefault(lab, []).append(i)
+
+    def isin(self, values) -> np.ndarray:
+        idx = [i for v in values for i in self.lookup.get(_label(v), [])]
+        if not idx:
+            return np.zeros(self.codes.shape, dtype=bool)
+        if len(idx) == 1:
+            return self.codes == idx[0]
+        return np.isin(self.codes, idx)
+
+    def truthy(self) -> np.ndarray:
+        nonempty = np.array([bool(lab) for lab in self.labels] + [False])
+        return nonempty[self.codes]      # codes -1 → phần tử cuối (False)
+
+
+def _as_bool(value, shape) -> np.ndarray:
+    if isinstance(value, _Labels):
+        return value.truthy()
+    if isinstance(value, np.ndarray):
+        if value.dtype == bool:
+            return value
+        return (value != 0) & ~np.isnan(value)
+    if isinstance(value, str):
+        raise ScreenError(f"chuỗi {value!r} không phải điều kiện")
+    return np.full(shape, bool(value))
+
+
+def _as_num(value):
+    if isinstance(value, _Labels) or isinstance(value, str):
+        raise ScreenError("phép toán số trên cột chuỗi")
+    if isinstance(value, np.ndarray) and value.dtype == bool:
+        return value.astype(np.float64)
+    return value
+
+
+def _shift(value, n: int):
+    """Giá trị n phiên trước theo trục ngày (trục 0 của mảng [ngày, mã])"""
+    if isinstance(value, _Labels):
+        return _Labels(_shift(value.codes, n), value.labels)
+    if not isinstance(value, np.ndarray):
+        return value
+    fill = False if value.dtype == bool else (-1 if value.dtype.kind == 'i' else np.nan)
+    out = np.full(value.shape, fill, dtype=value.dtype)
+    if n < len(value):
+        out[n:] = value[:len(value) - n]
+    return out
+
+
+_NUM_OPS = {'<': np.less, '<=': np.less_equal, '>': np.greater, '>=': np.greater_equal,
+            '==': np.equal, '!=': np.not_equal}
+_ARITH_OPS = {'+': np.add, '-': np.subtract, '*': np.multiply, '/': np.divide}
+
+
+def _compile(node):
+    kind = node[0]
+    if kind in ('num', 'str', 'bool'):
+        value = node[1]
+        return lambda src: value
+    if kind == 'col':
+        name = node[1]
+        return lambda src: src.column(name)
+    if kind == 'not':
+        inner = _compile(node[1])
+        return lambda src: ~_as_bool(inner(src), src.shape)
+    if kind in ('and', 'or'):
+        left, right = _compile(node[1]), _compile(node[2])
+        op = np.logical_and if kind == 'and' else np.logical_or
+        return lambda src: op(_as_bool(left(src), src.shape), _as_bool(right(src), src.shape))
+    if kind == 'neg':
+        inner = _compile(node[1])
+        return lambda src: -_as_num(inner(src))
+    if kind == 'arith':
+        ufunc, left, right = _ARITH_OPS[node[1]], _compile(node[2]), _compile(node[3])
+
+        def arith(src):
+            with np.errstate(divide='ignore', invalid='ignore'):
+                return ufunc(_as_num(left(src)), _as_num(right(src)))
+        return arith
+    if kind == 'cmp':
+        return _compile_cmp(node[1], _compile(node[2]), _compile(node[3]))
+    if kind == 'in':
+        inner, items = _compile(node[1]), node[2]
+
+        def isin(src):
+            value = inner(src)
+            if isinstance(value, _Labels):
+                return value.isin([v for v in items if isinstance(v, str)])
+            nums = [v for v in items if not isinstance(v, str)]
+            return np.isin(_as_num(value), nums) if nums else np.zeros(src.shape, dtype=bool)
+        return isin
+    if kind == 'call':
+        return _compile_call(node[1], [_compile(a) for a in node[2]], node[2])
+    raise ScreenError(f"nút không hỗ trợ: {kind}")
+
+
+def _compile_cmp(op: str, left, right):
+    ufunc = _NUM_OPS[op]
+
+    def compare(src):
+        a, b = left(src), right(src)
+        if isinstance(b, _Labels) and not isinstance(a, _Labels):
+            a, b = b, a
+        if isinstance(a, _Labels):
+            if not isinstance(b, str) or op not in ('==', '!='):
+                raise ScreenError("cột chuỗi chỉ so sánh == / != với chuỗi")
+            hit = a.isin([b])
+            return hit if op == '==' else ~hit & (a.codes >= 0)
+        a, b = _as_num(a), _as_num(b)
+        with np.errstate(invalid='ignore'):
+            result = ufunc(a, b)
+        if op == '!=':
+            # NaN != x không tính là thỏa
+            for side in (a, b):
+                if isinstance(side, np.ndarray) and side.dtype.kind == 'f':
+                    result = result & ~np.isnan(side)
+        return np.broadcast_to(result, src.shape) if np.ndim(result) == 0 else result
+    return compare
+
+
+def _compile_call(name: str, args: list, nodes: tuple):
+    if name == 'abs':
+        return lambda src: np.abs(_as_num(args[0](src)))
+    if name in ('min', 'max'):
+        ufunc = np.fmin if name == 'min' else np.fmax
+        return lambda src: ufunc(_as_num(args[0](src)), _as_num(args[1](src)))
+    n = int(nodes[1][1]) if len(nodes) == 2 else 1
+    if n < 1:
+        raise ScreenError("prev(x, n): n >= 1")
+
+    def prev(src):
+        if len(src.shape) < 2:
+            raise ScreenError("prev() chỉ dùng trên lịch sử (--history)")
+        return _shift(args[0](src), n)
+    return prev
+
+
+class Expr:
+    """Biểu thức đã biên dịch: key = hash cây cú pháp, columns = các cột tham chiếu"""
+
+    def __init__(self, text: str):
+        self.text = text
+        self.tree = _Parser(text).parse()
+        self.key = hashlib.sha1(repr(self.tree).encode('utf-8')).hexdigest()[:16]
+        self.columns = sorted(self._columns(self.tree))
+        self._fn = _compile(self.tree)
+
+    def _columns(self, node) -> set:
+        if node[0] == 'col':
+            return {node[1]}
+        out = set()
+        for part in node[1:]:
+            if isinstance(part, tuple) and part and isinstance(part[0], str):
+                out |= self._columns(part)
+            elif isinstance(part, tuple):
+                for sub in part:
+                    if isinstance(sub, tuple):
+                        out |= self._columns(sub)
+        return out
+
+    def evaluate(self, source) -> np.ndarray:
+        return _as_bool(self._fn(source), source.shape)
+
+
+# ----------------------------------------------------------------------
+# Nguồn dữ liệu
+# ----------------------------------------------------------------------
+def _convert(values: pd.Series):
+    """Series → mảng bool / float64 / _Labels"""
+    dtype = values.dtype
+    if pd.api.types.is_bool_dtype(dtype):
+        return values.to_numpy(dtype=bool)
+    if pd.api.types.is_numeric_dtype(dtype):
+        return values.to_numpy(dtype=np.float64)
+    present = values.dropna()
+    if present.empty:
+        return np.full(len(values), np.nan)
+    if present.map(type).isin([bool, np.bool_]).all():
+        return values.fillna(False).astype(bool).to_numpy()
+    numeric = pd.to_numeric(present, errors='coerce')
+    if numeric.notna().all():
+        return pd.to_numeric(values, errors='coerce').to_numpy(dtype=np.float64)
+    codes, uniques = pd.factorize(values)
+    return _Labels(codes.astype(np.int32), [_label(u) for u in uniques])
+
+
+class FrameSource:
+    """DataFrame 1 dòng / mã (analyzed_data.csv) → mask [mã]"""
+
+    def __init__(self, frame: pd.DataFrame):
+        self.frame = frame.reset_index(drop=True)
+        self.shape = (len(self.frame),)
+        self._columns = {}
+
+    def column(self, name: str):
+        hit = self._columns.get(name)
+        if hit is None:
+            if name not in self.frame.columns:
+                raise ScreenError(f"không có cột '{name}'")
+            hit = self._columns[name] = _convert(self.frame[name])
+        return hit
+
+    def prefetch(self, columns: list):
+        pass
+
+    def rows(self, mask: np.ndarray) -> pd.DataFrame:
+        return self.frame[mask]
+
+
+class HistorySource:
+    """Lịch sử snapshot (data/history) → mask [ngày, mã], dùng được prev()"""
+
+    def __init__(self, store: HistoryStore = None, days: int = 365, start=None, end=None):
+        self.store = store or HistoryStore()
+        self.range = dict(start=start, end=end, days=days)
+        axis = self.store.panel('close', **self.range)
+        self.dates = list(axis.index)
+        self.symbols = list(axis.columns)
+        self.shape = (len(self.dates), len(self.symbols))
+        self._columns = {}
+
+    def column(self, name: str):
+        hit = self._columns.get(name)
+        if hit is None:
+            if name == 'symbol':
+                raise ScreenError("lọc theo mã: dùng --symbols / symbols=")
+            panel = self.store.panel(name, **self.range)
+            if panel.empty or panel.isna().all().all():
+                raise ScreenError(f"không có cột '{name}' trong lịch sử")
+            panel = panel.reindex(index=self.dates, columns=self.symbols)
+            flat = _convert(pd.Series(panel.to_numpy().ravel()))
+            if isinstance(flat, _Labels):
+                flat.codes = flat.codes.reshape(self.shape)
+                hit = flat
+            else:
+                hit = flat.reshape(self.shape)
+            self._columns[name] = hit
+        return hit
+
+    def prefetch(self, columns: list):
+        """Đọc mọi cột biểu thức cần trong 1 lượt mở mỗi snapshot (thay vì 1 lượt / cột)"""
+        missing = [c for c in columns if c not in self._columns and c != 'symbol']
+        if missing:
+            for d in self.dates:
+                self.store._load_columns(d, missing)
+
+    def rows(self, mask: np.ndarray) -> pd.DataFrame:
+        d_idx, s_idx = np.nonzero(mask)
+        return pd.DataFrame({'date': np.array(self.dates, dtype=object)[d_idx],
+                             'symbol': np.array(self.symbols, dtype=object)[s_idx]})
+
+
+class Screener:
+    """Biên dịch + cache (theo hash biểu thức) trên 1 nguồn dữ liệu cố định"""
+
+    def __init__(self, source, cache_size: int = SCREEN_CACHE_SIZE):
+        self.source = source
+        self._compiled = _LRU(cache_size)
+        self._masks = _LRU(cache_size)
+
+    def compile(self, text: str) -> Expr:
+        expr = self._compiled.get(text)
+        if expr is None:
+            expr = Expr(text)
+            self._compiled.put(text, expr)
+        return expr
+
+    def mask(self, text: str) -> np.ndarray:
+        expr = self.compile(text)
+        mask = self._masks.get(expr.key)
+        if mask is None:
+            self.source.prefetch(expr.columns)
+            mask = expr.evaluate(self.source)
+            mask.flags.writeable = False
+            self._masks.put(expr.key, mask)
+        return mask
+
+    def select(self, text: str) -> pd.DataFrame:
+        return self.source.rows(self.mask(text))
+
+
+def main():
+    ap = argparse.ArgumentParser(description='Lọc cổ phiếu bằng biểu thức')
+    ap.add_argument('expr', help='vd: rsi < 35 and vol_ratio > 2 and channel == "XANH"')
+    ap.add_argument('--history', type=int, metavar='DAYS',
+                    help='chạy trên lịch sử snapshot N ngày lịch gần nhất thay vì analyzed_data.csv')
+    ap.add_argument('--file', default=ANALYZED_DATA_FILE)
+    ap.add_argument('--fields', default='symbol,close,total_score,stars,rsi,vol_ratio,channel')
+    ap.add_argument('--sort', default='total_score')
+    ap.add_argument('--limit', type=int, default=50)
+    args = ap.parse_args()
+
+    t0 = time.perf_counter()
+    if args.history:
+        source = HistorySource(days=args.history)
+    else:
+        source = FrameSource(pd.read_csv(args.file))
+    screen = Screener(source)
+    try:
+        expr = screen.compile(args.expr)
+        source.prefetch(expr.columns)
+        for name in expr.columns:
+            source.column(name)
+        t_load = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        mask = screen.mask(args.expr)
+    except ScreenError as e:
+        print(f"❌ {e}")
+        sys.exit(2)
+    t_eval = time.perf_counter() - t0
+    print(f"🔍 {args.expr}")
+    print(f"   {int(mask.sum())} / {mask.size} khớp  (nạp {t_load * 1000:.0f}ms, lọc {t_eval * 1000:.2f}ms)")
+
+    rows = screen.select(args.expr)
+    if args.history:
+        if rows.empty:
+            return
+        by_date = rows.groupby('date')['symbol'].apply(list)
+        for d, symbols in by_date.tail(args.limit).items():
+            print(f"   {d}  {len(symbols):>3}  {', '.join(symbols[:12])}{' ...' if len(symbols) > 12 else ''}")
+        return
+    if args.sort in rows.columns:
+        rows = rows.sort_values(args.sort, ascending=False, kind='stable')
+    fields = [f for f in args.fields.split(',') if f in rows.columns]
+    if not rows.empty:
+        print(rows[fields].head(args.limit).to_string(index=False))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,133 @@
+"""
+VN Stock Sniper - Sharding
+Chia universe cho nhiều runner (job matrix / nhiều máy), rồi gộp kết quả.
+
+    python main.py --shard 1/4     # runner 1: fetch + phân tích 1/4 số mã
+    ...
+    python main.py --shard 4/4
+    python main.py --merge         # gộp data/shards/* → analyzed/signals → AI → dashboard
+
+Mã được chia theo crc32(symbol) % N: ổn định khi universe thay đổi, không cần
+các shard thống nhất thứ tự danh sách.
+
+Mỗi shard ghi vào data/shards/{i}-of-{N}/:
+    raw_data.csv        OHLCV đã lấy
+    analyzed_data.csv   kết quả analyze_all (chưa có vòng đời tín hiệu)
+    meta.json           shard, số mã, thời gian
+    universe.json       (ngày xếp hạng lại) universe của riêng shard, gộp khi merge
+"""
+
+import json
+import os
+import re
+import zlib
+from datetime import datetime
+
+import pandas as pd
+
+from src.config import SHARD_DIR
+from src.universe import merge_universes
+
+SHARD_RE = re.compile(r'^(\d+)/(\d+)$')
+
+
+def parse_shard(spec: str) -> tuple:
+    """'2/4' → (2, 4). Chỉ số shard bắt đầu từ 1."""
+    m = SHARD_RE.match(spec.strip())
+    if not m:
+        raise ValueError(f"Shard không hợp lệ: '{spec}' (dạng i/N, vd 1/4)")
+    i, n = int(m.group(1)), int(m.group(2))
+    if not 1 <= i <= n:
+        raise ValueError(f"Shard không hợp lệ: {i}/{n} (cần 1 <= i <= N)")
+    return i, n
+
+
+def shard_of(symbol: str, n: int) -> int:
+    return zlib.crc32(symbol.encode('utf-8')) % n + 1
+
+
+def shard_symbols(symbols: list, shard: tuple) -> list:
+    """Giữ các mã thuộc shard (i, N), giữ nguyên thứ tự"""
+    i, n = shard
+    return [s for s in symbols if shard_of(s, n) == i]
+
+
+def shard_dir(shard: tuple) -> str:
+    return os.path.join(SHARD_DIR, f"{shard[0]}-of-{shard[1]}")
+
+
+def write_shard(shard: tuple, raw_df: pd.DataFrame, analyzed_df: pd.DataFrame, meta: dict = None):
+    """Ghi artifact 1 shard"""
+    path = shard_dir(shard)
+    os.makedirs(path, exist_ok=True)
+    raw_df.to_csv(os.path.join(path, 'raw_data.csv'), index=False)
+    analyzed_df.to_csv(os.path.join(path, 'analyzed_data.csv'), index=False)
+    info = {
+        'shard': shard[0],
+        'shards': shard[1],
+        'symbols': int(raw_df['symbol'].nunique()) if 'symbol' in raw_df.columns else 0,
+        'analyzed': len(analyzed_df),
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        **(meta or {}),
+    }
+    with open(os.path.join(path, 'meta.json'), 'w', encoding='utf-8') as f:
+        json.dump(info, f, ensure_ascii=False, indent=1)
+    print(f"✅ Shard {shard[0]}/{shard[1]}: {info['symbols']} mã, {info['analyzed']} kết quả → {path}")
+
+
+def list_shards() -> dict:
+    """{N: [(i, path), ...]} các shard có sẵn"""
+    found = {}
+    if not os.path.isdir(SHARD_DIR):
+        return found
+    for name in os.listdir(SHARD_DIR):
+        m = re.match(r'^(\d+)-of-(\d+)$', name)
+        if m and os.path.exists(os.path.join(SHARD_DIR, name, 'analyzed_data.csv')):
+            found.setdefault(int(m.group(2)), []).append((int(m.group(1)), os.path.join(SHARD_DIR, name)))
+    return {n: sorted(v) for n, v in found.items()}
+
+
+def merge_shards(n: int = None):
+    """Gộp các shard → (raw_df, analyzed_df), analyzed sắp xếp toàn cục theo total_score.
+
+    n: số shard (mặc định: bộ shard đủ N phần có N lớn nhất trong SHARD_DIR)."""
+    shards = list_shards()
+    if not shards:
+        print(f"❌ Không có shard nào trong {SHARD_DIR}")
+        return pd.DataFrame(), pd.DataFrame()
+    if n is None:
+        complete = [k for k, v in shards.items() if len(v) == k]
+        n = max(complete) if complete else max(shards)
+    parts = shards.get(n, [])
+    missing = sorted(set(range(1, n + 1)) - {i for i, _ in parts})
+
+    print(f"🧩 Gộp {len(parts)}/{n} shard từ {SHARD_DIR}")
+    if missing:
+        print(f"   ⚠️ Thiếu shard: {', '.join(f'{i}/{n}' for i in missing)} - kết quả không đủ universe")
+
+    raws, analyzed = [], []
+    for i, path in parts:
+        for name, out in (('raw_data.csv', raws), ('analyzed_data.csv', analyzed)):
+            try:
+                df = pd.read_csv(os.path.join(path, name))
+            except (FileNotFoundError, pd.errors.EmptyDataError):
+                continue
+            if 'symbol' in df.columns and not df.empty:
+                out.append(df)
+
+    # Universe xếp hạng lại theo từng shard (nếu có) → universe toàn cục
+    universe_parts = [os.path.join(path, 'universe.json') for _, path in parts
+                      if os.path.exists(os.path.join(path, 'universe.json'))]
+    if universe_parts:
+        merge_universes(universe_parts)
+
+    raw_df = pd.concat(raws, ignore_index=True) if raws else pd.DataFrame()
+    if not analyzed:
+        return raw_df, pd.DataFrame()
+
+    analyzed_df = pd.concat(analyzed, ignore_index=True)
+    analyzed_df = analyzed_df.drop_duplicates('symbol', keep='first')
+    analyzed_df = analyzed_df.sort_values(['total_score', 'symbol'],
+                                          ascending=[False, True]).reset_index(drop=True)
+    print(f"   📊 {len(analyzed_df)} mã sau khi gộp")
+    return raw_df, analyzed_df
@@ -0,0 +1,138 @@
+"""
+VN Stock Sniper - Signal Tracker
+Theo dõi vòng đời tín hiệu mua: MỚI / TIẾP DIỄN / HẾT HẠN
+
+State lưu tại data/signal_state.json, cập nhật tăng dần từ kết quả 1 ngày
+(không quét lại lịch sử):
+    {symbol: {signal, start_date, age, entry_score, entry_price, last_date}}
+
+Chạy lại cùng ngày dữ liệu (workflow_dispatch) là idempotent: state trước
+ngày đó được giữ trong 'previous' và dùng làm gốc.
+"""
+
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from src.config import SIGNAL_STATE_FILE, EXPIRED_SIGNALS_FILE
+
+STATUS_NEW = "NEW"
+STATUS_CONTINUING = "CONTINUING"
+STATUS_EXPIRED = "EXPIRED"
+
+LIFECYCLE_COLUMNS = ['signal_status', 'signal_age', 'signal_start', 'entry_score']
+
+
+class SignalTracker:
+    """Cập nhật state tín hiệu theo từng ngày"""
+
+    def __init__(self, state_file: str = SIGNAL_STATE_FILE):
+        self.state_file = state_file
+        self.state = self.load_state()
+
+    def load_state(self) -> dict:
+        if os.path.exists(self.state_file):
+            try:
+                with open(self.state_file, 'r', encoding='utf-8') as f:
+                    return json.load(f)
+            except (json.JSONDecodeError, OSError):
+                print(f"⚠️ Không đọc được {self.state_file}, khởi tạo lại")
+        return {"as_of": None, "signals": {}, "previous": {}}
+
+    def save_state(self):
+        os.makedirs(os.path.dirname(self.state_file), exist_ok=True)
+        with open(self.state_file, 'w', encoding='utf-8') as f:
+            json.dump(self.state, f, ensure_ascii=False, indent=1)
+
+    @staticmethod
+    def _data_date(df: pd.DataFrame) -> str:
+        """Ngày của dữ liệu = phiên mới nhất trong cột time"""
+        if 'time' in df.columns:
+            latest = pd.to_datetime(df['time'], errors='coerce').max()
+            if pd.notna(latest):
+                return latest.strftime('%Y-%m-%d')
+        return pd.Timestamp.now().strftime('%Y-%m-%d')
+
+    def update(self, df: pd.DataFrame, as_of: str = None):
+        """Cập nhật state từ kết quả phân tích 1 ngày.
+
+        Trả về (df có thêm cột signal_status/signal_age/signal_start/entry_score,
+                DataFrame các tín hiệu hết hạn hôm nay)."""
+        df = df.copy()
+        if df.empty or 'buy_signal' not in df.columns:
+            for col in LIFECYCLE_COLUMNS:
+                df[col] = "" if col in ('signal_status', 'signal_start') else 0
+            return df, pd.DataFrame()
+
+        as_of = as_of or self._data_date(df)
+        if self.state.get('as_of') == as_of:
+            previous = self.state.get('previous', {})
+        else:
+            previous = self.state.get('signals', {})
+
+        sig = df['buy_signal'].fillna('').astype(str)
+        active = df[sig != ''][['symbol', 'buy_signal', 'total_score', 'close']]
+
+        prev_df = pd.DataFrame.from_dict(previous, orient='index')
+        if prev_df.empty:
+            prev_df = pd.DataFrame(columns=['signal', 'start_date', 'age', 'entry_score',
+                                            'entry_price', 'last_date'])
+        prev_df.index.name = 'symbol'
+        prev_df = prev_df.reset_index()
+
+        merged = active.merge(prev_df, on='symbol', how='left')
+        continuing = merged['signal'].eq(merged['buy_signal']).to_numpy()
+
+        merged['signal_status'] = np.where(continuing, STATUS_CONTINUING, STATUS_NEW)
+        merged['signal_age'] = np.where(continuing,
+                                        pd.to_numeric(merged['age'], errors='coerce').fillna(0) + 1, 1)
+        merged['signal_start'] = np.where(continuing, merged['start_date'], as_of)
+        merged['entry_score'] = np.where(continuing, merged['entry_score'], merged['total_score'])
+        merged['entry_price'] = np.where(continuing, merged['entry_price'], merged['close'])
+
+        signals = {}
+        for rec in merged.to_dict('records'):
+            signals[rec['symbol']] = {
+                'signal': rec['buy_signal'],
+                'start_date': rec['signal_start'],
+                'age': int(rec['signal_age']),
+                'entry_score': round(float(rec['entry_score']), 2),
+                'entry_price': round(float(rec['entry_price']), 2),
+                'last_date': as_of,
+            }
+
+        # Hết hạn: có trong state cũ nhưng hôm nay không còn (hoặc đổi loại tín hiệu)
+        expired = []
+        for sym, rec in previous.items():
+            cur = signals.get(sym)
+            if cur is None or cur['signal'] != rec['signal']:
+                expired.append({'symbol': sym, **rec, 'signal_status': STATUS_EXPIRED,
+                                'expired_date': as_of})
+        expired_df = pd.DataFrame(expired)
+
+        self.state = {"as_of": as_of, "signals": signals, "previous": previous}
+
+        lifecycle = merged.set_index('symbol')
+        df['signal_status'] = df['symbol'].map(lifecycle['signal_status']).fillna('')
+        df['signal_age'] = df['symbol'].map(lifecycle['signal_age']).fillna(0).astype(int)
+        df['signal_start'] = df['symbol'].map(lifecycle['signal_start']).fillna('')
+        df['entry_score'] = pd.to_numeric(df['symbol'].map(lifecycle['entry_score']),
+                                          errors='coerce').fillna(0)
+
+        n_new = int((merged['signal_status'] == STATUS_NEW).sum())
+        print(f"🔁 Vòng đời tín hiệu ({as_of}): {n_new} mới / "
+              f"{len(merged) - n_new} tiếp diễn / {len(expired)} hết hạn")
+        return df, expired_df
+
+    def run(self, df: pd.DataFrame):
+        """Cập nhật + lưu state và danh sách tín hiệu hết hạn"""
+        df, expired_df = self.update(df)
+        self.save_state()
+        if expired_df.empty:
+            if os.path.exists(EXPIRED_SIGNALS_FILE):
+                os.remove(EXPIRED_SIGNALS_FILE)
+        else:
+            expired_df.to_csv(EXPIRED_SIGNALS_FILE, index=False)
+        return df, expired_df
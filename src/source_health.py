@@ -0,0 +1,85 @@
+"""
+VN Stock Sniper - Source Health
+Lưu tình trạng các nguồn dữ liệu (DNSE / TCBS / VCI) giữa các lần chạy để
+không phải probe lại mỗi lần.
+
+State tại data/source_health.json:
+    {active, checked_at, sources: {DNSE: {ok, latency_ms, success_rate, error, checked_at}}}
+
+- Còn hạn (SOURCE_HEALTH_TTL_MINUTES) và nguồn active vẫn OK → bỏ qua probe
+- Cập nhật sau probe và sau mỗi lần fetch (từ latency / tỉ lệ thành công thực tế)
+"""
+
+import json
+import os
+import threading
+from datetime import datetime, timedelta
+
+from src.config import SOURCE_HEALTH_FILE, SOURCE_HEALTH_TTL_MINUTES
+
+
+class SourceHealth:
+    """Đọc / ghi tình trạng nguồn"""
+
+    def __init__(self, path: str = SOURCE_HEALTH_FILE, ttl_minutes: float = SOURCE_HEALTH_TTL_MINUTES):
+        self.path = path
+        self.ttl = timedelta(minutes=ttl_minutes)
+        self._lock = threading.Lock()
+        self.state = self.load()
+
+    def load(self) -> dict:
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    return json.load(f)
+            except (json.JSONDecodeError, OSError):
+                pass
+        return {'active': None, 'checked_at': None, 'sources': {}}
+
+    def save(self):
+        with self._lock:
+            data = json.loads(json.dumps(self.state))
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        with open(self.path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=1)
+
+    def fresh_active(self) -> str:
+        """Nguồn active nếu state còn hạn và nguồn đó đang OK, ngược lại ''"""
+        active = self.state.get('active')
+        checked = self.state.get('checked_at')
+        if not active or not checked:
+            return ''
+        try:
+            age = datetime.now() - datetime.fromisoformat(checked)
+        except ValueError:
+            return ''
+        if age > self.ttl or not self.state.get('sources', {}).get(active, {}).get('ok'):
+            return ''
+        return active
+
+    def record(self, source: str, ok: bool, latency: float = None, error: str = '',
+               success_rate: float = None):
+        now = datetime.now().isoformat(timespec='seconds')
+        with self._lock:
+            entry = self.state.setdefault('sources', {}).setdefault(source, {})
+            entry['ok'] = bool(ok)
+            entry['checked_at'] = now
+            entry['error'] = error[:200]
+            if latency is not None:
+                entry['latency_ms'] = round(latency * 1000)
+            if success_rate is not None:
+                entry['success_rate'] = round(success_rate, 3)
+
+    def set_active(self, source: str):
+        with self._lock:
+            self.state['active'] = source
+            self.state['checked_at'] = datetime.now().isoformat(timespec='seconds')
+
+    def best_source(self, order: list) -> str:
+        """Nguồn OK có tỉ lệ thành công cao rồi latency thấp nhất"""
+        sources = self.state.get('sources', {})
+        healthy = [s for s in order if sources.get(s, {}).get('ok')]
+        if not healthy:
+            return ''
+        return min(healthy, key=lambda s: (-sources[s].get('success_rate', 1.0),
+                                           sources[s].get('latency_ms', 1e9)))
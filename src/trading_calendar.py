@@ -0,0 +1,241 @@
+"""
+VN Stock Sniper - Trading Calendar
+Lịch giao dịch HOSE / HNX: cuối tuần + ngày nghỉ lễ (Tết Dương lịch, Tết Nguyên đán,
+Giỗ Tổ, 30/4 - 1/5, Quốc khánh). Chỉ dùng thư viện chuẩn để workflow kiểm tra
+được trước khi cài dependencies.
+
+    cal = TradingCalendar()
+    cal.is_trading_day(date(2026, 2, 17))     # False (Tết)
+    cal.sessions(date(2026, 1, 1), date(2026, 3, 1))
+    cal.should_run()                          # Có phiên mới so với raw_data.csv?
+
+    python -m src.trading_calendar            # In lịch 30 ngày tới
+    python -m src.trading_calendar --should-run   # exit 0 = chạy, 1 = bỏ qua (ghi GITHUB_OUTPUT)
+
+Năm chưa có trong HOLIDAYS chỉ tính các ngày lễ dương lịch cố định (nghỉ bù khi
+trùng cuối tuần); bổ sung ngày âm lịch qua data/market_holidays.json:
+    {"2028-01-26": "Tết Nguyên đán", ...}
+"""
+
+import argparse
+import csv
+import json
+import os
+import sys
+from datetime import date, datetime, time, timedelta
+from zoneinfo import ZoneInfo
+
+from src.config import (TIMEZONE, RAW_DATA_FILE, MARKET_HOLIDAYS_FILE, MARKET_OPEN_TIME,
+                        MARKET_CLOSE_TIME, INTRADAY_WATCHLIST)
+
+# Lịch nghỉ theo thông báo của HOSE / HNX
+HOLIDAYS = {
+    2024: {
+        '2024-01-01': 'Tết Dương lịch',
+        '2024-02-08': 'Tết Nguyên đán', '2024-02-09': 'Tết Nguyên đán',
+        '2024-02-12': 'Tết Nguyên đán', '2024-02-13': 'Tết Nguyên đán',
+        '2024-02-14': 'Tết Nguyên đán',
+        '2024-04-18': 'Giỗ Tổ Hùng Vương',
+        '2024-04-29': 'Nghỉ bù 30/4', '2024-04-30': 'Ngày Thống nhất',
+        '2024-05-01': 'Quốc tế Lao động',
+        '2024-09-02': 'Quốc khánh', '2024-09-03': 'Quốc khánh',
+    },
+    2025: {
+        '2025-01-01': 'Tết Dương lịch',
+        '2025-01-27': 'Tết Nguyên đán', '2025-01-28': 'Tết Nguyên đán',
+        '2025-01-29': 'Tết Nguyên đán', '2025-01-30': 'Tết Nguyên đán',
+        '2025-01-31': 'Tết Nguyên đán',
+        '2025-04-07': 'Giỗ Tổ Hùng Vương',
+        '2025-04-30': 'Ngày Thống nhất', '2025-05-01': 'Quốc tế Lao động',
+        '2025-09-01': 'Quốc khánh', '2025-09-02': 'Quốc khánh',
+    },
+    2026: {
+        '2026-01-01': 'Tết Dương lịch',
+        '2026-02-16': 'Tết Nguyên đán', '2026-02-17': 'Tết Nguyên đán',
+        '2026-02-18': 'Tết Nguyên đán', '2026-02-19': 'Tết Nguyên đán',
+        '2026-02-20': 'Tết Nguyên đán',
+        '2026-04-27': 'Nghỉ bù Giỗ Tổ Hùng Vương',
+        '2026-04-30': 'Ngày Thống nhất', '2026-05-01': 'Quốc tế Lao động',
+        '2026-09-01': 'Quốc khánh', '2026-09-02': 'Quốc khánh',
+    },
+}
+
+# Ngày lễ dương lịch cố định (dùng cho năm chưa có lịch chính thức)
+FIXED_HOLIDAYS = {(1, 1): 'Tết Dương lịch', (4, 30): 'Ngày Thống nhất',
+                  (5, 1): 'Quốc tế Lao động', (9, 2): 'Quốc khánh'}
+
+
+def _to_date(value) -> date:
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    if hasattr(value, 'date') and callable(value.date):   # pd.Timestamp
+        return value.date()
+    return date.fromisoformat(str(value)[:10])
+
+
+class TradingCalendar:
+    """Ngày giao dịch HOSE / HNX (T2-T6 trừ ngày nghỉ lễ)"""
+
+    def __init__(self, extra_file: str = MARKET_HOLIDAYS_FILE):
+        self.tz = ZoneInfo(TIMEZONE)
+        self.holidays = {}
+        for table in HOLIDAYS.values():
+            self.holidays.update({date.fromisoformat(d): name for d, name in table.items()})
+        self._fixed_years = set()
+        if extra_file and os.path.exists(extra_file):
+            try:
+                with open(extra_file, 'r', encoding='utf-8') as f:
+                    extra = json.load(f)
+                self.holidays.update({date.fromisoformat(d): name for d, name in extra.items()})
+            except (json.JSONDecodeError, OSError, ValueError) as e:
+                print(f"⚠️ Không đọc được {extra_file}: {e}")
+
+    def _ensure_year(self, year: int):
+        """Năm chưa có lịch chính thức: thêm lễ dương lịch cố định + nghỉ bù"""
+        if year in HOLIDAYS or year in self._fixed_years:
+            return
+        self._fixed_years.add(year)
+        for (month, day), name in FIXED_HOLIDAYS.items():
+            d = date(year, month, day)
+            self.holidays.setdefault(d, name)
+            if d.weekday() >= 5:
+                comp = d + timedelta(days=1)
+                while comp.weekday() >= 5 or comp in self.holidays:
+                    comp += timedelta(days=1)
+                self.holidays[comp] = f"Nghỉ bù {name}"
+
+    # ------------------------------------------------------------------
+    def holiday_name(self, value) -> str:
+        d = _to_date(value)
+        self._ensure_year(d.year)
+        return self.holidays.get(d, '')
+
+    def is_trading_day(self, value) -> bool:
+        d = _to_date(value)
+        return d.weekday() < 5 and not self.holiday_name(d)
+
+    def sessions(self, start, end) -> list:
+        """Các ngày giao dịch trong [start, end]"""
+        d, end = _to_date(start), _to_date(end)
+        out = []
+        while d <= end:
+            if self.is_trading_day(d):
+                out.append(d)
+            d += timedelta(days=1)
+        return out
+
+    def previous_session(self, value) -> date:
+        """Ngày giao dịch gần nhất trước `value`"""
+        d = _to_date(value) - timedelta(days=1)
+        while not self.is_trading_day(d):
+            d -= timedelta(days=1)
+        return d
+
+    def sessions_back(self, value, n: int) -> date:
+        """Ngày giao dịch thứ n tính lùi từ `value` (n=0: chính nó nếu là ngày giao dịch)"""
+        d = _to_date(value)
+        if not self.is_trading_day(d):
+            d = self.previous_session(d)
+        for _ in range(n):
+            d = self.previous_session(d)
+        return d
+
+    def count_sessions(self, days: int, end=None) -> int:
+        """Số phiên trong `days` ngày lịch gần nhất (đổi days → countBack)"""
+        end = _to_date(end or self.today())
+        return len(self.sessions(end - timedelta(days=days), end))
+
+    def calendar_days_for(self, n_sessions: int, end=None) -> int:
+        """Số ngày lịch cần lùi lại để phủ n phiên gần nhất (đổi countBack → days)"""
+        end = _to_date(end or self.today())
+        return (end - self.sessions_back(end, max(n_sessions - 1, 0))).days + 1
+
+    # ------------------------------------------------------------------
+    def now(self) -> datetime:
+        return datetime.now(self.tz)
+
+    def today(self) -> date:
+        return self.now().date()
+
+    def last_closed_session(self, now: datetime = None) -> date:
+        """Phiên gần nhất đã đóng cửa (hôm nay nếu đã qua giờ đóng cửa)"""
+        now = now or self.now()
+        close = time.fromisoformat(MARKET_CLOSE_TIME)
+        if self.is_trading_day(now.date()) and now.time() >= close:
+            return now.date()
+        return self.previous_session(now.date())
+
+    def in_session(self, now: datetime = None) -> bool:
+        """Đang trong giờ giao dịch của 1 phiên (nến ngày chưa chốt)"""
+        now = now or self.now()
+        return (self.is_trading_day(now.date())
+                and time.fromisoformat(MARKET_OPEN_TIME) <= now.time() < time.fromisoformat(MARKET_CLOSE_TIME))
+
+    def should_run(self, stored_last=None, now: datetime = None) -> tuple:
+        """(chạy?, lý do): chỉ chạy khi có phiên đã đóng cửa mới hơn dữ liệu đã lưu,
+        hoặc đang trong phiên khi có watchlist intraday"""
+        if INTRADAY_WATCHLIST and self.in_session(now):
+            return True, f"phiên {(now or self.now()).date()} đang giao dịch (intraday {len(INTRADAY_WATCHLIST)} mã)"
+        session = self.last_closed_session(now)
+        if stored_last is None:
+            stored_last = stored_last_session()
+        if stored_last is None:
+            return True, f"chưa có dữ liệu, phiên gần nhất {session}"
+        if session > stored_last:
+            return True, f"phiên mới {session} (đã lưu tới {stored_last})"
+        # Lý do: ngày nghỉ giữa phiên gần nhất và hôm nay (lễ / cuối tuần), hoặc đã xử lý rồi
+        today = (now or self.now()).date()
+        closed = [session + timedelta(days=k) for k in range(1, (today - session).days + 1)]
+        closed = [d for d in closed if not self.is_trading_day(d)]
+        names = [self.holiday_name(d) for d in closed if self.holiday_name(d)]
+        reason = names[-1] if names else ('cuối tuần' if closed else f'đã xử lý phiên {session}')
+        return False, f"không có phiên mới sau {stored_last} ({reason})"
+
+
+def stored_last_session(path: str = RAW_DATA_FILE) -> date:
+    """Ngày của nến mới nhất trong raw_data.csv (None nếu chưa có)"""
+    if not os.path.exists(path):
+        return None
+    last = ''
+    try:
+        with open(path, 'r', encoding='utf-8', newline='') as f:
+            reader = csv.reader(f)
+            header = next(reader)
+            col = header.index('time')
+            for row in reader:
+                if len(row) > col and row[col] > last:
+                    last = row[col]
+    except (OSError, ValueError, StopIteration):
+        return None
+    return date.fromisoformat(last[:10]) if last else None
+
+
+def main():
+    ap = argparse.ArgumentParser(description='Lịch giao dịch HOSE / HNX')
+    ap.add_argument('--should-run', action='store_true',
+                    help='exit 0 nếu có phiên mới cần xử lý, 1 nếu bỏ qua (ghi run=... vào GITHUB_OUTPUT)')
+    ap.add_argument('--days', type=int, default=30, help='số ngày lịch để in')
+    args = ap.parse_args()
+
+    cal = TradingCalendar()
+    if args.should_run:
+        run, reason = cal.should_run()
+        print(f"{'▶️ Chạy' if run else '🏖️ Bỏ qua'}: {reason}")
+        output = os.getenv('GITHUB_OUTPUT')
+        if output:
+            with open(output, 'a', encoding='utf-8') as f:
+                f.write(f"run={'true' if run else 'false'}\n")
+        sys.exit(0 if run else 1)
+
+    d = cal.today()
+    for _ in range(args.days):
+        name = cal.holiday_name(d)
+        mark = '✅' if cal.is_trading_day(d) else '⛔'
+        print(f"{mark} {d.isoformat()} {d.strftime('%a')} {name}")
+        d += timedelta(days=1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,218 @@
+"""
+VN Stock Sniper - Universe Builder
+Chọn top N mã theo giá trị giao dịch trung bình 20 phiên (close x volume),
+thay cho danh sách cố định VN100 + HNX30 + extras.
+
+- Ngày xếp hạng lại (mỗi UNIVERSE_REFRESH_DAYS ngày): lấy danh sách niêm yết
+  đầy đủ (VCI), lấy ~35 ngày bars cho các mã chưa có trong kho (raw_data.csv),
+  xếp hạng và lưu data/universe.json (kèm sàn của từng mã).
+- Các ngày khác: đọc universe.json, chỉ gửi request cho top N.
+- Không lấy được danh sách niêm yết: dùng danh sách cố định làm hạt giống.
+"""
+
+import json
+import math
+import os
+from datetime import datetime
+
+import pandas as pd
+import requests
+
+from src.config import (
+    RAW_DATA_FILE, UNIVERSE_FILE, UNIVERSE_REFRESH_DAYS, UNIVERSE_ADV_WINDOW,
+    UNIVERSE_LOOKBACK_DAYS, UNIVERSE_EXCHANGES, UNIVERSE_REFRESH
+)
+
+
+class ListingFetcher:
+    """Danh sách mã niêm yết HOSE/HNX/UPCOM (VCI)"""
+
+    BASE_URL = "https://trading.vietcap.com.vn/api/price/symbols/getAll"
+
+    def get_listing(self) -> pd.DataFrame:
+        """DataFrame [symbol, exchange], chỉ cổ phiếu trên UNIVERSE_EXCHANGES"""
+        resp = requests.get(self.BASE_URL, timeout=15, headers={
+            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
+            'Accept': 'application/json',
+        })
+        resp.raise_for_status()
+        df = pd.DataFrame(resp.json())
+        if df.empty or 'symbol' not in df.columns:
+            return pd.DataFrame(columns=['symbol', 'exchange'])
+
+        df = df.rename(columns={'board': 'exchange'})
+        if 'type' in df.columns:
+            df = df[df['type'].astype(str).str.upper() == 'STOCK']
+        df = df[df['exchange'].isin(UNIVERSE_EXCHANGES)]
+        df = df[df['symbol'].astype(str).str.len() == 3]
+        return df[['symbol', 'exchange']].drop_duplicates('symbol').reset_index(drop=True)
+
+
+def rank_by_traded_value(bars: pd.DataFrame, window: int = UNIVERSE_ADV_WINDOW) -> pd.DataFrame:
+    """GTGD trung bình `window` phiên gần nhất của mỗi mã, giảm dần.
+
+    Trả về DataFrame [symbol, adv, sessions, last_date]; mã có ít hơn window/2
+    phiên (ngừng giao dịch / mới niêm yết) bị loại. Trùng (symbol, time) — kho
+    + bars lấy thêm — giữ bản sau cùng."""
+    if bars.empty:
+        return pd.DataFrame(columns=['symbol', 'adv', 'sessions', 'last_date'])
+    df = bars[['symbol', 'time', 'close', 'volume']].copy()
+    df['time'] = pd.to_datetime(df['time'], errors='coerce', utc=True).dt.tz_localize(None)
+    df = df.dropna(subset=['time']).drop_duplicates(['symbol', 'time'], keep='last')
+    df = df.sort_values(['symbol', 'time'])
+    df = df.groupby('symbol').tail(window)
+    df['value'] = df['close'] * df['volume']
+
+    stats = df.groupby('symbol').agg(adv=('value', 'mean'), sessions=('value', 'size'),
+                                     last_date=('time', 'max')).reset_index()
+    stats = stats[stats['sessions'] >= max(1, window // 2)]
+    return stats.sort_values(['adv', 'symbol'], ascending=[False, True]).reset_index(drop=True)
+
+
+class UniverseBuilder:
+    """Xây / đọc universe xếp hạng theo thanh khoản"""
+
+    def __init__(self, universe_file: str = UNIVERSE_FILE):
+        self.universe_file = universe_file
+
+    def load(self) -> dict:
+        if os.path.exists(self.universe_file):
+            try:
+                with open(self.universe_file, 'r', encoding='utf-8') as f:
+                    return json.load(f)
+            except (json.JSONDecodeError, OSError):
+                print(f"   ⚠️ Khong doc duoc {self.universe_file}")
+        return {}
+
+    def save(self, universe: dict, path: str = None):
+        path = path or self.universe_file
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(universe, f, ensure_ascii=False, indent=1)
+
+    def is_stale(self, universe: dict) -> bool:
+        if UNIVERSE_REFRESH or not universe.get('symbols'):
+            return True
+        try:
+            built = datetime.fromisoformat(universe['built_at'])
+        except (KeyError, ValueError):
+            return True
+        return (datetime.now() - built).days >= UNIVERSE_REFRESH_DAYS
+
+    @staticmethod
+    def exchange_map(universe: dict) -> dict:
+        """{symbol: 'HSX' | 'HNX' | 'UPCOM'}"""
+        return {s['symbol']: s.get('exchange', '') for s in universe.get('symbols', [])}
+
+    @staticmethod
+    def _stored_bars() -> pd.DataFrame:
+        if not os.path.exists(RAW_DATA_FILE):
+            return pd.DataFrame()
+        return pd.read_csv(RAW_DATA_FILE, usecols=['symbol', 'time', 'close', 'volume'])
+
+    def refresh(self, fetcher, seed_symbols: list, shard_filter=None) -> dict:
+        """Xếp hạng lại: listing đầy đủ + bars (kho sẵn có, thiếu thì lấy thêm).
+
+        fetcher: có get_price_history(symbol, days) (MultiSourceFetcher)
+        shard_filter: hàm lọc danh sách mã (chỉ xếp hạng phần của shard)"""
+        print("   🔄 Xep hang lai universe theo GTGD 20 phien...")
+        try:
+            listing = ListingFetcher().get_listing()
+            source = 'listing'
+        except Exception as e:
+            print(f"   ⚠️ Khong lay duoc danh sach niem yet: {type(e).__name__}: {e}")
+            listing = pd.DataFrame(columns=['symbol', 'exchange'])
+        if listing.empty:
+            listing = pd.DataFrame({'symbol': list(dict.fromkeys(seed_symbols)), 'exchange': ''})
+            source = 'seed'
+        if shard_filter:
+            listing = listing[listing['symbol'].isin(shard_filter(listing['symbol'].tolist()))]
+        print(f"   📋 {len(listing)} ma ({source})")
+
+        # Kho bars sẵn có: mã có đủ phiên gần đây thì không cần lấy lại
+        stored = self._stored_bars()
+        stored = stored[stored['symbol'].isin(listing['symbol'])] if not stored.empty else stored
+        fresh = set()
+        if not stored.empty:
+            ranked = rank_by_traded_value(stored)
+            cutoff = ranked['last_date'].max() - pd.Timedelta(days=5)
+            fresh = set(ranked.loc[(ranked['last_date'] >= cutoff)
+                                   & (ranked['sessions'] >= UNIVERSE_ADV_WINDOW), 'symbol'])
+
+        to_fetch = [s for s in listing['symbol'] if s not in fresh]
+        print(f"   📦 Kho: {len(fresh)} ma du du lieu | Lay them: {len(to_fetch)} ma")
+        frames = [stored] if not stored.empty else []
+        for i, symbol in enumerate(to_fetch):
+            df = fetcher.get_price_history(symbol, days=UNIVERSE_LOOKBACK_DAYS)
+            if not df.empty:
+                frames.append(df[['symbol', 'time', 'close', 'volume']])
+            if (i + 1) % 100 == 0:
+                print(f"      [{i+1}/{len(to_fetch)}]")
+
+        bars = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+        ranked = rank_by_traded_value(bars)
+        exchanges = dict(zip(listing['symbol'], listing['exchange']))
+        universe = {
+            'built_at': datetime.now().isoformat(timespec='seconds'),
+            'source': source,
+            'window': UNIVERSE_ADV_WINDOW,
+            'listed': len(listing),
+            'symbols': [{
+                'symbol': r.symbol,
+                'exchange': exchanges.get(r.symbol, ''),
+                'adv': round(float(r.adv)),
+                'sessions': int(r.sessions),
+            } for r in ranked.itertuples()],
+        }
+        print(f"   ✅ {len(universe['symbols'])} ma co thanh khoan / {len(listing)} niem yet")
+        return universe
+
+    def get_symbols(self, fetcher, count: int, seed_symbols: list, shard: tuple = None,
+                    shard_filter=None, save_path: str = None) -> list:
+        """Top `count` mã theo GTGD 20 phiên (xếp hạng lại nếu universe đã cũ).
+
+        Shard + universe cũ: chỉ xếp hạng phần của shard, lấy top ceil(count/N),
+        lưu vào save_path (gộp lại ở bước merge)."""
+        universe = self.load()
+        if self.is_stale(universe):
+            if shard:
+                universe = self.refresh(fetcher, seed_symbols, shard_filter)
+                count = math.ceil(count / shard[1])
+                if universe['symbols'] and save_path:
+                    self.save(universe, save_path)
+            else:
+                universe = self.refresh(fetcher, seed_symbols)
+                if universe['symbols']:
+                    self.save(universe)
+        else:
+            print(f"   📋 Universe {universe.get('built_at', '')[:10]}: "
+                  f"{len(universe['symbols'])} ma xep hang")
+
+        symbols = [s['symbol'] for s in universe.get('symbols', [])][:count]
+        if not symbols:
+            print("   ⚠️ Universe trong - dung danh sach co dinh")
+            symbols = list(dict.fromkeys(seed_symbols))[:count]
+        return symbols
+
+
+def merge_universes(paths: list, universe_file: str = UNIVERSE_FILE):
+    """Gộp universe xếp hạng từng shard thành universe toàn cục"""
+    parts = []
+    for path in paths:
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                parts.append(json.load(f))
+    if not parts:
+        return None
+    symbols = sorted((s for p in parts for s in p.get('symbols', [])),
+                     key=lambda s: (-s['adv'], s['symbol']))
+    universe = {
+        'built_at': min(p['built_at'] for p in parts),
+        'source': parts[0].get('source', ''),
+        'window': parts[0].get('window', UNIVERSE_ADV_WINDOW),
+        'listed': sum(p.get('listed', 0) for p in parts),
+        'symbols': symbols,
+    }
+    UniverseBuilder(universe_file).save(universe)
+    print(f"✅ Universe gộp từ {len(parts)} shard: {len(symbols)} mã → {universe_file}")
+    return universe
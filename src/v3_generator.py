@@ -6,8 +6,10 @@ Flow: Fetch DNSE → Calculate indicators → Call Claude API ONCE → Generate
 import json
 import math
 import os
+import re
 import time
 import sys
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime, timedelta
 
 import numpy as np
@@ -15,7 +17,14 @@ import requests
 
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from src.config import CLAUDE_API_KEY
+from src.config import (
+    CLAUDE_API_KEY, CLAUDE_MODEL, CLAUDE_STREAM_TIMEOUT,
+    V3_AI_MODE, V3_AI_CONCURRENCY, V3_INDEX_MAX_TOKENS, V3_OVERVIEW_MAX_TOKENS,
+    PANEL_DIR, PANEL_MAX_AGE_HOURS
+)
+from src.ai_cache import ResponseCache
+from src.bars import decode_columnar, columns_from_dict
+from src.panel import PricePanel
 
 try:
     from anthropic import Anthropic
@@ -57,26 +66,41 @@ def fetch_dnse(symbol, days=200):
     try:
         r = requests.get(DNSE_BASE, params=params, headers=DNSE_HEADERS, timeout=15)
         r.raise_for_status()
-        d = r.json()
-        if not d or 't' not in d or not d['t']:
+        cols = decode_columnar(r.content, scale=1000) or columns_from_dict(r.json(), scale=1000)
+        if not cols:
             return None
-        bars = []
-        for i in range(len(d['t'])):
-            dt = datetime.utcfromtimestamp(d['t'][i])
-            bars.append({
-                'd': dt.strftime('%Y-%m-%d'),
-                'o': round((d['o'][i] or 0) * 1000, 2),
-                'h': round((d['h'][i] or 0) * 1000, 2),
-                'l': round((d['l'][i] or 0) * 1000, 2),
-                'c': round((d['c'][i] or 0) * 1000, 2),
-                'v': d['v'][i] or 0,
-            })
+        # Vector hóa: ngày UTC + làm tròn giá cho cả mảng, không format từng nến
+        dates = cols['t'].astype('datetime64[s]').astype('datetime64[D]').astype(str)
+        prices = [np.round(np.nan_to_num(cols[k]), 2).tolist() for k in ('o', 'h', 'l', 'c')]
+        bars = [{'d': d, 'o': o, 'h': h, 'l': l, 'c': c, 'v': v}
+                for d, o, h, l, c, v in zip(dates.tolist(), *prices, cols['v'].tolist())]
         return bars
     except Exception as e:
         print(f"  DNSE error {symbol}: {e}")
         return None
 
 
+def open_fresh_panel():
+    """Panel giá của main.py nếu vừa ghi (PANEL_MAX_AGE_HOURS), tránh gọi lại DNSE"""
+    age = time.time() - PricePanel.mtime(PANEL_DIR)
+    if age > PANEL_MAX_AGE_HOURS * 3600:
+        return None
+    return PricePanel.open(PANEL_DIR)
+
+
+def panel_bars(panel, symbol, n):
+    """n nến cuối của 1 mã trong panel, cùng định dạng fetch_dnse"""
+    i = panel.sym_index[symbol]
+    valid = np.flatnonzero(panel.mask[i])[-n:]
+    block = np.asarray(panel.values[i, valid, :], dtype=np.float64)
+    col = panel.field_index
+    dates = panel.dates[valid].strftime('%Y-%m-%d')
+    return [{'d': d, 'o': round(float(row[col['open']]), 2), 'h': round(float(row[col['high']]), 2),
+             'l': round(float(row[col['low']]), 2), 'c': round(float(row[col['close']]), 2),
+             'v': int(row[col['volume']])}
+            for d, row in zip(dates, block)]
+
+
 # ============================================================
 # Technical Indicators
 # ============================================================
@@ -243,6 +267,30 @@ QUY TAC QUAN TRONG:
 """
 
 
+OVERVIEW_SECTIONS_SPEC = """OVERVIEW gom 4 sections:
+1. "TONG QUAN THI TRUONG" (icon:"📊") - Xu huong chu dao, buc tranh tong the
+2. "XEP HANG CHI SO" (icon:"🏆") - Xep hang chi so theo suc manh
+3. "RUI RO HE THONG" (icon:"⚠️") - Rui ro chung
+4. "KHUYEN NGHI CHUNG" (icon:"🎯") - Chien luoc tong the"""
+
+INDEX_SECTIONS_SPEC = """MOI CHI SO gom 9 sections:
+1. "XU HUONG GIA" (icon:"📈") - MA, trend ngan/trung/dai han
+2. "XU HUONG KHOI LUONG" (icon:"📊") - Volume, vol_ratio
+3. "KET HOP GIA - KHOI LUONG" (icon:"💹") - Ket hop gia + volume
+4. "CUNG-CAU" (icon:"⚖️") - RSI, MACD, BB%
+5. "MUC GIA QUAN TRONG" (icon:"🎯") - Support/Resistance, MA levels
+6. "BIEN DONG GIA" (icon:"📉") - ATR, BB width, squeeze
+7. "RUI RO" (icon:"⚠️") - Canh bao rui ro
+8. "KHUYEN NGHI VI THE" (icon:"🎯") - Long/Short/Cash
+9. "GIA MUC TIEU" (icon:"🎯") - Muc gia muc tieu"""
+
+SECTION_RULES = """QUY TAC:
+- Moi section PHAI co {"title":"...","icon":"...","content":"<HTML>"}
+- Content HTML dung CSS classes: conclusion-box, evidence-box, action-box, risk-box, content-paragraph, metric-number
+- Dung SO LIEU CU THE tu data
+- CHI tra ve JSON object, KHONG co text/markdown nao khac"""
+
+
 def build_mega_prompt(all_indicators, all_bars_summary):
     """Build a SINGLE prompt for ALL indices + overview analysis"""
 
@@ -305,62 +353,284 @@ Tra ve 1 JSON object duy nhat voi cau truc:
   }}
 }}
 
-OVERVIEW gom 4 sections:
-1. "TONG QUAN THI TRUONG" (icon:"📊") - Xu huong chu dao, buc tranh tong the
-2. "XEP HANG CHI SO" (icon:"🏆") - Xep hang chi so theo suc manh
-3. "RUI RO HE THONG" (icon:"⚠️") - Rui ro chung
-4. "KHUYEN NGHI CHUNG" (icon:"🎯") - Chien luoc tong the
+{OVERVIEW_SECTIONS_SPEC}
 
-MOI CHI SO gom 9 sections:
-1. "XU HUONG GIA" (icon:"📈") - MA, trend ngan/trung/dai han
-2. "XU HUONG KHOI LUONG" (icon:"📊") - Volume, vol_ratio
-3. "KET HOP GIA - KHOI LUONG" (icon:"💹") - Ket hop gia + volume
-4. "CUNG-CAU" (icon:"⚖️") - RSI, MACD, BB%
-5. "MUC GIA QUAN TRONG" (icon:"🎯") - Support/Resistance, MA levels
-6. "BIEN DONG GIA" (icon:"📉") - ATR, BB width, squeeze
-7. "RUI RO" (icon:"⚠️") - Canh bao rui ro
-8. "KHUYEN NGHI VI THE" (icon:"🎯") - Long/Short/Cash
-9. "GIA MUC TIEU" (icon:"🎯") - Muc gia muc tieu
+{INDEX_SECTIONS_SPEC}
 
-QUY TAC:
-- Moi section PHAI co {{"title":"...","icon":"...","content":"<HTML>"}}
-- Content HTML dung CSS classes: conclusion-box, evidence-box, action-box, risk-box, content-paragraph, metric-number
-- Dung SO LIEU CU THE tu data
-- CHI tra ve JSON object, KHONG co text/markdown nao khac
+{SECTION_RULES}
 - Tong cong: 1 overview (4 sections) + 4 chi so x 9 sections = 40 sections"""
 
 
-def call_claude_single(prompt):
-    """Call Claude API ONCE and return full analysis dict"""
+def build_index_prompt(idx, ind, bars_sum):
+    """Build a smaller prompt for ONE index (parallel mode)"""
+    key = idx['key']
+    name = idx['name']
+    return f"""Phan tich ky thuat chi so {name} - thi truong chung khoan Viet Nam.
+
+=== DU LIEU ===
+Chi bao ky thuat: {json.dumps(ind, ensure_ascii=False)}
+5 phien gan nhat: {json.dumps(bars_sum, ensure_ascii=False)}
+
+=== YEU CAU ===
+Tra ve 1 JSON object duy nhat voi cau truc:
+
+{{
+  "{key}": {{
+    "title": "{name} - Phan tich ky thuat",
+    "sections": [9 sections]
+  }}
+}}
+
+{INDEX_SECTIONS_SPEC}
+
+{SECTION_RULES}"""
+
+
+def _section_digest(result, max_chars=300):
+    """Plain-text digest of an index analysis (conclusions only) for the overview prompt"""
+    parts = []
+    for sec in (result or {}).get('sections', [])[:9]:
+        text = re.sub(r'<[^>]+>', ' ', sec.get('content', ''))
+        text = re.sub(r'\s+', ' ', text).strip()
+        if text:
+            parts.append(f"{sec.get('title', '')}: {text[:max_chars // 3]}")
+    return ' | '.join(parts)[:max_chars]
+
+
+def build_overview_prompt(all_indicators, index_results):
+    """Build the overview prompt from indicators + per-index conclusions (parallel mode)"""
+    overview_summary = {}
+    for idx_key, ind in all_indicators.items():
+        overview_summary[idx_key] = {
+            'price': ind.get('last_price'),
+            'change_pct': ind.get('change_pct'),
+            'rsi': ind.get('rsi'),
+            'trend': ind.get('trend'),
+            'vol_ratio': ind.get('vol_ratio'),
+            'macd_bullish': ind.get('macd_bullish'),
+        }
+    digests = "\n".join(
+        f"--- {idx['name']} ---\n{_section_digest(index_results.get(idx['key']))}"
+        for idx in INDEX_LIST if idx['key'] in index_results
+    )
+
+    return f"""Tong hop thi truong chung khoan Viet Nam tu phan tich tung chi so.
+
+=== TONG HOP ===
+{json.dumps(overview_summary, indent=2, ensure_ascii=False)}
+
+=== NHAN DINH TUNG CHI SO ===
+{digests or "Khong co"}
+
+=== YEU CAU ===
+Tra ve 1 JSON object duy nhat voi cau truc:
+
+{{
+  "overview": {{
+    "title": "TONG HOP - Thi truong chung khoan Viet Nam",
+    "sections": [4 sections]
+  }}
+}}
+
+{OVERVIEW_SECTIONS_SPEC}
+
+{SECTION_RULES}"""
+
+
+def parse_json_response(text):
+    """Extract JSON object from Claude response text"""
+    if text.startswith('{'):
+        return json.loads(text)
+    start = text.find('{')
+    end = text.rfind('}')
+    if start >= 0 and end > start:
+        return json.loads(text[start:end+1])
+    return None
+
+
+class SectionStreamParser:
+    """Incremental JSON parser for the mega-prompt response.
+
+    Feed text chunks as they stream in; each top-level key of the root object
+    is returned as soon as its value is complete, so a timeout or truncated
+    response keeps every section that already arrived.
+    """
+
+    def __init__(self):
+        self.buf = ''
+        self.pos = 0
+        self.depth = 0
+        self.started = False
+        self.done = False
+        self.in_str = False
+        self.esc = False
+        self.str_start = 0
+        self.last_str = None
+        self.key = None
+        self.value_start = None
+        self.completed = {}
+
+    def feed(self, chunk):
+        """Consume a chunk, return list of (key, value) completed by it"""
+        self.buf += chunk
+        out = []
+        buf = self.buf
+        for i in range(self.pos, len(buf)):
+            if self.done:
+                break
+            c = buf[i]
+            if self.in_str:
+                if self.esc:
+                    self.esc = False
+                elif c == '\\':
+                    self.esc = True
+                elif c == '"':
+                    self.in_str = False
+                    if self.depth == 1 and self.value_start is None:
+                        self.last_str = json.loads(buf[self.str_start:i + 1])
+                continue
+            if not self.started:
+                if c == '{':
+                    self.started = True
+                    self.depth = 1
+                continue
+            if c == '"':
+                self.in_str = True
+                self.str_start = i
+            elif c == ':' and self.depth == 1:
+                self.key = self.last_str
+            elif c in '{[':
+                if self.depth == 1 and self.key is not None:
+                    self.value_start = i
+                self.depth += 1
+            elif c in '}]':
+                self.depth -= 1
+                if self.depth == 1 and self.value_start is not None:
+                    try:
+                        value = json.loads(buf[self.value_start:i + 1])
+                        self.completed[self.key] = value
+                        out.append((self.key, value))
+                    except json.JSONDecodeError:
+                        pass
+                    self.key = None
+                    self.value_start = None
+                elif self.depth == 0:
+                    self.done = True
+        self.pos = len(buf)
+        return out
+
+
+def stream_claude_sections(client, prompt, max_tokens=16000, system=SYSTEM_PROMPT, stats=None):
+    """Stream a Claude response, yielding (key, value) per completed top-level key.
+
+    `stats` (dict) receives the raw text, completion flag and token usage."""
+    parser = SectionStreamParser()
+    stats = stats if stats is not None else {}
+    stats.update({'text': '', 'complete': False, 'output_tokens': 0, 'input_tokens': 0})
+    t0 = time.time()
+    with client.messages.stream(
+        model=CLAUDE_MODEL,
+        max_tokens=max_tokens,
+        system=system,
+        messages=[{"role": "user", "content": prompt}],
+        timeout=CLAUDE_STREAM_TIMEOUT,
+    ) as stream:
+        for chunk in stream.text_stream:
+            if 'ttft' not in stats:
+                stats['ttft'] = time.time() - t0
+            for key, value in parser.feed(chunk):
+                print(f"    [{time.time() - t0:5.1f}s] {key} received")
+                yield key, value
+        final = stream.get_final_message()
+        stats['output_tokens'] = final.usage.output_tokens
+        stats['input_tokens'] = final.usage.input_tokens
+        stats['stop_reason'] = final.stop_reason
+    stats['text'] = parser.buf.strip()
+    stats['complete'] = parser.done
+
+
+def call_claude_single(prompt, max_tokens=16000, cache=None, client=None, label='single call'):
+    """Call Claude API ONCE (streaming) and return analysis dict.
+
+    On timeout/truncation the dict holds only the sections that completed;
+    generate_v3 fills fallback sections for the missing keys."""
+    cache = cache or ResponseCache()
+    cache_key = cache.make_key(CLAUDE_MODEL, SYSTEM_PROMPT, prompt, max_tokens)
+    cached = cache.get(cache_key)
+    if cached is not None:
+        try:
+            result = parse_json_response(cached)
+            if result:
+                print(f"  Using cached Claude response ({len(cached)} chars)")
+                return result
+        except json.JSONDecodeError:
+            pass
+        cache.delete(cache_key)
+
     if not ANTHROPIC_AVAILABLE or not CLAUDE_API_KEY:
         print("  Claude API not available, using fallback")
         return None
 
-    client = Anthropic(api_key=CLAUDE_API_KEY)
+    client = client or Anthropic(api_key=CLAUDE_API_KEY)
+    result = {}
+    stats = {}
     try:
-        print("  Calling Claude API (single call)...")
-        response = client.messages.create(
-            model="claude-sonnet-4-5-20250929",
-            max_tokens=16000,
-            system=SYSTEM_PROMPT,
-            messages=[{"role": "user", "content": prompt}]
-        )
-        text = response.content[0].text.strip()
-        print(f"  Response: {len(text)} chars, {response.usage.output_tokens} tokens")
-
-        # Extract JSON object from response
-        if text.startswith('{'):
-            return json.loads(text)
-        start = text.find('{')
-        end = text.rfind('}')
-        if start >= 0 and end > start:
-            return json.loads(text[start:end+1])
-        print("  Could not parse JSON from Claude response")
-        return None
+        print(f"  Calling Claude API ({label}, streaming)...")
+        for key, value in stream_claude_sections(client, prompt, max_tokens, stats=stats):
+            result[key] = value
+        print(f"  Response ({label}): {len(stats['text'])} chars, {stats['output_tokens']} tokens, "
+              f"TTFT {stats.get('ttft', 0):.1f}s")
     except Exception as e:
-        print(f"  Claude API error: {e}")
+        print(f"  Claude API error ({label}) after {len(result)} sections: {e}")
+
+    if stats.get('complete'):
+        cache.put(cache_key, stats['text'], CLAUDE_MODEL,
+                  {'input_tokens': stats['input_tokens'],
+                   'output_tokens': stats['output_tokens']})
+    elif result:
+        print(f"  Partial response: kept {len(result)} sections ({', '.join(result)})")
+
+    return result or None
+
+
+def call_claude_parallel(all_indicators, all_bars_summary, concurrency=V3_AI_CONCURRENCY, cache=None):
+    """One request per index concurrently, then the overview request.
+
+    Latency ~ slowest index + overview instead of the sum of all 40 sections,
+    and a failed index only costs that index (fallback fills it)."""
+    if not ANTHROPIC_AVAILABLE or not CLAUDE_API_KEY:
+        print("  Claude API not available, using fallback")
         return None
 
+    cache = cache or ResponseCache()
+    client = Anthropic(api_key=CLAUDE_API_KEY)
+    result = {}
+    t0 = time.time()
+
+    jobs = {}
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+        for idx in INDEX_LIST:
+            key = idx['key']
+            if key not in all_indicators:
+                continue
+            prompt = build_index_prompt(idx, all_indicators[key], all_bars_summary.get(key, []))
+            jobs[pool.submit(call_claude_single, prompt, V3_INDEX_MAX_TOKENS, cache,
+                             client, idx['name'])] = key
+        for fut in as_completed(jobs):
+            key = jobs[fut]
+            part = fut.result() or {}
+            if key in part:
+                result[key] = part[key]
+            print(f"    [{time.time() - t0:5.1f}s] {key}: {'OK' if key in part else 'FAILED'}")
+
+    overview_prompt = build_overview_prompt(all_indicators, result)
+    part = call_claude_single(overview_prompt, V3_OVERVIEW_MAX_TOKENS, cache, client, 'overview') or {}
+    if 'overview' in part:
+        result['overview'] = part['overview']
+    print(f"  Parallel AI done in {time.time() - t0:.1f}s ({len(result)} keys)")
+
+    return result or None
+
 
 # ============================================================
 # Fallback sections (no AI)
@@ -429,10 +699,12 @@ def make_fallback_overview(all_indicators):
 def fetch_stock_heatmap():
     """Fetch VN30 stocks for heatmap"""
     result = {'gainers': [], 'losers': [], 'date': ''}
-    print("  Fetching VN30 stocks for heatmap...")
+    panel = open_fresh_panel()
+    print(f"  Fetching VN30 stocks for heatmap{' (panel)' if panel else ''}...")
 
     for i, sym in enumerate(VN30_STOCKS):
-        bars = fetch_dnse(sym, 5)
+        from_panel = panel is not None and sym in panel
+        bars = panel_bars(panel, sym, 5) if from_panel else fetch_dnse(sym, 5)
         if not bars or len(bars) < 2:
             continue
         last = bars[-1]
@@ -453,7 +725,8 @@ def fetch_stock_heatmap():
 
         if (i + 1) % 10 == 0:
             print(f"    {i+1}/{len(VN30_STOCKS)} stocks done")
-        time.sleep(0.15)
+        if not from_panel:
+            time.sleep(0.15)
 
     result['gainers'].sort(key=lambda x: x['change_pct'], reverse=True)
     result['losers'].sort(key=lambda x: x['change_pct'])
@@ -496,10 +769,14 @@ def generate_v3():
         all_bars_summary[key] = data['bars'][-5:] if len(data['bars']) >= 5 else data['bars']
         print(f"  {key}: price={ind.get('last_price')}, change={ind.get('change_pct')}%, RSI={ind.get('rsi')}")
 
-    # Step 3: Call Claude API ONCE
-    print("\n[3/4] Calling Claude API (SINGLE CALL)...")
-    mega_prompt = build_mega_prompt(all_indicators, all_bars_summary)
-    ai_result = call_claude_single(mega_prompt)
+    # Step 3: Call Claude API (ONCE, or one call per index in parallel mode)
+    if V3_AI_MODE == 'parallel':
+        print(f"\n[3/4] Calling Claude API (PARALLEL, {V3_AI_CONCURRENCY} concurrent)...")
+        ai_result = call_claude_parallel(all_indicators, all_bars_summary)
+    else:
+        print("\n[3/4] Calling Claude API (SINGLE CALL)...")
+        mega_prompt = build_mega_prompt(all_indicators, all_bars_summary)
+        ai_result = call_claude_single(mega_prompt)
 
     # Build FULL_DATA from AI result or fallback
     full_data = {}
@@ -583,4 +860,6 @@ def generate_v3():
 
 
 if __name__ == '__main__':
+    from src import cassette
+    cassette.install()
     generate_v3()
@@ -0,0 +1,195 @@
+"""
+VN Stock Sniper - Data Validator
+Kiểm tra chất lượng toàn bộ dữ liệu giá trong 1 lượt vector hóa, trước khi phân tích.
+
+Sửa tại chỗ (repair):
+    out_of_order       nến sai thứ tự thời gian → sắp xếp lại
+    duplicate          trùng (mã, ngày) → giữ bản cuối
+    zero_price         open/high/low <= 0 hoặc trống → lấy theo close
+    ohlc_inconsistent  high < max(open, close) / low > min(open, close) → nới high/low
+    bad_volume         volume âm / trống → 0
+Bỏ nến (drop):
+    bad_close          close <= 0 hoặc trống
+Chỉ đánh dấu (flag):
+    limit_breach       biến động vượt biên độ sàn (HOSE ±7%, HNX ±10%, UPCOM ±15%)
+    split_suspect      gap > SPLIT_SUSPECT_MOVE (chia tách / thưởng chưa điều chỉnh)
+    zero_volume_move   volume = 0 nhưng giá thay đổi
+    volume_spike       volume > VOLUME_SPIKE_FACTOR x trung vị của mã
+    gaps               số phiên thiếu so với lịch giao dịch
+    stale              thiếu phiên mới nhất
+
+Mã có lỗi nặng (REFETCH_ISSUES, hoặc gaps > VALIDATE_MAX_GAPS) được đưa vào
+danh sách lấy lại từ nguồn khác.
+"""
+
+import numpy as np
+import pandas as pd
+
+from src.config import (
+    PRICE_LIMITS, PRICE_LIMIT_DEFAULT, PRICE_LIMIT_TOLERANCE, SPLIT_SUSPECT_MOVE,
+    VOLUME_SPIKE_FACTOR, CALENDAR_MIN_COVERAGE, VALIDATE_MAX_GAPS
+)
+
+PRICE_COLS = ['open', 'high', 'low', 'close']
+ISSUES = ['out_of_order', 'duplicate', 'zero_price', 'ohlc_inconsistent', 'bad_volume',
+          'bad_close', 'limit_breach', 'split_suspect', 'zero_volume_move', 'volume_spike',
+          'gaps', 'stale']
+REFETCH_ISSUES = ['bad_close', 'zero_price', 'split_suspect', 'stale']
+
+
+def repair_ohlc(o: np.ndarray, h: np.ndarray, l: np.ndarray, c: np.ndarray) -> tuple:
+    """Sửa giá như validate(): open/high/low <= 0 hoặc trống → close, nới high/low bao open/close"""
+    o = np.where(o > 0, o, c)
+    h = np.where(h > 0, h, c)
+    l = np.where(l > 0, l, c)
+    return o, np.maximum(h, np.maximum(o, c)), np.minimum(l, np.minimum(o, c))
+
+
+class DataValidator:
+    """Kiểm tra + sửa dữ liệu OHLCV dạng long frame (time, open, ..., volume, symbol)"""
+
+    def __init__(self, exchange_map: dict = None):
+        self.exchange_map = exchange_map or {}
+
+    def infer_calendar(self, df: pd.DataFrame) -> pd.DatetimeIndex:
+        """Ngày giao dịch = ngày có >= CALENDAR_MIN_COVERAGE số mã có nến"""
+        dates = pd.to_datetime(df['time']).dt.normalize()
+        counts = dates.value_counts()
+        n_symbols = df['symbol'].nunique()
+        return pd.DatetimeIndex(sorted(counts.index[counts >= CALENDAR_MIN_COVERAGE * n_symbols]))
+
+    def validate(self, df: pd.DataFrame, calendar=None) -> tuple:
+        """→ (df đã sửa, report)
+
+        report: {issues: DataFrame [mã x lỗi] (chỉ mã có lỗi), totals: {lỗi: số nến},
+                 refetch: [mã], calendar: DatetimeIndex, rows_in, rows_out}"""
+        columns = list(df.columns)
+        rows_in = len(df)
+        if df.empty:
+            return df, self._report(pd.DataFrame(columns=ISSUES), [], pd.DatetimeIndex([]), 0, 0)
+
+        df = df.reset_index(drop=True)
+        time = pd.to_datetime(df['time'])
+        if getattr(time.dt, 'tz', None) is not None:
+            time = time.dt.tz_convert(None)
+        codes, symbols = pd.factorize(df['symbol'].astype(str))
+        t = time.to_numpy()
+        flags = {}
+
+        # 1. Sai thứ tự (theo thứ tự nhận về) → sắp xếp (mã, thời gian)
+        back = np.zeros(len(df), dtype=bool)
+        back[1:] = (codes[1:] == codes[:-1]) & (t[1:] < t[:-1])
+        order = np.lexsort((t, codes))
+        df = df.iloc[order].reset_index(drop=True)
+        codes, t, back = codes[order], t[order], back[order]
+        flags['out_of_order'] = back
+        date = t.astype('datetime64[D]')
+
+        # 2. Trùng (mã, ngày) → giữ bản cuối
+        dup = np.zeros(len(df), dtype=bool)
+        dup[:-1] = (codes[:-1] == codes[1:]) & (date[:-1] == date[1:])
+        flags['duplicate'] = dup
+
+        # 3. Giá / volume
+        prices = df[PRICE_COLS].to_numpy(dtype=np.float64, na_value=np.nan)
+        o, h, l, c = (prices[:, k].copy() for k in range(4))
+        bad_close = ~(c > 0)
+        zero = ~((o > 0) & (h > 0) & (l > 0)) & ~bad_close
+        filled = [np.where(x > 0, x, c) for x in (o, h, l)]
+        inconsistent = ((filled[1] < np.maximum(filled[0], c))
+                        | (filled[2] > np.minimum(filled[0], c))) & ~bad_close
+        o, h, l = repair_ohlc(o, h, l, c)
+        v = df['volume'].to_numpy(dtype=np.float64, na_value=np.nan)
+        bad_volume = ~(v >= 0)
+        v = np.where(bad_volume, 0, v)
+        flags.update(zero_price=zero, ohlc_inconsistent=inconsistent, bad_volume=bad_volume,
+                     bad_close=bad_close)
+
+        # Nến giữ lại cho các kiểm tra theo chuỗi giá
+        keep = ~(dup | bad_close)
+        kc, kt, kd = codes[keep], t[keep], date[keep]
+        kcl, kv = c[keep], v[keep]
+
+        # 4. Biên độ / chia tách: so với close phiên trước của cùng mã
+        same = np.zeros(len(kc), dtype=bool)
+        same[1:] = kc[1:] == kc[:-1]
+        prev = np.empty_like(kcl)
+        prev[0] = np.nan
+        prev[1:] = kcl[:-1]
+        ratio = np.where(same, kcl / prev, 1.0)
+        limits = np.array([PRICE_LIMITS.get(self.exchange_map.get(s, ''), PRICE_LIMIT_DEFAULT)
+                           for s in symbols])[kc]
+        split = (ratio < 1 - SPLIT_SUSPECT_MOVE) | (ratio > 1 / (1 - SPLIT_SUSPECT_MOVE))
+        breach = (np.abs(ratio - 1) > limits + PRICE_LIMIT_TOLERANCE) & ~split
+        zero_vol_move = same & (kv == 0) & (ratio != 1)
+        median_vol = pd.Series(kv).groupby(kc).transform('median').to_numpy()
+        spike = kv > VOLUME_SPIKE_FACTOR * np.maximum(median_vol, 1)
+
+        # 5. Lịch giao dịch: phiên thiếu giữa nến đầu và cuối + thiếu phiên mới nhất
+        if calendar is None:
+            calendar = self.infer_calendar(pd.DataFrame({'time': kt, 'symbol': kc}))
+        cal = np.asarray(pd.DatetimeIndex(calendar).values.astype('datetime64[D]'))
+        starts = np.flatnonzero(np.r_[True, ~same[1:]]) if len(kc) else np.array([], dtype=int)
+        ends = np.r_[starts[1:], len(kc)] - 1 if len(starts) else starts
+        first_pos = np.searchsorted(cal, kd[starts]) if len(cal) else np.zeros(len(starts), int)
+        last_pos = np.searchsorted(cal, kd[ends], side='right') if len(cal) else first_pos
+        in_cal = np.zeros(len(kd), dtype=bool)
+        if len(cal):
+            pos = np.clip(np.searchsorted(cal, kd), 0, len(cal) - 1)
+            in_cal = cal[pos] == kd
+        have = np.add.reduceat(in_cal.astype(np.int64), starts) if len(starts) else starts
+        gaps = np.maximum(last_pos - first_pos - have, 0)
+        stale = kd[ends] < cal[-1] if len(cal) else np.zeros(len(starts), dtype=bool)
+
+        # Đếm lỗi theo mã
+        n_sym = len(symbols)
+        counts = {name: np.bincount(codes, weights=flags[name], minlength=n_sym)
+                  for name in flags}
+        for name, mask in (('limit_breach', breach), ('split_suspect', split),
+                           ('zero_volume_move', zero_vol_move), ('volume_spike', spike)):
+            counts[name] = np.bincount(kc, weights=mask, minlength=n_sym)
+        counts['gaps'] = np.zeros(n_sym)
+        counts['stale'] = np.zeros(n_sym)
+        counts['gaps'][kc[starts]] = gaps
+        counts['stale'][kc[starts]] = stale
+        issues = pd.DataFrame(counts, index=pd.Index(symbols, name='symbol'))[ISSUES].astype(np.int64)
+        issues = issues[issues.any(axis=1)]
+
+        severe = issues[REFETCH_ISSUES].any(axis=1) | (issues['gaps'] > VALIDATE_MAX_GAPS)
+        refetch = issues.index[severe].tolist()
+
+        # Ghi lại giá đã sửa, bỏ nến hỏng
+        df[PRICE_COLS] = np.column_stack([o, h, l, c])
+        df['volume'] = v.astype(np.int64)
+        df = df[keep].reset_index(drop=True)[columns]
+        return df, self._report(issues, refetch, pd.DatetimeIndex(calendar), rows_in, len(df))
+
+    @staticmethod
+    def _report(issues, refetch, calendar, rows_in, rows_out) -> dict:
+        return {
+            'issues': issues,
+            'totals': {k: int(v) for k, v in issues.sum().items() if v} if len(issues) else {},
+            'refetch': refetch,
+            'calendar': calendar,
+            'rows_in': rows_in,
+            'rows_out': rows_out,
+        }
+
+    @staticmethod
+    def severity(report: dict, symbol: str) -> int:
+        """Số lỗi nặng của 1 mã (dùng để so bản lấy lại với bản cũ)"""
+        issues = report['issues']
+        if symbol not in issues.index:
+            return 0
+        row = issues.loc[symbol]
+        return int(row[REFETCH_ISSUES].sum() + (row['gaps'] if row['gaps'] > VALIDATE_MAX_GAPS else 0))
+
+    @staticmethod
+    def print_report(report: dict):
+        totals = report['totals']
+        if not totals:
+            print(f"✅ Dữ liệu sạch ({report['rows_out']} nến)")
+            return
+        dropped = report['rows_in'] - report['rows_out']
+        print(f"🧪 Kiểm tra dữ liệu: {len(report['issues'])} mã có lỗi, bỏ {dropped} nến")
+        print("   " + " | ".join(f"{k}: {v}" for k, v in totals.items()))